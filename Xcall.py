@@ -1,144 +1,169 @@
-import requests
-import base64
-import json
+#!/usr/bin/env python3
+"""
+CallX - analyse des appels Aircall
+Récupère les nouveaux appels (curseur) ou une période (--from/--to), puis
+téléchargement → transcription → analyse GPT → journal du jour. Rien de
+lourd n'est importé tant qu'il n'y a pas d'appel à traiter : un run sans
+nouvel appel ne charge ni torch, ni le modèle, ni le client OpenAI, et le
+modèle n'est chargé qu'à la première transcription.
+
+    python Xcall.py
+    python Xcall.py --from 2025-09-01 --to 2025-09-30 --limit 50
+    python Xcall.py --dry-run
+"""
+
 import os
-import whisper
+import argparse
 from datetime import datetime
-from openai import OpenAI
-from .env import OPENAI_KEY, API_ID, API_TOKEN
-
-# Configuration
 
-credentials = f"{API_ID}:{API_TOKEN}"
-encoded_credentials = base64.b64encode(credentials.encode()).decode()
-headers = {"Authorization": f"Basic {encoded_credentials}"}
-
-print("🔄 Chargement Whisper...")
-model = whisper.load_model("base")
-client = OpenAI(api_key=OPENAI_KEY)
-print("✅ Prêt !\n")
+from dotenv import load_dotenv
+
+import metrics
+from aircall_sync import AircallSync, basic_auth_headers
+from ledger import Ledger
+
+load_dotenv()
+
+# Mode pipeline : XCALL_PIPELINE=1, concurrence réglable par étape
+PIPELINE_MODE = os.getenv('XCALL_PIPELINE', '0') == '1'
+DOWNLOAD_WORKERS = int(os.getenv('XCALL_DOWNLOAD_WORKERS', 4))
+TRANSCRIBE_WORKERS = int(os.getenv('XCALL_TRANSCRIBE_WORKERS', 1))
+ANALYZE_WORKERS = int(os.getenv('XCALL_ANALYZE_WORKERS', 8))
+QUEUE_SIZE = int(os.getenv('XCALL_QUEUE_SIZE', 8))
+# Transcription multi-processus : XCALL_TRANSCRIBE_PROCESSES=N (0 = modèle dans le processus principal)
+TRANSCRIBE_PROCESSES = int(os.getenv('XCALL_TRANSCRIBE_PROCESSES', 0))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="CallX - analyse des appels Aircall")
+    # Mode rattrapage : python Xcall.py --from 2025-09-01 --to 2025-09-30
+    parser.add_argument("--from", dest="date_from", help="Début du rattrapage (YYYY-MM-DD)")
+    parser.add_argument("--to", dest="date_to", help="Fin du rattrapage incluse (YYYY-MM-DD, défaut: aujourd'hui)")
+    parser.add_argument("--limit", type=int, help="Nombre maximum d'appels traités (les suivants au prochain run)")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Liste les appels à traiter sans rien télécharger ni analyser (le curseur n'avance pas)")
+    return parser.parse_args(argv)
+
+
+def fetch_calls(sync, args):
+    """(appels triés par date, curseur de départ ou None en rattrapage)"""
+    if args.date_from:
+        start = int(datetime.strptime(args.date_from, '%Y-%m-%d').timestamp())
+        end = int(datetime.strptime(args.date_to, '%Y-%m-%d').timestamp()) + 86399 if args.date_to else int(datetime.now().timestamp())
+        return sync.fetch_range(start, end), None
+    cursor = sync.load_cursor()
+    return sync.fetch_new_calls(cursor), cursor
+
+
+def fetch_parked(sync, ledger, known_ids):
+    """Appels mis de côté aux runs précédents, relus via l'API (URL d'enregistrement à jour)"""
+    calls = []
+    for call_id in ledger.parked():
+        if call_id in known_ids:
+            continue
+        try:
+            calls.append(sync.fetch_call(call_id))
+        except Exception as e:
+            print(f"⚠️ Appel mis de côté {call_id} illisible via l'API: {e}")
+    return calls
+
+
+def processed_prefix(calls, pending, selected):
+    """Appels que le curseur peut dépasser : tous ceux qui précèdent le premier appel laissé de côté par --limit"""
+    left_out = {call["id"] for call in pending} - {call["id"] for call in selected}
+    prefix = []
+    for call in calls:
+        if call["id"] in left_out:
+            break
+        prefix.append(call)
+    return prefix
+
+
+def process_calls(calls, ledger):
+    """Crée les clients à la demande et traite les appels (séquentiel ou pipeline)"""
+    from openai import OpenAI
+
+    import vad
+    from analysis_cache import AnalysisCache
+    from analysis_client import AnalysisExecutor, RUN_USAGE
+    from ingestion import process_calls_sequential, process_calls_pipelined
+    from transcription import LazyBackend
+
+    # Le modèle de transcription n'est chargé qu'à la première transcription (XCALL_TRANSCRIBER, XCALL_WHISPER_*)
+    transcribe_workers = TRANSCRIBE_WORKERS
+    if TRANSCRIBE_PROCESSES:
+        from transcription_pool import TranscriptionPool
+
+        transcriber = LazyBackend(lambda: TranscriptionPool(workers=TRANSCRIBE_PROCESSES))
+        transcribe_workers = max(transcribe_workers, TRANSCRIBE_PROCESSES)
+    else:
+        transcriber = LazyBackend()
+    # Concurrence GPT : les workers de l'étape d'analyse du pipeline (XCALL_ANALYZE_WORKERS)
+    analyzer = AnalysisExecutor(OpenAI(api_key=os.getenv('OPENAI_KEY')))
+    cache = AnalysisCache()
+
+    try:
+        if PIPELINE_MODE:
+            print(f"⚙️ Pipeline: {DOWNLOAD_WORKERS} téléchargements, {transcribe_workers} Whisper, {ANALYZE_WORKERS} GPT\n")
+            process_calls_pipelined(calls, transcriber, analyzer, ledger=ledger, cache=cache,
+                                    download_workers=DOWNLOAD_WORKERS,
+                                    transcribe_workers=transcribe_workers,
+                                    analyze_workers=ANALYZE_WORKERS,
+                                    queue_size=QUEUE_SIZE)
+        else:
+            process_calls_sequential(calls, transcriber, analyzer, ledger=ledger, cache=cache)
+    finally:
+        if TRANSCRIBE_PROCESSES and transcriber.loaded:
+            transcriber.backend.close()
+
+    for report in (cache.report(), RUN_USAGE.report(), vad.RUN_STATS.report()):
+        if report:
+            print(report)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    # Récupérer les appels
+    sync = AircallSync(basic_auth_headers(os.getenv('API_ID'), os.getenv('API_TOKEN')))
+    calls, cursor = fetch_calls(sync, args)
+    print(f"📞 {len(calls)} appels trouvés\n")
+
+    # Appels déjà terminés d'après le registre (un mp3 seul ne suffit plus)
+    ledger = Ledger()
+    pending = ledger.pending(calls)
+    print(f"🆕 {len(pending)} appels à traiter\n")
+    # Les appels mis de côté passent en premier ; le curseur peut donc les dépasser
+    retries = fetch_parked(sync, ledger, {call["id"] for call in pending})
+    if retries:
+        print(f"🅿️ {len(retries)} appel(s) mis de côté repris\n")
+    queue = retries + pending
+    selected = queue[:args.limit] if args.limit else queue
+    if len(selected) < len(queue):
+        print(f"✂️ Limité à {len(selected)} appels ({len(queue) - len(selected)} au prochain run)\n")
+
+    if args.dry_run:
+        for call in selected:
+            started_at = datetime.fromtimestamp(call["started_at"]).strftime('%Y-%m-%d %H:%M')
+            user = call["user"]["name"] if call.get("user") else "Unknown"
+            recording = "🎵" if call.get("recording") else "pas d'enregistrement"
+            print(f"   • {call['id']} - {started_at} - {user} - {call.get('duration', 0)}s - {recording}")
+        print("\n🧪 Dry run : rien n'a été traité, le curseur n'a pas bougé")
+        return
+
+    if not selected:
+        print("✅ Rien de nouveau")
+    else:
+        process_calls(selected, ledger)
 
-# Business context
-BUSINESS_CONTEXT = """
-VOTRE BUSINESS: Ce que vous faites : Cabinet de recrutement spécialisé qui connecte les meilleurs talents tech aux entreprises ambitieuses.
-Proposition de valeur : Expertise sectorielle, approche humaine et placements durables fondés sur la confiance.
-Un bon business : Crée de la valeur réelle, des relations solides et reste aligné avec ses valeurs.
-"""
+    # Le curseur n'avance qu'après traitement (le rattrapage ne le modifie pas)
+    if not args.date_from:
+        sync.save_cursor(sync.advance_cursor(cursor, processed_prefix(calls, pending, selected)))
 
-# Récupérer et traiter les appels
-calls = requests.get("https://api.aircall.io/v1/calls?order=desc&per_page=20", headers=headers).json()["calls"]
-print(f"📞 {len(calls)} appels trouvés\n")
-
-existing_calls = {f.split("_")[1] for folder in ["mp3", "transcriptions", "analyses"] if os.path.exists(folder) for f in os.listdir(folder) if f.startswith("call_")}
-
-for call in calls:
-    if str(call["id"]) in existing_calls: continue
-    call_id, duration = call["id"], call["duration"]
-    started_at = datetime.fromtimestamp(call["started_at"])
-    assignee = call["user"]["name"] if call["user"] else "Unknown"
-    assignee_email = call["user"]["email"] if call["user"] else "Unknown"
-    client_name = call["contact"]["name"] if call["contact"] else "Unknown"
-    
-    print(f"📞 Call {call_id} - {client_name} - {assignee} - {assignee_email}")
-    
-    if call.get("recording"):
-        # Télécharger et transcrire
-        filename = f"mp3/call_{call_id}_{started_at.strftime('%Y-%m-%d')}.mp3"
-        audio_response = requests.get(call["recording"])
-        with open(filename, 'wb') as f:
-            f.write(audio_response.content)
-
-        if not os.path.exists(filename) or os.path.getsize(filename) == 0:
-            print(f"❌ Erreur téléchargement: {filename}")
-            continue
+    report_path = metrics.write_report("xcall")
+    if report_path:
+        print(f"📏 Mesures du run: {report_path}")
 
-        print(f"✅ Fichier téléchargé: {filename} ({os.path.getsize(filename)} bytes)")
-        
-        transcript = model.transcribe(filename, language="fr", fp16=False)["text"].strip()
-        print(f"🔍 Transcript brut: '{transcript}'")
-        print(f"🔍 Longueur: {len(transcript)} caractères")
 
-        if len(transcript) < 10:
-            print("❌ Transcription trop courte, skip GPT")
-            continue
-        with open(f"transcriptions/call_{call_id}_{started_at.strftime('%Y-%m-%d')}.txt", 'w', encoding='utf-8') as f:
-            f.write(transcript)
-        
-        # Analyse GPT-4
-        prompt = f"""
-{BUSINESS_CONTEXT}
-
-TRANSCRIPTION DE L'APPEL:
-{transcript}
-
-IMPORTANT: Répondez UNIQUEMENT avec du JSON valide, sans texte avant ou après.
-
-Analysez cet appel et fournissez EXACTEMENT ce format JSON:
-
-{{
-  "mood_global": "Note sur 10",
-  "temps_parole": "Répartition % vendeur vs client",
-  "blocages_client": ["Blocage 1 avec verbatim exact", "Blocage 2 avec verbatim exact"],
-  "arguments_reussis": ["Argument qui a marché avec verbatim", "Autre argument réussi"],
-  "arguments_non_reussis": ["Argument qui n'a pas marché avec verbatim", "Autre échec"],
-  "ameliorations": ["Amélioration 1", "Amélioration 2", "Amélioration 3"]
-}}
-
-CRITÈRES IMPORTANTS:
-- "arguments_reussis": Seulement les arguments où le CLIENT a montré un intérêt réel, une adhésion, ou une réaction positive claire
-- "arguments_non_reussis": Les arguments où le client a résisté, refusé, ou montré de l'indifférence
-- Ne pas mettre dans "arguments_reussis" si le client n'a pas réagi positivement
-
-Répondez UNIQUEMENT avec le JSON, rien d'autre.
-"""
-        
-        response = client.chat.completions.create(
-            model="gpt-4",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.3
-        )
-        
-        print("GPT Response:", response.choices[0].message.content)
-        try:
-            analysis = json.loads(response.choices[0].message.content)
-        except:
-            analysis = {"mood_global": "Erreur", "temps_parole": "Erreur", "blocages_client" : [], "arguments_reussis": [], "arguments_non_reussis": [], "ameliorations": []}
-        
-        # Sauvegarder analyse dans un fichier consolidé par jour
-        analysis_with_email = {
-            **analysis,
-            "assignee_email": assignee_email,
-            "assignee_name": assignee,
-            "client_name": client_name,
-            "call_id": call_id,
-            "date": started_at.strftime('%Y-%m-%d %H:%M')
-        }
-        
-        # Fichier consolidé par jour : analyses_YYYY-MM-DD.json
-        daily_file = f"analyses/analyses_{started_at.strftime('%Y-%m-%d')}.json"
-        
-        # Charger les analyses existantes du jour ou créer une nouvelle liste
-        existing_analyses = []
-        if os.path.exists(daily_file):
-            try:
-                with open(daily_file, 'r', encoding='utf-8') as f:
-                    existing_analyses = json.load(f)
-            except:
-                existing_analyses = []
-        
-        # Ajouter la nouvelle analyse
-        existing_analyses.append(analysis_with_email)
-        
-        # Sauvegarder le fichier consolidé
-        with open(daily_file, 'w', encoding='utf-8') as f:
-            json.dump(existing_analyses, f, indent=2, ensure_ascii=False)
-        
-        print(f"📊 Mood: {analysis['mood_global']}/10")
-        print(f"💬 Temps parole: {analysis['temps_parole']}")
-        print(f"🚫 Blocages: {len(analysis['blocages_client'])}")
-        print(f"✅ Réussis: {len(analysis['arguments_reussis'])}")
-        print(f"❌ Échecs: {len(analysis['arguments_non_reussis'])}")
-        print(f"📈 Améliorations: {len(analysis['ameliorations'])}")
-    else:
-        print("🎵 Pas d'enregistrement")
-    print("-" * 50)
\ No newline at end of file
+if __name__ == "__main__":
+    main()
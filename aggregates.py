@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Agrégats quotidiens matérialisés pour le dashboard CallX
+Un instantané par jour (nombre d'appels, sommes et histogramme des scores, totaux
+par commercial, compteurs de blocages/arguments/améliorations) dans state/aggregates/.
+Il n'est recalculé que si les fichiers sources du jour ont changé (mtime + taille)
+ou si son format a changé ; le dashboard est ensuite assemblé en fusionnant les
+instantanés, et les fenêtres (moyennes, percentiles) se lisent sur le seul index.
+"""
+
+import os
+import json
+import hashlib
+from collections import Counter
+from datetime import datetime, timedelta
+
+from analysis_log import merge_unique
+from analysis_loader import files_by_day, read_files
+
+ANALYSES_DIR = "analyses"
+AGGREGATES_DIR = os.getenv('XCALL_AGGREGATES_DIR', 'state/aggregates')
+# Format des instantanés : un jour d'un format plus ancien est recalculé (2 : histogramme des scores)
+SNAPSHOT_VERSION = 2
+
+COUNTER_FIELDS = {
+    "blockers": "blocages_client",
+    "successful_args": "arguments_reussis",
+    "failed_args": "arguments_non_reussis",
+    "improvements": "ameliorations",
+}
+
+
+def parse_score(analysis):
+    """Note sur 10 d'une analyse ("7", "7/10"), ou None si elle n'est pas exploitable"""
+    score_str = str(analysis.get("mood_global", "")).replace("/10", "").strip()
+    return int(score_str) if score_str.isdigit() else None
+
+
+def histogram_percentiles(counts, quantiles=(25, 50, 75, 90)):
+    """
+    {"p50": ...} depuis un histogramme {score: nombre}, identiques à np.percentile
+    (interpolation linéaire) sur la liste des scores ; vide sans score
+    """
+    values = sorted((int(score), count) for score, count in counts.items() if count)
+    total = sum(count for _, count in values)
+    if not total:
+        return {}
+
+    def nth(rank):
+        for score, count in values:
+            if rank < count:
+                return score
+            rank -= count
+        return values[-1][0]
+
+    result = {}
+    for q in quantiles:
+        position = q / 100 * (total - 1)
+        low = int(position)
+        low_value = nth(low)
+        result[f"p{q}"] = round(low_value + (nth(min(low + 1, total - 1)) - low_value) * (position - low), 1)
+    return result
+
+
+def fingerprint(directory, file_names):
+    """Empreinte des sources d'un jour : noms, tailles et dates de modification"""
+    parts = []
+    for file_name in sorted(file_names):
+        stat = os.stat(os.path.join(directory, file_name))
+        parts.append(f"{file_name}:{stat.st_size}:{stat.st_mtime_ns}")
+    return hashlib.sha256("|".join(parts).encode()).hexdigest()
+
+
+def empty_snapshot(day):
+    snapshot = {"day": day, "calls": 0, "scored": 0, "score_sum": 0, "scores": {}, "reps": {}}
+    for field in COUNTER_FIELDS:
+        snapshot[field] = {}
+    return snapshot
+
+
+def add_analysis(snapshot, analysis):
+    """Ajoute une analyse à un instantané (mise à jour en place)"""
+    snapshot["calls"] += 1
+    rep = snapshot["reps"].setdefault(analysis.get("assignee_name", "Unknown"), {"calls": 0, "scored": 0, "score_sum": 0})
+    rep["calls"] += 1
+    score = parse_score(analysis)
+    if score is not None:
+        snapshot["scored"] += 1
+        snapshot["score_sum"] += score
+        snapshot["scores"][str(score)] = snapshot["scores"].get(str(score), 0) + 1
+        rep["scored"] += 1
+        rep["score_sum"] += score
+    for field, source in COUNTER_FIELDS.items():
+        counts = snapshot[field]
+        for phrase in analysis.get(source, []):
+            counts[phrase] = counts.get(phrase, 0) + 1
+
+
+def build_snapshot(day, directory, file_names):
+    """Recalcule l'instantané d'un jour depuis ses fichiers sources"""
+    snapshot = empty_snapshot(day)
+    for analysis in merge_unique(*read_files(directory, file_names)):
+        add_analysis(snapshot, analysis)
+    return snapshot
+
+
+class DailyAggregates:
+    """Instantanés par jour, recalculés seulement pour les jours modifiés"""
+
+    def __init__(self, directory=ANALYSES_DIR, aggregates_dir=AGGREGATES_DIR):
+        self.directory = directory
+        self.aggregates_dir = aggregates_dir
+        self.index_path = os.path.join(aggregates_dir, "index.json")
+        self.index = {}
+        if os.path.exists(self.index_path):
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                self.index = json.load(f)
+        self._loaded = {}
+
+    def refresh(self):
+        """Met à jour les instantanés des jours dont les sources ont changé ; renvoie ces jours"""
+        os.makedirs(self.aggregates_dir, exist_ok=True)
+        days = files_by_day(self.directory)
+        changed = []
+        for day, file_names in days.items():
+            digest = fingerprint(self.directory, file_names)
+            entry = self.index.get(day, {})
+            if entry.get("fingerprint") == digest and entry.get("version") == SNAPSHOT_VERSION:
+                continue
+            snapshot = build_snapshot(day, self.directory, file_names)
+            self._write(day, snapshot)
+            self.index[day] = {"fingerprint": digest, "version": SNAPSHOT_VERSION, "calls": snapshot["calls"],
+                               "scored": snapshot["scored"], "score_sum": snapshot["score_sum"],
+                               "scores": snapshot["scores"]}
+            changed.append(day)
+        for day in set(self.index) - set(days):
+            # Jour dont les fichiers ont disparu
+            del self.index[day]
+            self._loaded.pop(day, None)
+            changed.append(day)
+        if changed:
+            tmp = self.index_path + ".tmp"
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(self.index, f, sort_keys=True)
+            os.replace(tmp, self.index_path)
+        return sorted(changed)
+
+    def days(self):
+        return sorted(self.index)
+
+    def snapshot(self, day):
+        if day not in self.index:
+            return empty_snapshot(day)
+        if day not in self._loaded:
+            with open(self._path(day), 'r', encoding='utf-8') as f:
+                self._loaded[day] = json.load(f)
+        return self._loaded[day]
+
+    def window(self, end_day, length):
+        """Totaux (appels, scores) des `length` jours finissant à `end_day`, sans ouvrir les instantanés"""
+        calls = scored = score_sum = 0
+        for entry in self._entries(end_day, length):
+            calls += entry["calls"]
+            scored += entry["scored"]
+            score_sum += entry["score_sum"]
+        return {"calls": calls, "scored": scored, "average": round(score_sum / scored, 1) if scored else 0}
+
+    def percentiles(self, end_day, length, quantiles=(25, 50, 75, 90)):
+        """Percentiles des scores des `length` jours finissant à `end_day` (histogrammes de l'index)"""
+        counts = Counter()
+        for entry in self._entries(end_day, length):
+            counts.update(entry.get("scores", {}))
+        return histogram_percentiles(counts, quantiles)
+
+    def _entries(self, end_day, length):
+        end = datetime.strptime(end_day, '%Y-%m-%d')
+        for offset in range(length):
+            entry = self.index.get((end - timedelta(days=offset)).strftime('%Y-%m-%d'))
+            if entry:
+                yield entry
+
+    def _path(self, day):
+        return os.path.join(self.aggregates_dir, f"day_{day}.json")
+
+    def _write(self, day, snapshot):
+        tmp = self._path(day) + ".tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(snapshot, f, ensure_ascii=False)
+        os.replace(tmp, self._path(day))
+        self._loaded[day] = snapshot
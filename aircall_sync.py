@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Synchronisation des appels Aircall pour CallX
+Parcours complet de la pagination, curseur persisté (dernier started_at traité)
+pour ne demander que les nouveaux appels, et mode rattrapage --from/--to
+qui répartit les pages en parallèle sous la limite de l'API
+"""
+
+import os
+import json
+import time
+import base64
+import requests
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+from rate_limit import RateLimiter
+
+AIRCALL_API_URL = os.getenv('AIRCALL_API_URL', 'https://api.aircall.io/v1')
+CURSOR_FILE = os.getenv('AIRCALL_CURSOR_FILE', 'state/aircall_cursor.json')
+
+PER_PAGE = 50               # maximum autorisé par Aircall
+MAX_RESULTS = 10000         # Aircall ne pagine pas au-delà de 10 000 résultats par requête
+LOOKBACK_SECONDS = 3600     # fenêtre relue à chaque run (appels encore en cours, enregistrements tardifs)
+REQUESTS_PER_MINUTE = 60    # limite Aircall par compte
+
+
+def basic_auth_headers(api_id, api_token):
+    """En-têtes d'authentification de l'API Aircall (Basic API_ID:API_TOKEN)"""
+    credentials = base64.b64encode(f"{api_id}:{api_token}".encode()).decode()
+    return {"Authorization": f"Basic {credentials}"}
+
+
+class AircallSync:
+    """Client de synchronisation des appels Aircall"""
+
+    def __init__(self, headers, base_url=AIRCALL_API_URL, cursor_file=CURSOR_FILE,
+                 requests_per_minute=REQUESTS_PER_MINUTE, workers=4):
+        self.base_url = base_url.rstrip("/")
+        self.cursor_file = cursor_file
+        self.workers = workers
+        self.limiter = RateLimiter(requests_per_minute, per=60.0, burst=min(requests_per_minute, 10))
+        self.session = requests.Session()
+        self.session.headers.update(headers)
+
+    # Curseur
+
+    def load_cursor(self):
+        if not os.path.exists(self.cursor_file):
+            return None
+        try:
+            with open(self.cursor_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"⚠️ Curseur Aircall illisible, synchronisation complète: {e}")
+            return None
+
+    def save_cursor(self, cursor):
+        """Écrit le curseur de façon atomique (fichier temporaire puis renommage)"""
+        if not cursor:
+            return
+        os.makedirs(os.path.dirname(self.cursor_file) or ".", exist_ok=True)
+        tmp = self.cursor_file + ".tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(cursor, f)
+        os.replace(tmp, self.cursor_file)
+
+    @staticmethod
+    def advance_cursor(cursor, calls):
+        """
+        Nouveau curseur après traitement de `calls`
+
+        Seuls les appels terminés font avancer le curseur : un appel encore en cours
+        sera relu au prochain run.
+        """
+        best = dict(cursor) if cursor else None
+        for call in calls:
+            if not call.get("ended_at"):
+                continue
+            key = (call["started_at"], call["id"])
+            if best is None or key > (best["started_at"], best["call_id"]):
+                best = {"started_at": call["started_at"], "call_id": call["id"]}
+        return best
+
+    # Récupération
+
+    def fetch_new_calls(self, cursor=None, limit_pages=None):
+        """
+        Tous les appels plus récents que le curseur, du plus ancien au plus récent
+
+        Sans curseur, seuls les appels des dernières 24h sont demandés ; l'historique
+        se récupère avec fetch_range().
+        """
+        if cursor is None:
+            cursor = self.load_cursor()
+        now = int(time.time())
+        start = cursor["started_at"] - LOOKBACK_SECONDS if cursor else now - 86400
+        calls = self.fetch_range(start, now, limit_pages=limit_pages)
+        return calls
+
+    def fetch_range(self, start, end, limit_pages=None):
+        """
+        Tous les appels dont started_at est dans [start, end], triés par date
+
+        La première page donne le total ; les pages suivantes sont demandées en
+        parallèle. Au-delà de MAX_RESULTS, la fenêtre est coupée en deux.
+        """
+        with metrics.timer("aircall_fetch_seconds"):
+            return self._fetch_range(start, end, limit_pages)
+
+    def _fetch_range(self, start, end, limit_pages=None):
+        first = self._get_page(start, end, 1)
+        meta = first.get("meta", {})
+        total = meta.get("total", len(first["calls"]))
+
+        if total > MAX_RESULTS and end - start > 1:
+            middle = (start + end) // 2
+            return self._fetch_range(start, middle, limit_pages) + self._fetch_range(middle + 1, end, limit_pages)
+
+        pages = max(1, -(-total // PER_PAGE))
+        if limit_pages:
+            pages = min(pages, limit_pages)
+
+        results = {1: first["calls"]}
+        if pages > 1:
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                futures = {page: executor.submit(self._get_page, start, end, page) for page in range(2, pages + 1)}
+                for page, future in futures.items():
+                    results[page] = future.result()["calls"]
+
+        # Dédoublonnage : un appel peut glisser d'une page à l'autre pendant le parcours
+        seen = set()
+        calls = []
+        for page in sorted(results):
+            for call in results[page]:
+                if call["id"] not in seen:
+                    seen.add(call["id"])
+                    calls.append(call)
+        calls.sort(key=lambda call: (call["started_at"], call["id"]))
+        return calls
+
+    def fetch_call(self, call_id, retries=5):
+        """Un appel par son id (ex: pour relire un appel dont l'enregistrement n'était pas prêt)"""
+        for attempt in range(retries + 1):
+            self.limiter.acquire()
+            response = self.session.get(f"{self.base_url}/calls/{call_id}", timeout=30)
+            if response.status_code == 429 or response.status_code >= 500:
+                wait = _retry_after(response, attempt)
+                print(f"⏳ Aircall {response.status_code}, nouvel essai dans {wait:.0f}s (appel {call_id})")
+                self.limiter.pause(wait)
+                continue
+            response.raise_for_status()
+            return response.json()["call"]
+        response.raise_for_status()
+        raise requests.HTTPError(f"Aircall: appel {call_id} indisponible après {retries + 1} essais")
+
+    def _get_page(self, start, end, page, retries=5):
+        params = {"from": start, "to": end, "order": "asc", "page": page, "per_page": PER_PAGE}
+        for attempt in range(retries + 1):
+            self.limiter.acquire()
+            response = self.session.get(f"{self.base_url}/calls", params=params, timeout=30)
+            metrics.incr("aircall_requests", status=response.status_code)
+            if response.status_code == 429 or response.status_code >= 500:
+                wait = _retry_after(response, attempt)
+                print(f"⏳ Aircall {response.status_code}, nouvel essai dans {wait:.0f}s (page {page})")
+                self.limiter.pause(wait)
+                continue
+            response.raise_for_status()
+            return response.json()
+        response.raise_for_status()
+        raise requests.HTTPError(f"Aircall: page {page} indisponible après {retries + 1} essais")
+
+
+def _retry_after(response, attempt):
+    """Délai d'attente d'après Retry-After / X-AircallApi-Reset, sinon backoff exponentiel"""
+    retry_after = response.headers.get("Retry-After")
+    if retry_after and retry_after.isdigit():
+        return float(retry_after)
+    reset = response.headers.get("X-AircallApi-Reset")
+    if reset and reset.isdigit():
+        return max(1.0, int(reset) - time.time())
+    return float(min(2 ** attempt, 60))
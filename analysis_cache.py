@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Cache des analyses GPT pour CallX (SQLite)
+Clé = empreinte de la transcription normalisée + version du prompt + modèle +
+température : retraiter un appel déjà analysé avec le même prompt ne coûte
+aucun appel API, et un changement de prompt invalide naturellement les entrées.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+import unicodedata
+
+CACHE_FILE = os.getenv('XCALL_CACHE_FILE', 'state/analysis_cache.db')
+MAX_ENTRIES = int(os.getenv('XCALL_CACHE_MAX_ENTRIES', 100000))
+MAX_AGE_DAYS = int(os.getenv('XCALL_CACHE_MAX_AGE_DAYS', 365))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS analyses (
+    key TEXT PRIMARY KEY,
+    prompt_version TEXT,
+    model TEXT,
+    analysis TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    used_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS analyses_used_at ON analyses(used_at);
+"""
+
+
+def normalize_transcript(transcript):
+    """Forme canonique : Unicode NFC, espaces regroupés"""
+    return " ".join(unicodedata.normalize("NFC", transcript).split())
+
+
+def cache_key(transcript, prompt_version, model, temperature):
+    material = "\x1f".join([normalize_transcript(transcript), prompt_version, model, f"{float(temperature):.3f}"])
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class AnalysisCache:
+    """Cache persistant d'analyses avec éviction par âge et par taille (LRU)"""
+
+    def __init__(self, path=CACHE_FILE, max_entries=MAX_ENTRIES, max_age_days=MAX_AGE_DAYS):
+        self.max_entries = max_entries
+        self.max_age = max_age_days * 86400 if max_age_days else None
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self._puts = 0
+
+    def get(self, transcript, prompt_version, model, temperature):
+        key = cache_key(transcript, prompt_version, model, temperature)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT analysis, created_at FROM analyses WHERE key = ?", (key,)).fetchone()
+            if row is None or (self.max_age and now - row[1] > self.max_age):
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE analyses SET used_at = ? WHERE key = ?", (now, key))
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, transcript, prompt_version, model, temperature, analysis):
+        key = cache_key(transcript, prompt_version, model, temperature)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO analyses (key, prompt_version, model, analysis, created_at, used_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, prompt_version, model, json.dumps(analysis, ensure_ascii=False), now, now),
+            )
+            self._puts += 1
+            if self._puts % 100 == 0:
+                self._evict(now)
+
+    def evict(self):
+        """Supprime les entrées trop anciennes puis les moins récemment utilisées au-delà de max_entries"""
+        with self._lock:
+            return self._evict(time.time())
+
+    def _evict(self, now):
+        removed = 0
+        if self.max_age:
+            removed += self._conn.execute("DELETE FROM analyses WHERE created_at < ?", (now - self.max_age,)).rowcount
+        if self.max_entries:
+            count = self._conn.execute("SELECT COUNT(*) FROM analyses").fetchone()[0]
+            if count > self.max_entries:
+                removed += self._conn.execute(
+                    "DELETE FROM analyses WHERE key IN (SELECT key FROM analyses ORDER BY used_at LIMIT ?)",
+                    (count - self.max_entries,),
+                ).rowcount
+        return removed
+
+    def stats(self):
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM analyses").fetchone()[0]
+        total = self.hits + self.misses
+        return {"entries": entries, "hits": self.hits, "misses": self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else None}
+
+    def report(self):
+        stats = self.stats()
+        if not stats["hits"] and not stats["misses"]:
+            return None
+        return f"🗃️ Cache analyses: {stats['hits']} hits / {stats['misses']} misses ({stats['entries']} entrées)"
+
+    def close(self):
+        self._conn.close()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Client d'analyse GPT pour CallX
+Requêtes concurrentes sous double limite (requêtes/min et tokens/min),
+délai maximal par requête, nouvelles tentatives avec backoff aléatoire sur
+429/5xx en respectant Retry-After. Un appel qui échoue encore après toutes
+les tentatives lève AnalysisFailed : il est mis de côté, pas enregistré en "Erreur".
+UsageStats cumule tokens et latence par modèle pour le bilan du run.
+"""
+
+import os
+import json
+import random
+import time
+import threading
+from collections import defaultdict
+
+from prompts import count_tokens
+from rate_limit import RateLimiter
+
+REQUESTS_PER_MINUTE = int(os.getenv('XCALL_OPENAI_RPM', 500))
+TOKENS_PER_MINUTE = int(os.getenv('XCALL_OPENAI_TPM', 40000))
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+class AnalysisFailed(Exception):
+    """Analyse impossible après toutes les tentatives (l'appel est mis de côté)"""
+
+
+class AnalysisExecutor:
+    """Exécute les analyses GPT sous les limites de l'API OpenAI"""
+
+    def __init__(self, client, model="gpt-4", temperature=0.3,
+                 requests_per_minute=REQUESTS_PER_MINUTE, tokens_per_minute=TOKENS_PER_MINUTE,
+                 max_retries=5, timeout=120, max_backoff=60, completion_tokens=600):
+        # Les nouvelles tentatives sont gérées ici, pas par le SDK. On garde aussi le client
+        # d'origine : sa destruction fermerait la connexion HTTP partagée avec la copie.
+        self._base_client = client
+        self.client = client.with_options(max_retries=0, timeout=timeout)
+        self.model = model
+        self.temperature = temperature
+        self.max_retries = max_retries
+        self.max_backoff = max_backoff
+        self.completion_tokens = completion_tokens
+        self.requests = RateLimiter(requests_per_minute, per=60.0)
+        self.tokens = RateLimiter(tokens_per_minute, per=60.0)
+
+    def complete(self, messages, model=None, temperature=None):
+        """Envoie une requête chat et renvoie la réponse brute (bloquant, sûr entre threads)"""
+        cost = sum(count_tokens(m["content"]) for m in messages) + self.completion_tokens
+        last_error = None
+        for attempt in range(self.max_retries + 1):
+            self.requests.acquire()
+            self.tokens.acquire(cost)
+            try:
+                return self.client.chat.completions.create(
+                    model=model or self.model,
+                    messages=messages,
+                    temperature=self.temperature if temperature is None else temperature,
+                )
+            except Exception as e:
+                status = getattr(e, "status_code", None)
+                retryable = status in RETRYABLE_STATUS or type(e).__name__ in ("APITimeoutError", "APIConnectionError")
+                if not retryable:
+                    raise AnalysisFailed(f"{type(e).__name__}: {e}") from e
+                last_error = e
+                wait = self._retry_delay(e, attempt)
+                if attempt == self.max_retries:
+                    break
+                if status == 429:
+                    # Tout le monde attend : inutile que les autres threads se fassent aussi refuser
+                    self.requests.pause(wait)
+                print(f"⏳ OpenAI {status or type(e).__name__}, nouvel essai dans {wait:.1f}s ({attempt + 1}/{self.max_retries})")
+                time.sleep(wait)
+        raise AnalysisFailed(f"{self.max_retries + 1} tentatives: {last_error}")
+
+    def analyze(self, messages, model=None, temperature=None):
+        """Analyse une conversation (ou un prompt seul) et renvoie (JSON décodé, réponse brute)"""
+        if isinstance(messages, str):
+            messages = [{"role": "user", "content": messages}]
+        response = self.complete(messages, model=model, temperature=temperature)
+        content = response.choices[0].message.content
+        try:
+            return json.loads(content), response
+        except (TypeError, json.JSONDecodeError) as e:
+            raise AnalysisFailed(f"Réponse non JSON: {content!r:.200}") from e
+
+    def _retry_delay(self, error, attempt):
+        """Retry-After s'il est fourni, sinon backoff exponentiel avec jitter complet"""
+        response = getattr(error, "response", None)
+        headers = getattr(response, "headers", None) or {}
+        retry_after_ms = headers.get("retry-after-ms")
+        retry_after = headers.get("retry-after")
+        try:
+            if retry_after_ms:
+                return float(retry_after_ms) / 1000
+            if retry_after:
+                return float(retry_after)
+        except ValueError:
+            pass
+        return random.uniform(0, min(self.max_backoff, 2 ** attempt))
+
+
+class UsageStats:
+    """Tokens envoyés/économisés et latence GPT, par modèle, sur le run"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.models = defaultdict(lambda: {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0,
+                                           "saved_tokens": 0, "latency": 0.0})
+
+    def add(self, model, prompt_tokens, completion_tokens, saved_tokens, latency):
+        with self._lock:
+            stats = self.models[model]
+            stats["calls"] += 1
+            stats["prompt_tokens"] += prompt_tokens
+            stats["completion_tokens"] += completion_tokens
+            stats["saved_tokens"] += saved_tokens
+            stats["latency"] += latency
+
+    def report(self):
+        lines = []
+        for model, stats in sorted(self.models.items()):
+            lines.append(f"🧮 {model}: {stats['calls']} appels, {stats['prompt_tokens']} tokens prompt, "
+                         f"{stats['completion_tokens']} tokens réponse, {stats['saved_tokens']} tokens économisés, "
+                         f"{stats['latency'] / stats['calls']:.1f}s en moyenne")
+        return "\n".join(lines) or None
+
+
+RUN_USAGE = UsageStats()
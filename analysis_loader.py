@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Chargement partagé des analyses CallX
+Les fichiers sont filtrés d'après la date de leur nom (analyses_YYYY-MM-DD.json[l],
+call_<id>_<date>.json) avant d'être ouverts, puis les analyses sont produites à
+la demande, sans doublons. Le contenu décodé de chaque fichier est gardé dans un
+cache (mémoire + state/parsed_files) indexé par mtime/taille : un fichier qui
+n'a pas changé n'est pas re-décodé d'un run à l'autre. En mémoire, le cache garde
+les fichiers sérialisés (pickle) dans une LRU bornée à XCALL_PARSED_CACHE_MB ; chaque
+lecture rend une copie que l'appelant peut modifier sans toucher au cache.
+"""
+
+import os
+import pickle
+import hashlib
+import threading
+from collections import OrderedDict
+
+from analysis_log import read_analyses_file, iter_unique
+
+ANALYSES_DIR = "analyses"
+PARSED_CACHE_DIR = os.getenv('XCALL_PARSED_CACHE_DIR', 'state/parsed_files')
+PARSED_CACHE_MB = float(os.getenv('XCALL_PARSED_CACHE_MB', 64))
+
+
+def day_of_file(file_name):
+    """Jour d'un fichier d'analyses d'après son nom, ou None"""
+    stem = file_name.rsplit(".", 1)[0]
+    if file_name.startswith("analyses_") and file_name.endswith((".json", ".jsonl")):
+        return stem[len("analyses_"):]
+    if file_name.startswith("call_") and file_name.endswith(".json"):
+        parts = stem.split("_")
+        return parts[2] if len(parts) == 3 else None
+    return None
+
+
+def files_by_day(directory=ANALYSES_DIR, start=None, end=None):
+    """{jour: [noms de fichiers]} du dossier d'analyses, limité à [start, end] si précisé"""
+    days = {}
+    if not os.path.exists(directory):
+        return days
+    for file_name in os.listdir(directory):
+        day = day_of_file(file_name)
+        # Les dates ISO se comparent comme des chaînes
+        if not day or (start and day < start) or (end and day > end):
+            continue
+        days.setdefault(day, []).append(file_name)
+    return days
+
+
+class ParsedFileCache:
+    """Contenu décodé des fichiers d'analyses, invalidé dès que mtime ou taille changent"""
+
+    def __init__(self, directory=PARSED_CACHE_DIR, persistent=True, max_bytes=PARSED_CACHE_MB * 1024 * 1024):
+        self.directory = directory if persistent else None
+        self.max_bytes = max_bytes
+        self._memory = OrderedDict()  # chemin -> (signature, (signature, analyses) sérialisé)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def load(self, path):
+        """Analyses du fichier : une nouvelle liste à chaque appel (jamais l'objet gardé en cache)"""
+        stat = os.stat(path)
+        signature = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            cached = self._memory.get(path)
+            if cached and cached[0] == signature:
+                self._memory.move_to_end(path)
+                self.hits += 1
+        if cached and cached[0] == signature:
+            return pickle.loads(cached[1])[1]
+
+        blob = self._load_disk(path, signature)
+        if blob is None:
+            self.misses += 1
+            records = read_analyses_file(path)
+            blob = pickle.dumps((signature, records), protocol=pickle.HIGHEST_PROTOCOL)
+            self._save_disk(path, blob)
+        else:
+            self.hits += 1
+            records = pickle.loads(blob)[1]
+        self._remember(path, signature, blob)
+        return records
+
+    def _remember(self, path, signature, blob):
+        with self._lock:
+            previous = self._memory.pop(path, None)
+            if previous:
+                self._bytes -= len(previous[1])
+            if len(blob) > self.max_bytes:
+                return
+            self._memory[path] = (signature, blob)
+            self._bytes += len(blob)
+            while self._bytes > self.max_bytes:
+                _, (_, evicted) = self._memory.popitem(last=False)
+                self._bytes -= len(evicted)
+
+    def _disk_path(self, path):
+        digest = hashlib.sha256(os.path.abspath(path).encode("utf-8")).hexdigest()[:24]
+        return os.path.join(self.directory, f"{digest}.pickle")
+
+    def _load_disk(self, path, signature):
+        """Contenu sérialisé du cache disque s'il correspond encore au fichier, sinon None"""
+        if not self.directory:
+            return None
+        try:
+            with open(self._disk_path(path), 'rb') as f:
+                blob = f.read()
+            stored_signature = pickle.loads(blob)[0]
+        except (OSError, EOFError, pickle.UnpicklingError, ValueError, TypeError, IndexError):
+            return None
+        return blob if stored_signature == signature else None
+
+    def _save_disk(self, path, blob):
+        if not self.directory:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        target = self._disk_path(path)
+        tmp = f"{target}.{os.getpid()}.tmp"
+        with open(tmp, 'wb') as f:
+            f.write(blob)
+        os.replace(tmp, target)
+
+
+PARSED_FILES = ParsedFileCache()
+
+
+def read_files(directory, file_names, cache=None):
+    """Analyses d'un groupe de fichiers (un jour), compactés et journaux avant les anciens call_*"""
+    cache = cache or PARSED_FILES
+    parts = []
+    for file_name in sorted(file_names, key=lambda name: (not name.startswith("analyses_"), name)):
+        try:
+            parts.append(cache.load(os.path.join(directory, file_name)))
+        except Exception as e:
+            print(f"❌ Erreur lecture {file_name}: {e}")
+    return parts
+
+
+def iter_analyses(start=None, end=None, assignee=None, directory=ANALYSES_DIR, cache=None):
+    """
+    Analyses entre deux jours inclus ('YYYY-MM-DD', None = sans limite), jour par jour
+
+    `assignee` filtre sur le nom ou l'email du commercial. Seuls les fichiers dont
+    la date est dans l'intervalle sont ouverts ; les doublons (même call_id) sont ignorés.
+    """
+    def records():
+        for day, file_names in sorted(files_by_day(directory, start, end).items()):
+            yield from iter_unique(*read_files(directory, file_names, cache))
+
+    for analysis in iter_unique(records()):
+        if assignee and assignee not in (analysis.get("assignee_name"), analysis.get("assignee_email")):
+            continue
+        yield analysis
+
+
+def load_analyses(start=None, end=None, assignee=None, directory=ANALYSES_DIR, cache=None):
+    return list(iter_analyses(start, end, assignee, directory, cache))
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Journal des analyses CallX, en ajout seul
+Chaque analyse est une ligne de analyses/analyses_YYYY-MM-DD.jsonl, écrite et
+synchronisée sur disque en un seul append. La compaction produit le format
+historique analyses_YYYY-MM-DD.json (liste JSON) pour les lecteurs existants.
+Ajouts et compaction prennent un verrou exclusif (flock) sur le journal : une
+compaction, même depuis un autre processus, ne supprime jamais une ligne en cours d'écriture.
+"""
+
+import os
+import json
+import fcntl
+from datetime import datetime
+
+ANALYSES_DIR = "analyses"
+
+
+def log_path(day, directory=ANALYSES_DIR):
+    return os.path.join(directory, f"analyses_{day}.jsonl")
+
+
+def array_path(day, directory=ANALYSES_DIR):
+    return os.path.join(directory, f"analyses_{day}.json")
+
+
+def _lock_journal(path, create=True):
+    """
+    Descripteur du journal sous verrou exclusif, ou None s'il n'existe pas (create=False)
+
+    Si le journal a été compacté (supprimé) pendant l'attente du verrou, le descripteur
+    pointe sur l'ancien fichier : on rouvre le chemin.
+    """
+    flags = os.O_RDWR | os.O_APPEND | (os.O_CREAT if create else 0)
+    while True:
+        try:
+            fd = os.open(path, flags, 0o644)
+        except FileNotFoundError:
+            return None
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        try:
+            if os.fstat(fd).st_ino == os.stat(path).st_ino:
+                return fd
+        except FileNotFoundError:
+            pass
+        os.close(fd)
+
+
+def append_analysis(record, day, directory=ANALYSES_DIR):
+    """Ajoute une analyse au journal du jour (une ligne, fsync avant de rendre la main)"""
+    os.makedirs(directory, exist_ok=True)
+    line = json.dumps(record, ensure_ascii=False) + "\n"
+    fd = _lock_journal(log_path(day, directory))
+    try:
+        # Une ligne tronquée par un crash précédent ne doit pas absorber la nouvelle
+        size = os.fstat(fd).st_size
+        if size and os.pread(fd, 1, size - 1) != b"\n":
+            line = "\n" + line
+        os.write(fd, line.encode("utf-8"))
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def read_analyses_file(path):
+    """
+    Lit un fichier d'analyses quel que soit son format et renvoie une liste
+
+    - analyses_YYYY-MM-DD.jsonl : une analyse par ligne ; une dernière ligne tronquée
+      (crash pendant l'écriture) est ignorée sans perdre le reste du jour
+    - analyses_YYYY-MM-DD.json : liste d'analyses
+    - call_XXX_YYYY-MM-DD.json : une seule analyse (ancien format)
+    """
+    if path.endswith(".jsonl"):
+        analyses = []
+        with open(path, 'r', encoding='utf-8') as f:
+            for number, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    analyses.append(json.loads(line))
+                except json.JSONDecodeError:
+                    print(f"⚠️ Ligne {number} illisible ignorée dans {path}")
+        return analyses
+
+    with open(path, 'r', encoding='utf-8') as f:
+        content = json.load(f)
+    return content if isinstance(content, list) else [content]
+
+
+def is_analyses_file(file_name):
+    return (file_name.startswith("analyses_") and file_name.endswith((".json", ".jsonl"))) or \
+           (file_name.startswith("call_") and file_name.endswith(".json"))
+
+
+def iter_unique(*iterables):
+    """Parcourt des flux d'analyses en ignorant les call_id déjà vus"""
+    seen = set()
+    for analyses in iterables:
+        for analysis in analyses:
+            call_id = analysis.get("call_id")
+            if call_id is not None:
+                if call_id in seen:
+                    continue
+                seen.add(call_id)
+            yield analysis
+
+
+def merge_unique(*lists):
+    """Concatène des listes d'analyses en ignorant les call_id déjà vus"""
+    return list(iter_unique(*lists))
+
+
+def read_day(day, directory=ANALYSES_DIR):
+    """Toutes les analyses d'un jour (liste compactée + journal), sans doublons"""
+    parts = []
+    for path in (array_path(day, directory), log_path(day, directory)):
+        if os.path.exists(path):
+            parts.append(read_analyses_file(path))
+    return merge_unique(*parts)
+
+
+def compact_day(day, directory=ANALYSES_DIR):
+    """
+    Exporte le journal du jour vers analyses_YYYY-MM-DD.json puis le supprime
+
+    Le journal reste verrouillé du début de la lecture à sa suppression : les ajouts
+    concurrents attendent puis écrivent dans un nouveau journal. Le fichier JSON est
+    remplacé de façon atomique ; si le processus s'arrête entre le remplacement et la
+    suppression du journal, read_day() dédoublonne par call_id.
+    """
+    journal = log_path(day, directory)
+    fd = _lock_journal(journal, create=False)
+    if fd is None:
+        return 0
+    try:
+        analyses = read_day(day, directory)
+        target = array_path(day, directory)
+        tmp = target + ".tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(analyses, f, indent=2, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, target)
+        os.remove(journal)
+    finally:
+        os.close(fd)
+    return len(analyses)
+
+
+def compact_all(directory=ANALYSES_DIR, include_today=False):
+    """Compacte tous les journaux (par défaut sauf celui du jour, encore en cours d'écriture)"""
+    today = datetime.now().strftime('%Y-%m-%d')
+    compacted = {}
+    if not os.path.exists(directory):
+        return compacted
+    for file_name in sorted(os.listdir(directory)):
+        if file_name.startswith("analyses_") and file_name.endswith(".jsonl"):
+            day = file_name[len("analyses_"):-len(".jsonl")]
+            if day == today and not include_today:
+                continue
+            compacted[day] = compact_day(day, directory)
+    return compacted
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Compaction des journaux d'analyses CallX")
+    parser.add_argument("--day", help="Compacter uniquement ce jour (YYYY-MM-DD)")
+    parser.add_argument("--include-today", action="store_true", help="Compacter aussi le journal du jour")
+    args = parser.parse_args()
+
+    if args.day:
+        results = {args.day: compact_day(args.day)}
+    else:
+        results = compact_all(include_today=args.include_today)
+    for day, count in results.items():
+        print(f"🗜️ {day}: {count} analyses → {array_path(day)}")
+    if not results:
+        print("✅ Rien à compacter")
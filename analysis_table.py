@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Table colonnaire des analyses CallX (NumPy)
+Les analyses sont converties une seule fois en colonnes typées (score, commercial,
+jour, call_id) ; classement, moyennes et écarts par commercial, fenêtres,
+percentiles et moyennes quotidiennes sont ensuite des group-by vectorisés
+(np.bincount), sans boucle Python par analyse. Le dashboard complet classe les
+totaux par commercial des instantanés quotidiens avec le même calcul (ranked).
+"""
+
+from datetime import datetime
+
+import numpy as np
+
+from aggregates import parse_score
+
+EPOCH = np.datetime64('1970-01-01', 'D')
+
+
+def to_day_number(day):
+    """'YYYY-MM-DD' (ou datetime) -> nombre de jours depuis 1970"""
+    if isinstance(day, datetime):
+        day = day.strftime('%Y-%m-%d')
+    return int((np.datetime64(day[:10], 'D') - EPOCH).astype(np.int64))
+
+
+def from_day_number(number):
+    return str(EPOCH + np.timedelta64(int(number), 'D'))
+
+
+def ranked(names, counts, means):
+    """Classement [{rank, name, score, calls}] par moyenne décroissante, commerciaux sans score exclus"""
+    order = [i for i in np.argsort(-np.nan_to_num(means, nan=-1.0), kind='stable') if counts[i]]
+    return [
+        {"rank": rank, "name": names[i], "score": round(float(means[i]), 1), "calls": int(counts[i])}
+        for rank, i in enumerate(order, 1)
+    ]
+
+
+def leaderboard_from_totals(reps):
+    """Classement depuis des totaux par commercial {nom: {"scored", "score_sum"}} (instantanés fusionnés)"""
+    names = list(reps)
+    counts = np.fromiter((rep["scored"] for rep in reps.values()), dtype=np.int64, count=len(names))
+    sums = np.fromiter((rep["score_sum"] for rep in reps.values()), dtype=np.float64, count=len(names))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = sums / counts
+    return ranked(names, counts, means)
+
+
+class AnalysisTable:
+    """
+    Colonnes : score (float32, NaN si absent), rep (int32, index dans rep_names),
+    day (int32, jours depuis 1970), call_id (int64, -1 si absent)
+    """
+
+    def __init__(self, score, rep, day, call_id, rep_names):
+        self.score = score
+        self.rep = rep
+        self.day = day
+        self.call_id = call_id
+        self.rep_names = rep_names
+
+    @classmethod
+    def from_analyses(cls, analyses):
+        """Construit la table en un passage sur une liste ou un flux d'analyses"""
+        rep_index = {}
+        scores, reps, days, call_ids = [], [], [], []
+        for analysis in analyses:
+            date = str(analysis.get("date", ""))[:10]
+            if len(date) != 10:
+                continue
+            score = parse_score(analysis)
+            scores.append(np.nan if score is None else score)
+            reps.append(rep_index.setdefault(analysis.get("assignee_name", "Unknown"), len(rep_index)))
+            days.append(date)
+            call_id = analysis.get("call_id")
+            call_ids.append(int(call_id) if str(call_id).isdigit() else -1)
+        day_numbers = (np.array(days, dtype='datetime64[D]') - EPOCH).astype(np.int32) if days else np.zeros(0, np.int32)
+        return cls(
+            score=np.array(scores, dtype=np.float32),
+            rep=np.array(reps, dtype=np.int32),
+            day=day_numbers,
+            call_id=np.array(call_ids, dtype=np.int64),
+            rep_names=list(rep_index),
+        )
+
+    def __len__(self):
+        return len(self.score)
+
+    def _mask(self, start=None, end=None):
+        """Analyses notées entre deux jours inclus ('YYYY-MM-DD' ou None)"""
+        mask = ~np.isnan(self.score)
+        if start is not None:
+            mask &= self.day >= to_day_number(start)
+        if end is not None:
+            mask &= self.day <= to_day_number(end)
+        return mask
+
+    def window(self, end_day, length):
+        """Totaux (appels, scores) des `length` jours finissant à `end_day`, comme DailyAggregates.window"""
+        end = to_day_number(end_day)
+        days = (self.day > end - length) & (self.day <= end)
+        scores = self.score[days & ~np.isnan(self.score)]
+        return {"calls": int(days.sum()), "scored": len(scores),
+                "average": round(float(scores.mean()), 1) if len(scores) else 0}
+
+    def rep_stats(self, start=None, end=None):
+        """(nombre de scores, moyenne) par commercial ; moyenne NaN sans score"""
+        mask = self._mask(start, end)
+        size = len(self.rep_names)
+        counts = np.bincount(self.rep[mask], minlength=size)
+        sums = np.bincount(self.rep[mask], weights=self.score[mask], minlength=size)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = sums / counts
+        return counts, means
+
+    def leaderboard(self, start=None, end=None):
+        """[{rank, name, score, calls}] par score moyen décroissant"""
+        counts, means = self.rep_stats(start, end)
+        return ranked(self.rep_names, counts, means)
+
+    def deltas(self, end_day, length=7):
+        """{commercial: moyenne des `length` derniers jours - moyenne des `length` précédents}"""
+        end = to_day_number(end_day)
+        current_counts, current = self.rep_stats(from_day_number(end - length + 1), from_day_number(end))
+        previous_counts, previous = self.rep_stats(from_day_number(end - 2 * length + 1), from_day_number(end - length))
+        both = np.flatnonzero((current_counts > 0) & (previous_counts > 0))
+        return {self.rep_names[i]: round(float(current[i] - previous[i]), 1) for i in both}
+
+    def window_totals(self, end_day, windows):
+        """
+        Totaux (appels, notes, somme des notes) par fenêtre, pour l'équipe et par commercial
+
+        `windows` : {nom: (premier, dernier)} en jours avant `end_day` (bornes incluses),
+        comme rep_progress.WINDOWS. Renvoie {"team": {fenêtre: totaux}, "reps": {commercial:
+        {fenêtre: totaux}}}, avec les seuls commerciaux présents dans l'une des fenêtres.
+        """
+        offset = to_day_number(end_day) - self.day
+        scored = ~np.isnan(self.score)
+        size = len(self.rep_names)
+        team, reps, present = {}, {}, np.zeros(size, dtype=bool)
+        columns = {}
+        for window, (low, high) in windows.items():
+            mask = (offset >= low) & (offset <= high)
+            calls = np.bincount(self.rep[mask], minlength=size)
+            notes = np.bincount(self.rep[mask & scored], minlength=size)
+            sums = np.bincount(self.rep[mask & scored], weights=self.score[mask & scored], minlength=size)
+            columns[window] = (calls, notes, sums)
+            team[window] = (int(calls.sum()), int(notes.sum()), int(round(sums.sum())))
+            present |= calls > 0
+        for i in np.flatnonzero(present):
+            reps[self.rep_names[i]] = {window: (int(calls[i]), int(notes[i]), int(round(sums[i])))
+                                       for window, (calls, notes, sums) in columns.items()}
+        return {"team": team, "reps": reps}
+
+    def percentiles(self, quantiles=(25, 50, 75, 90), start=None, end=None):
+        """{"p50": ...} des scores de la période (vide sans score)"""
+        scores = self.score[self._mask(start, end)]
+        if not len(scores):
+            return {}
+        values = np.percentile(scores, quantiles)
+        return {f"p{q}": round(float(v), 1) for q, v in zip(quantiles, values)}
+
+    def daily_means(self, end_day, length=30):
+        """{commercial: [moyenne du jour ou None] × length}, du plus ancien au plus récent"""
+        end = to_day_number(end_day)
+        start = end - length + 1
+        mask = self._mask() & (self.day >= start) & (self.day <= end)
+        size = len(self.rep_names)
+        cells = self.rep[mask].astype(np.int64) * length + (self.day[mask] - start)
+        counts = np.bincount(cells, minlength=size * length).reshape(size, length)
+        sums = np.bincount(cells, weights=self.score[mask], minlength=size * length).reshape(size, length)
+        series = {}
+        for i in np.flatnonzero(counts.sum(axis=1)):
+            series[self.rep_names[i]] = [
+                round(float(s / c), 1) if c else None for s, c in zip(sums[i], counts[i])
+            ]
+        return series
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Outils audio pour CallX (décodage ffmpeg et détection des silences)
+Sans dépendance à torch/whisper : utilisables avant de charger un modèle
+"""
+
+import subprocess
+import numpy as np
+
+SAMPLE_RATE = 16000
+
+
+def load_audio(path, sample_rate=SAMPLE_RATE):
+    """Décode un fichier audio en float32 mono 16 kHz via ffmpeg (même format que whisper.load_audio)"""
+    command = [
+        "ffmpeg", "-nostdin", "-threads", "0", "-i", path,
+        "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(sample_rate), "-",
+    ]
+    try:
+        output = subprocess.run(command, capture_output=True, check=True).stdout
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"Décodage audio impossible ({path}): {e.stderr.decode(errors='ignore')[-200:]}") from e
+    return np.frombuffer(output, np.int16).astype(np.float32) / 32768.0
+
+
+def frame_energies(audio, frame_seconds=0.03, sample_rate=SAMPLE_RATE):
+    """Énergie RMS en dBFS de chaque trame de `frame_seconds`"""
+    frame = max(1, int(frame_seconds * sample_rate))
+    count = len(audio) // frame
+    if count == 0:
+        return np.zeros(0, dtype=np.float32)
+    frames = audio[:count * frame].reshape(count, frame)
+    rms = np.sqrt(np.mean(frames * frames, axis=1))
+    return 20 * np.log10(np.maximum(rms, 1e-10))
+
+
+def find_silences(audio, threshold_db=-40.0, min_silence=0.5, frame_seconds=0.03, sample_rate=SAMPLE_RATE):
+    """Plages silencieuses [(début, fin)] en échantillons, d'au moins `min_silence` secondes"""
+    energies = frame_energies(audio, frame_seconds, sample_rate)
+    frame = max(1, int(frame_seconds * sample_rate))
+    quiet = np.concatenate([[False], energies < threshold_db, [False]])
+    edges = np.flatnonzero(quiet[1:] != quiet[:-1])
+    min_frames = int(min_silence / frame_seconds)
+    return [(int(start * frame), int(end * frame)) for start, end in zip(edges[::2], edges[1::2]) if end - start >= min_frames]
+
+
+def split_at_silences(audio, max_seconds=600.0, sample_rate=SAMPLE_RATE, **silence_options):
+    """
+    Découpe un enregistrement long en morceaux d'au plus ~`max_seconds`
+
+    Chaque coupe tombe au milieu du silence le plus proche de la limite, pour ne
+    pas couper un mot. Renvoie [(décalage en échantillons, morceau)] dans l'ordre.
+    """
+    limit = int(max_seconds * sample_rate)
+    if len(audio) <= limit:
+        return [(0, audio)]
+
+    cut_points = [(start + end) // 2 for start, end in find_silences(audio, sample_rate=sample_rate, **silence_options)]
+    chunks = []
+    offset = 0
+    while len(audio) - offset > limit:
+        target = offset + limit
+        # Silence le plus tardif avant la limite, sinon coupe franche à la limite
+        candidates = [point for point in cut_points if offset + limit // 2 < point <= target]
+        cut = candidates[-1] if candidates else target
+        chunks.append((offset, audio[offset:cut]))
+        offset = cut
+    chunks.append((offset, audio[offset:]))
+    return chunks
@@ -0,0 +1,417 @@
+#!/usr/bin/env python3
+"""
+Benchmarks de charge CallX sur données synthétiques
+Trois scénarios, chacun dans son propre processus (mémoire de pointe mesurée
+séparément) et dans un dossier de travail temporaire :
+
+- ingestion : Aircall → téléchargement → transcription → GPT → journal, avec
+  faux Aircall et faux OpenAI (latence et taux d'erreur réglables) et un
+  transcripteur de substitution à facteur temps réel fixe (ou un vrai moteur)
+- aggregation : construction du dashboard à froid, au redémarrage, sans
+  changement, après un ajout, et requêtes filtrées par commercial
+- email : calcul des bilans du jour et envoi par le pool SMTP vers un faux serveur
+- table : table colonnaire d'une année d'appels pour des centaines de commerciaux
+  (classement, écarts, percentiles, moyennes quotidiennes), attendue bien sous la seconde
+
+Chaque scénario rapporte débit, latences p50/p99 et mémoire de pointe ; les
+mesures par étape (metrics.py) sont jointes. Les résultats sont écrits en JSON
+dans benchmarks/results/ et peuvent être comparés à un run précédent.
+
+    python -m benchmarks.bench_load --calls 200 --openai-latency 0.8 --compare benchmarks/results/<run>.json
+"""
+
+import os
+import sys
+import json
+import time
+import wave
+import random
+import shutil
+import platform
+import resource
+import argparse
+import tempfile
+import subprocess
+import contextlib
+import multiprocessing
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import metrics
+from benchmarks import synthetic
+from fake_services import FakeAircall, FakeOpenAI, FakeSMTP
+from transcription import TranscriptionBackend, SAMPLE_RATE
+
+RESULTS_DIR = os.path.join(ROOT, "benchmarks", "results")
+SCENARIOS = ("ingestion", "aggregation", "email", "table")
+
+
+def latency_summary(values):
+    """Latences exactes (secondes) : p50, p90, p99, moyenne, max"""
+    if not values:
+        return None
+    values = np.asarray(values, dtype=np.float64)
+    p50, p90, p99 = np.percentile(values, [50, 90, 99])
+    return {"count": len(values), "p50": round(float(p50), 4), "p90": round(float(p90), 4),
+            "p99": round(float(p99), 4), "mean": round(float(values.mean()), 4), "max": round(float(values.max()), 4)}
+
+
+def peak_rss_mb():
+    """Mémoire résidente de pointe du processus (ru_maxrss : Ko sous Linux, octets sous macOS)"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def timed(func, *args, **kwargs):
+    started = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - started
+
+
+class SyntheticTranscriber(TranscriptionBackend):
+    """Transcripteur de substitution : occupe `rtf` seconde par seconde d'audio et renvoie un texte synthétique"""
+
+    name = "synthetic"
+
+    def __init__(self, rtf=0.1, seed=0):
+        self.rtf = rtf
+        self.rng = random.Random(seed)
+
+    def transcribe(self, audio, language="fr"):
+        if isinstance(audio, str):
+            with wave.open(audio, 'rb') as f:
+                duration = f.getnframes() / f.getframerate()
+        else:
+            duration = len(audio) / SAMPLE_RATE
+        time.sleep(duration * self.rtf)
+        text = synthetic.transcript(self.rng, sentences=max(2, int(duration / 4)))
+        return {"text": text, "segments": [{"start": 0.0, "end": duration, "text": text}], "duration": duration}
+
+
+class SyntheticOpenAI(FakeOpenAI):
+    """Faux OpenAI dont chaque réponse est une analyse synthétique différente"""
+
+    def analysis_for(self, request):
+        return synthetic.analysis(self.rng)
+
+
+# Scénarios (exécutés dans le processus enfant, dossier courant = dossier de travail)
+
+def bench_ingestion(o):
+    from openai import OpenAI
+
+    import ingestion
+    from aircall_sync import AircallSync
+    from analysis_cache import AnalysisCache
+    from analysis_client import AnalysisExecutor
+    from ingestion import new_job, persist_analysis, pipeline_stages
+    from ledger import Ledger
+    from pipeline import run_pipeline
+    from transcription import get_backend
+
+    aircall = FakeAircall(recording_bytes=synthetic.recording(o.recording_seconds, seed=o.seed),
+                          latency=o.aircall_latency, error_rate=o.aircall_error_rate, seed=o.seed).start()
+    aircall.add_calls(synthetic.calls(o.calls, o.reps, o.days, recording_base=aircall.url, seed=o.seed))
+    openai_fake = SyntheticOpenAI(latency=o.openai_latency, error_rate=o.openai_error_rate, seed=o.seed).start()
+    try:
+        sync = AircallSync({}, base_url=aircall.url + "/v1", requests_per_minute=o.aircall_rpm)
+        calls, fetch_seconds = timed(sync.fetch_range, 0, int(time.time()))
+
+        ingestion.USE_VAD = o.vad
+        transcriber = get_backend(o.transcriber) if o.transcriber != "synthetic" else SyntheticTranscriber(o.rtf, o.seed)
+        analyzer = AnalysisExecutor(OpenAI(api_key="bench", base_url=openai_fake.url + "/v1"),
+                                    requests_per_minute=o.openai_rpm,
+                                    tokens_per_minute=o.openai_tpm, max_backoff=2)
+        ledger = Ledger()
+        latencies = []
+
+        def jobs():
+            for call in ledger.pending(calls):
+                job = new_job(call, ledger)
+                job["submitted_at"] = time.perf_counter()
+                yield job
+
+        def writer(job):
+            persist_analysis(job)
+            latencies.append(time.perf_counter() - job["submitted_at"])
+
+        stages = pipeline_stages(transcriber, analyzer, AnalysisCache() if o.cache else None,
+                                 o.download_workers, o.transcribe_workers, o.analyze_workers)
+        pipeline, seconds = timed(run_pipeline, jobs(), stages, writer, queue_size=o.queue_size)
+        return {
+            "items": len(latencies),
+            "seconds": round(seconds, 3),
+            "throughput": round(len(latencies) / seconds, 2) if seconds else None,
+            "latency": latency_summary(latencies),
+            "phases": {"fetch": {"calls": len(calls), "seconds": round(fetch_seconds, 3)}},
+            "errors": len(pipeline.errors),
+            "ledger": ledger.counts(),
+            "requests": {"aircall": aircall.requests_count, "openai": openai_fake.requests_count},
+        }
+    finally:
+        aircall.stop()
+        openai_fake.stop()
+
+
+def bench_aggregation(o):
+    from aggregates import DailyAggregates
+    from analysis_log import append_analysis
+    from generate_real_extracted_data import generate_real_only_dashboard, generate_filtered_dashboard
+
+    _, generate_seconds = timed(synthetic.write_analyses, "analyses", o.analyses, o.reps, o.days, seed=o.seed)
+
+    aggregates = DailyAggregates()
+    _, cold = timed(generate_real_only_dashboard, aggregates)
+    unchanged = [timed(generate_real_only_dashboard, aggregates)[1] for _ in range(o.repeat)]
+    # Redémarrage du processus : instantanés relus sur disque
+    _, restart = timed(generate_real_only_dashboard, DailyAggregates())
+
+    # Ajout d'une analyse au jour courant puis recalcul (cas du service de statistiques)
+    rng = random.Random(o.seed)
+    people = synthetic.reps(o.reps)
+    incremental = []
+    for i in range(o.repeat):
+        now = datetime.now()
+        append_analysis(synthetic.analysis(rng, rng.choice(people), call_id=5_000_000_000 + i, date=now),
+                        now.strftime('%Y-%m-%d'))
+        incremental.append(timed(generate_real_only_dashboard, aggregates)[1])
+
+    start = (datetime.now() - timedelta(days=7)).strftime('%Y-%m-%d')
+    filtered = [timed(generate_filtered_dashboard, start=start, assignee=rep["name"])[1]
+                for rep in people[:o.repeat]]
+    return {
+        "items": o.analyses,
+        "seconds": round(cold, 3),
+        "throughput": round(o.analyses / cold, 1) if cold else None,
+        "latency": latency_summary(incremental),
+        "phases": {
+            "generate_data": round(generate_seconds, 3),
+            "cold": round(cold, 3),
+            "restart": round(restart, 3),
+            "unchanged": latency_summary(unchanged),
+            "incremental": latency_summary(incremental),
+            "filtered_rep_7_days": latency_summary(filtered),
+        },
+    }
+
+
+def bench_email(o):
+    import daily_email
+    from smtp_delivery import SMTPPool, RetryQueue, DeliveryEngine
+
+    class TimedPool(SMTPPool):
+        latencies = []
+
+        def send(self, message):
+            started = time.perf_counter()
+            super().send(message)
+            self.latencies.append(time.perf_counter() - started)
+
+    # Analyses du jour uniquement (de minuit à maintenant)
+    now = datetime.now()
+    midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    synthetic.write_analyses("analyses", o.email_reps * o.calls_per_rep, o.email_reps,
+                             days=max((now - midnight).total_seconds(), 60) / 86400, end=now, seed=o.seed)
+    daily_email.EMAIL_USER = "bench@example.com"
+
+    def build():
+        messages = []
+        for email, analyses in daily_email.group_analyses_by_assignee(daily_email.get_today_analyses()).items():
+            stats = daily_email.calculate_daily_stats(analyses)
+            message = daily_email.build_daily_email(email, analyses[0]["name"], stats)
+            if message is not None:
+                messages.append(message)
+        return messages
+
+    messages, build_seconds = timed(build)
+    smtp = FakeSMTP(latency=o.smtp_latency, error_rate=o.smtp_error_rate, drop_after=o.smtp_drop_after,
+                    seed=o.seed).start()
+    # Faux serveur local sans TLS : texte clair accepté explicitement
+    pool = TimedPool("127.0.0.1", smtp.port, "bench", "bench", size=o.smtp_pool_size, timeout=10, starttls=False)
+    try:
+        engine = DeliveryEngine(pool, RetryQueue(), workers=o.smtp_pool_size, messages_per_minute=o.smtp_rate)
+        outcomes, seconds = timed(engine.send_all, messages)
+    finally:
+        pool.close()
+        smtp.stop()
+    sent = outcomes["sent"]
+    return {
+        "items": sent,
+        "seconds": round(seconds, 3),
+        "throughput": round(sent / seconds, 2) if seconds else None,
+        "latency": latency_summary(TimedPool.latencies),
+        "phases": {"build": {"messages": len(messages), "seconds": round(build_seconds, 3)}},
+        "outcomes": outcomes,
+        "smtp": {"connections": smtp.connections, "logins": smtp.logins, "received": len(smtp.received)},
+    }
+
+
+def bench_table(o):
+    from analysis_table import AnalysisTable
+
+    rng = random.Random(o.seed)
+    people = synthetic.reps(o.table_reps)
+    end = datetime.now()
+    analyses = [
+        synthetic.analysis(rng, rng.choice(people), call_id=6_000_000_000 + i,
+                           date=end - timedelta(seconds=rng.randint(0, 365 * 86400 - 1)))
+        for i in range(o.table_analyses)
+    ]
+    table, build_seconds = timed(AnalysisTable.from_analyses, analyses)
+    today = end.strftime('%Y-%m-%d')
+
+    def group_by():
+        table.leaderboard()
+        table.deltas(today)
+        table.percentiles()
+        table.daily_means(today, 30)
+
+    _, first = timed(group_by)
+    latencies = [timed(group_by)[1] for _ in range(o.repeat)]
+    return {
+        "items": len(analyses),
+        "seconds": round(first, 3),
+        "throughput": round(len(analyses) / first, 1) if first else None,
+        "latency": latency_summary(latencies),
+        "phases": {"build": round(build_seconds, 3), "reps": len(table.rep_names),
+                   "under_one_second": max(latencies + [first]) < 1.0},
+    }
+
+
+def run_scenario(name, options):
+    """Exécute un scénario dans un dossier temporaire ; mesures par étape et mémoire de pointe jointes"""
+    o = SimpleNamespace(**options)
+    workspace = tempfile.mkdtemp(prefix=f"xcall_bench_{name}_")
+    for directory in ("analyses", "mp3", "transcriptions"):
+        os.makedirs(os.path.join(workspace, directory))
+    os.chdir(workspace)
+    metrics.ENABLED = True
+    metrics.REGISTRY = metrics.Registry(log_file=os.path.join(workspace, "metrics.jsonl"))
+    try:
+        output = contextlib.nullcontext() if o.verbose else contextlib.redirect_stdout(open(os.devnull, 'w'))
+        with output:
+            result = globals()[f"bench_{name}"](o)
+        report = metrics.report()
+        result["stages"] = {"counters": report["counters"], "histograms": report["histograms"]}
+        result["peak_rss_mb"] = peak_rss_mb()
+        return result
+    finally:
+        os.chdir(ROOT)
+        if not o.keep:
+            shutil.rmtree(workspace, ignore_errors=True)
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(report, previous):
+    """Écarts de débit et de p99 par rapport à un run précédent"""
+    for name, current in report["scenarios"].items():
+        before = previous.get("scenarios", {}).get(name)
+        if not before or "error" in current or "error" in before:
+            continue
+        lines = []
+        if current.get("throughput") and before.get("throughput"):
+            lines.append(f"débit {(current['throughput'] / before['throughput'] - 1) * 100:+.1f}%")
+        if (current.get("latency") or {}).get("p99") and (before.get("latency") or {}).get("p99"):
+            lines.append(f"p99 {(current['latency']['p99'] / before['latency']['p99'] - 1) * 100:+.1f}%")
+        if current.get("peak_rss_mb") and before.get("peak_rss_mb"):
+            lines.append(f"RSS {current['peak_rss_mb'] - before['peak_rss_mb']:+.1f} Mo")
+        print(f"📈 {name} vs {previous.get('commit') or 'précédent'}: {', '.join(lines) or 'non comparable'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks de charge CallX (données synthétiques, faux services)")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--reps", type=int, default=10, help="Nombre de commerciaux")
+    parser.add_argument("--days", type=int, default=30, help="Période couverte par les données")
+    # Ingestion
+    parser.add_argument("--calls", type=int, default=100)
+    parser.add_argument("--recording-seconds", type=float, default=30)
+    parser.add_argument("--transcriber", default="synthetic", help="synthetic, whisper ou faster-whisper")
+    parser.add_argument("--rtf", type=float, default=0.02, help="Facteur temps réel du transcripteur synthétique")
+    parser.add_argument("--vad", action="store_true", help="Pré-filtre VAD (nécessite ffmpeg)")
+    parser.add_argument("--cache", action="store_true", help="Cache des analyses GPT")
+    parser.add_argument("--download-workers", type=int, default=4)
+    parser.add_argument("--transcribe-workers", type=int, default=1)
+    parser.add_argument("--analyze-workers", type=int, default=8)
+    parser.add_argument("--queue-size", type=int, default=8)
+    parser.add_argument("--aircall-latency", type=float, default=0.05)
+    parser.add_argument("--aircall-error-rate", type=float, default=0.0)
+    parser.add_argument("--aircall-rpm", type=int, default=6000)
+    parser.add_argument("--openai-latency", type=float, default=0.5)
+    parser.add_argument("--openai-error-rate", type=float, default=0.0)
+    parser.add_argument("--openai-rpm", type=int, default=5000)
+    parser.add_argument("--openai-tpm", type=int, default=10_000_000)
+    # Agrégation
+    parser.add_argument("--analyses", type=int, default=50000)
+    parser.add_argument("--repeat", type=int, default=10, help="Répétitions des mesures de latence")
+    # Table colonnaire : une année d'appels
+    parser.add_argument("--table-analyses", type=int, default=300000)
+    parser.add_argument("--table-reps", type=int, default=300)
+    # Email
+    parser.add_argument("--email-reps", type=int, default=100)
+    parser.add_argument("--calls-per-rep", type=int, default=20)
+    parser.add_argument("--smtp-latency", type=float, default=0.05)
+    parser.add_argument("--smtp-error-rate", type=float, default=0.0)
+    parser.add_argument("--smtp-drop-after", type=int, default=None)
+    parser.add_argument("--smtp-pool-size", type=int, default=4)
+    parser.add_argument("--smtp-rate", type=int, default=6000, help="Messages par minute")
+    # Résultats
+    parser.add_argument("--output", default=RESULTS_DIR, help="Dossier des résultats JSON")
+    parser.add_argument("--compare", help="Résultats JSON d'un run précédent")
+    parser.add_argument("--keep", action="store_true", help="Garde les dossiers de travail")
+    parser.add_argument("--verbose", action="store_true", help="Affiche la sortie des scripts")
+    args = parser.parse_args()
+
+    options = {key: value for key, value in vars(args).items() if key not in ("scenarios", "output", "compare")}
+    report = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "options": options,
+        "scenarios": {},
+    }
+    # Un processus neuf par scénario : la mémoire de pointe de l'un ne pollue pas l'autre
+    context = multiprocessing.get_context("spawn")
+    for name in args.scenarios:
+        print(f"🏁 Scénario {name}...")
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            try:
+                result = executor.submit(run_scenario, name, options).result()
+            except Exception as e:
+                print(f"❌ Scénario {name} en échec: {e}")
+                report["scenarios"][name] = {"error": str(e)}
+                continue
+        report["scenarios"][name] = result
+        latency = result["latency"] or {}
+        print(f"   {result['items']} en {result['seconds']}s - {result['throughput']}/s - "
+              f"p50 {latency.get('p50')}s p99 {latency.get('p99')}s - RSS max {result['peak_rss_mb']} Mo")
+
+    os.makedirs(args.output, exist_ok=True)
+    path = os.path.join(args.output, f"bench_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"💾 Résultats: {path}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            compare(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
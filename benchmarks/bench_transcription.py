@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Benchmark des moteurs de transcription CallX
+Mesure le facteur temps réel (temps de calcul / durée audio) et le WER de chaque
+moteur sur un jeu fixe d'enregistrements.
+
+Référence du WER : transcriptions/<même nom>.txt si présent, sinon la sortie du
+premier moteur de la liste (openai-whisper par défaut).
+
+    python -m benchmarks.bench_transcription mp3/*.mp3 --backends whisper faster-whisper
+"""
+
+import os
+import sys
+import json
+import time
+import string
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from transcription import get_backend
+
+_PUNCTUATION = str.maketrans({c: " " for c in string.punctuation + "«»…’"})
+
+
+def normalize_words(text):
+    """Minuscules, ponctuation retirée, découpage en mots"""
+    return text.lower().translate(_PUNCTUATION).split()
+
+
+def word_error_rate(reference, hypothesis):
+    """WER = (substitutions + suppressions + insertions) / nombre de mots de la référence"""
+    ref, hyp = normalize_words(reference), normalize_words(hypothesis)
+    if not ref:
+        return 0.0 if not hyp else 1.0
+    previous = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, 1):
+        current = [i] + [0] * len(hyp)
+        for j, hyp_word in enumerate(hyp, 1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ref_word != hyp_word))
+        previous = current
+    return previous[-1] / len(ref)
+
+
+def reference_for(recording, references_dir):
+    name = os.path.splitext(os.path.basename(recording))[0] + ".txt"
+    path = os.path.join(references_dir, name)
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return f.read()
+    return None
+
+
+def run(recordings, backends, references_dir="transcriptions", model_size=None, beam_size=None, threads=None):
+    report = {"recordings": len(recordings), "backends": {}}
+    outputs = {}
+    for backend_name in backends:
+        load_start = time.perf_counter()
+        backend = get_backend(backend_name, model_size=model_size, beam_size=beam_size, threads=threads)
+        load_time = time.perf_counter() - load_start
+
+        total_audio = total_compute = 0.0
+        per_file = []
+        for recording in recordings:
+            start = time.perf_counter()
+            result = backend.transcribe(recording, language="fr")
+            elapsed = time.perf_counter() - start
+            total_audio += result["duration"]
+            total_compute += elapsed
+            outputs.setdefault(recording, {})[backend_name] = result["text"]
+            per_file.append({"recording": recording, "duration": round(result["duration"], 2),
+                             "seconds": round(elapsed, 2),
+                             "rtf": round(elapsed / result["duration"], 3) if result["duration"] else None})
+
+        report["backends"][backend_name] = {
+            "load_seconds": round(load_time, 2),
+            "audio_seconds": round(total_audio, 1),
+            "compute_seconds": round(total_compute, 1),
+            "rtf": round(total_compute / total_audio, 3) if total_audio else None,
+            "files": per_file,
+        }
+
+    # WER par rapport à la référence humaine si elle existe, sinon au premier moteur
+    for backend_name in backends:
+        errors = []
+        for recording in recordings:
+            reference = reference_for(recording, references_dir) or outputs[recording][backends[0]]
+            errors.append(word_error_rate(reference, outputs[recording][backend_name]))
+        report["backends"][backend_name]["wer"] = round(sum(errors) / len(errors), 4) if errors else None
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark des moteurs de transcription CallX")
+    parser.add_argument("recordings", nargs="+", help="Fichiers audio du jeu de test")
+    parser.add_argument("--backends", nargs="+", default=["whisper", "faster-whisper"])
+    parser.add_argument("--references", default="transcriptions", help="Dossier des transcriptions de référence")
+    parser.add_argument("--model", default=None, help="Taille du modèle (tiny, base, small...)")
+    parser.add_argument("--beam", type=int, default=None)
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--output", help="Fichier JSON de résultats")
+    args = parser.parse_args()
+
+    report = run(args.recordings, args.backends, args.references, args.model, args.beam, args.threads)
+    for backend_name, stats in report["backends"].items():
+        print(f"🎙️ {backend_name}: RTF {stats['rtf']} - WER {stats['wer']} - chargement {stats['load_seconds']}s")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"💾 Résultats: {args.output}")
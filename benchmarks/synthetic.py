@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Données synthétiques pour les benchmarks CallX
+Appels Aircall, enregistrements WAV de durée réglable, transcriptions et
+analyses au format du journal (analyses/analyses_YYYY-MM-DD.jsonl), répartis
+sur M commerciaux et D jours. Tout est déterministe pour une même graine.
+
+    python -m benchmarks.synthetic /tmp/xcall_bench --analyses 100000 --reps 20 --days 90
+"""
+
+import io
+import os
+import sys
+import json
+import wave
+import random
+import argparse
+from datetime import datetime, timedelta
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analysis_log import log_path
+from fake_services import synthetic_calls, FIRST_NAMES, LAST_NAMES
+
+SAMPLE_RATE = 16000
+
+# Phrases réalistes : le vocabulaire limité reproduit la répétition des vraies analyses
+BLOCKERS = [
+    "Le client trouve l'offre trop chère", "Le client a déjà un prestataire", "Pas de budget cette année",
+    "Le décideur n'était pas présent", "Le client veut réfléchir", "Délai de démarrage trop long",
+    "Le client doute de la qualité des profils", "Le client n'a pas de besoin immédiat",
+]
+SUCCESSFUL_ARGUMENTS = [
+    "Expertise sectorielle", "Réactivité de l'équipe", "Références clients similaires",
+    "Garantie de remplacement", "Présentation claire du processus", "Tarif dégressif",
+]
+FAILED_ARGUMENTS = [
+    "Délai de placement", "Comparaison avec la concurrence", "Frais de dossier",
+    "Engagement sur douze mois", "Argument trop générique",
+]
+IMPROVEMENTS = [
+    "Clarifier les termes techniques", "Poser plus de questions ouvertes", "Reformuler le besoin du client",
+    "Proposer un rendez-vous de suivi", "Laisser davantage parler le client", "Préparer des références ciblées",
+    "Traiter l'objection prix plus tôt", "Conclure avec une prochaine étape précise",
+]
+SENTENCES = [
+    "Bonjour, je vous appelle au sujet de votre recherche de profils.",
+    "Est-ce que vous avez quelques minutes à m'accorder ?",
+    "Nous accompagnons plusieurs entreprises de votre secteur.",
+    "Quels sont vos besoins de recrutement pour les prochains mois ?",
+    "Je comprends, le budget est un point important.",
+    "Nous pouvons vous proposer une garantie de remplacement.",
+    "Je vous envoie une proposition par email dès aujourd'hui.",
+    "On peut fixer un rendez-vous la semaine prochaine ?",
+    "Nos délais de placement sont en moyenne de trois semaines.",
+    "Très bien, je note tout cela et je reviens vers vous.",
+]
+
+
+def reps(count):
+    """[{name, email}] de `count` commerciaux (mêmes noms que fake_services.synthetic_calls)"""
+    return [{"name": f"{FIRST_NAMES[i % 10]} {LAST_NAMES[(i // 10) % 10]}", "email": f"rep{i}@example.com"}
+            for i in range(count)]
+
+
+def calls(count, reps=10, days=30, end=None, recording_base=None, seed=0):
+    """Appels au format Aircall répartis sur les `days` derniers jours"""
+    end = int((end or datetime.now()).timestamp())
+    return synthetic_calls(count, end - days * 86400, end, reps=reps, recording_base=recording_base, seed=seed)
+
+
+def transcript(rng, sentences=40):
+    """Transcription d'environ `sentences` phrases"""
+    return " ".join(rng.choice(SENTENCES) for _ in range(sentences))
+
+
+def analysis(rng, rep=None, call_id=None, date=None, client_name=None):
+    """Analyse GPT synthétique ; avec `rep`/`date`, enregistrement complet comme persist_analysis"""
+    talk = rng.randint(35, 75)
+    record = {
+        "mood_global": str(min(10, max(1, round(rng.gauss(6.5, 1.8))))),
+        "temps_parole": f"{talk}% vendeur / {100 - talk}% client",
+        "blocages_client": rng.sample(BLOCKERS, rng.randint(0, 3)),
+        "arguments_reussis": rng.sample(SUCCESSFUL_ARGUMENTS, rng.randint(0, 3)),
+        "arguments_non_reussis": rng.sample(FAILED_ARGUMENTS, rng.randint(0, 2)),
+        "ameliorations": rng.sample(IMPROVEMENTS, rng.randint(1, 3)),
+    }
+    if rep is not None:
+        record.update({
+            "assignee_email": rep["email"],
+            "assignee_name": rep["name"],
+            "client_name": client_name or f"Client {rng.randint(0, 499)}",
+            "call_id": call_id,
+            "date": date.strftime('%Y-%m-%d %H:%M'),
+        })
+    return record
+
+
+def write_analyses(directory, count, rep_count=10, days=30, end=None, seed=0):
+    """
+    Écrit `count` analyses dans `directory` (un journal JSONL par jour, sur les `days`
+    derniers jours jusqu'à `end`) ; renvoie {jour: nombre d'analyses}
+    """
+    rng = random.Random(seed)
+    end = end or datetime.now()
+    people = reps(rep_count)
+    os.makedirs(directory, exist_ok=True)
+    by_day = {}
+    for i in range(count):
+        date = end - timedelta(seconds=rng.randint(0, max(1, int(days * 86400)) - 1))
+        record = analysis(rng, rng.choice(people), call_id=4_000_000_000 + i, date=date)
+        by_day.setdefault(date.strftime('%Y-%m-%d'), []).append(record)
+    for day, records in by_day.items():
+        records.sort(key=lambda record: record["date"])
+        with open(log_path(day, directory), 'a', encoding='utf-8') as f:
+            f.writelines(json.dumps(record, ensure_ascii=False) + "\n" for record in records)
+    return {day: len(records) for day, records in sorted(by_day.items())}
+
+
+def recording(seconds, speech_ratio=0.7, seed=0):
+    """
+    Enregistrement WAV mono 16 kHz de `seconds` secondes : rafales de « parole »
+    (sons modulés) séparées de blancs, `speech_ratio` de parole au total
+    """
+    rng = np.random.default_rng(seed)
+    samples = np.zeros(int(seconds * SAMPLE_RATE), dtype=np.float32)
+    position = 0
+    while position < len(samples):
+        burst = int(rng.uniform(1.0, 4.0) * SAMPLE_RATE)
+        gap = int(burst * (1 - speech_ratio) / max(speech_ratio, 1e-3))
+        t = np.arange(min(burst, len(samples) - position)) / SAMPLE_RATE
+        pitch = rng.uniform(110, 240)
+        samples[position:position + len(t)] = 0.3 * np.sin(2 * np.pi * pitch * t) * (0.6 + 0.4 * np.sin(2 * np.pi * 3 * t))
+        position += burst + gap
+    samples += rng.normal(0, 0.002, len(samples)).astype(np.float32)
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(SAMPLE_RATE)
+        f.writeframes((np.clip(samples, -1, 1) * 32767).astype(np.int16).tobytes())
+    return buffer.getvalue()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Génère un jeu d'analyses synthétiques CallX")
+    parser.add_argument("directory", help="Dossier de destination (les journaux vont dans <dossier>/analyses)")
+    parser.add_argument("--analyses", type=int, default=10000)
+    parser.add_argument("--reps", type=int, default=10)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--recording-seconds", type=float, default=0, help="Écrit aussi un enregistrement WAV de cette durée")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    days = write_analyses(os.path.join(args.directory, "analyses"), args.analyses, args.reps, args.days, seed=args.seed)
+    print(f"📝 {args.analyses} analyses sur {len(days)} jours dans {args.directory}/analyses")
+    if args.recording_seconds:
+        path = os.path.join(args.directory, "recording.wav")
+        with open(path, 'wb') as f:
+            f.write(recording(args.recording_seconds, seed=args.seed))
+        print(f"🎵 Enregistrement de {args.recording_seconds:.0f}s: {path}")
@@ -0,0 +1,45 @@
+// Flux SSE des mises à jour du dashboard, relayé depuis le service de statistiques Python
+const STATS_SERVICE_URL = process.env.STATS_SERVICE_URL || 'http://127.0.0.1:8000';
+
+export const config = {
+  api: { responseLimit: false }
+};
+
+export default async function handler(req, res) {
+  const controller = new AbortController();
+  req.on('close', () => controller.abort());
+
+  const query = new URLSearchParams();
+  if (req.query.since) query.set('since', req.query.since);
+  const headers = { Accept: 'text/event-stream' };
+  // EventSource renvoie le dernier id reçu quand il se reconnecte
+  if (req.headers['last-event-id']) headers['Last-Event-ID'] = req.headers['last-event-id'];
+
+  let upstream;
+  try {
+    upstream = await fetch(`${STATS_SERVICE_URL}/events?${query}`, { headers, signal: controller.signal });
+  } catch (error) {
+    console.log('⚠️ Service de statistiques indisponible pour le flux SSE:', error.message);
+    return res.status(503).json({ error: true, message: 'Service de statistiques indisponible' });
+  }
+
+  res.writeHead(200, {
+    'Content-Type': 'text/event-stream',
+    'Cache-Control': 'no-cache, no-transform',
+    Connection: 'keep-alive',
+    'X-Accel-Buffering': 'no'
+  });
+
+  const reader = upstream.body.getReader();
+  try {
+    while (true) {
+      const { done, value } = await reader.read();
+      if (done) break;
+      res.write(value);
+    }
+  } catch (error) {
+    // Client parti ou service arrêté : EventSource se reconnectera
+  } finally {
+    res.end();
+  }
+}
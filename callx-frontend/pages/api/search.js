@@ -0,0 +1,26 @@
+// Recherche plein texte dans les appels (transcriptions et analyses), relayée au service de statistiques Python
+const STATS_SERVICE_URL = process.env.STATS_SERVICE_URL || 'http://127.0.0.1:8000';
+
+export default async function handler(req, res) {
+  if (!req.query.q) {
+    return res.status(400).json({ error: true, message: 'Paramètre q manquant' });
+  }
+
+  const query = new URLSearchParams();
+  for (const key of ['q', 'rep', 'start', 'end', 'field', 'limit', 'offset']) {
+    if (req.query[key]) query.set(key, req.query[key]);
+  }
+
+  let response;
+  try {
+    response = await fetch(`${STATS_SERVICE_URL}/search?${query}`, { signal: AbortSignal.timeout(5000) });
+  } catch (error) {
+    console.log('⚠️ Service de statistiques indisponible pour la recherche:', error.message);
+    return res.status(503).json({ error: true, message: 'Service de statistiques indisponible' });
+  }
+
+  // Extraits déjà échappés côté Python : seuls les <mark> de surlignage sont du HTML
+  res.setHeader('Cache-Control', 'no-cache');
+  res.setHeader('Content-Type', 'application/json');
+  return res.status(response.status).send(Buffer.from(await response.arrayBuffer()));
+}
@@ -1,5 +1,39 @@
-export default function handler(req, res) {
-  // Lire UNIQUEMENT les vraies données
+// Service de statistiques Python (stats_service.py) : données en mémoire, toujours à jour
+const STATS_SERVICE_URL = process.env.STATS_SERVICE_URL || 'http://127.0.0.1:8000';
+
+async function proxyToStatsService(req, res) {
+  const query = new URLSearchParams();
+  for (const key of ['start', 'end', 'rep']) {
+    if (req.query[key]) query.set(key, req.query[key]);
+  }
+  const headers = { 'Accept-Encoding': 'identity' };
+  if (req.headers['if-none-match']) headers['If-None-Match'] = req.headers['if-none-match'];
+
+  const response = await fetch(`${STATS_SERVICE_URL}/stats?${query}`, {
+    headers,
+    signal: AbortSignal.timeout(5000)
+  });
+  const etag = response.headers.get('etag');
+  if (etag) res.setHeader('ETag', etag);
+  const version = response.headers.get('x-stats-version');
+  if (version) res.setHeader('X-Stats-Version', version);
+  res.setHeader('Cache-Control', 'no-cache');
+  if (response.status === 304) {
+    return res.status(304).end();
+  }
+  // Le corps JSON est relayé tel quel, sans être décodé ici
+  res.setHeader('Content-Type', 'application/json');
+  return res.status(response.status).send(Buffer.from(await response.arrayBuffer()));
+}
+
+export default async function handler(req, res) {
+  try {
+    return await proxyToStatsService(req, res);
+  } catch (error) {
+    console.log('⚠️ Service de statistiques indisponible, lecture de dashboard_data.json:', error.message);
+  }
+
+  // Repli : lire UNIQUEMENT les vraies données depuis le fichier généré
   let realData = null;
   try {
     const fs = require('fs');
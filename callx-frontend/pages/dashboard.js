@@ -1,10 +1,27 @@
 import { useState, useEffect, useMemo, memo } from 'react'
 import { useRouter } from 'next/router'
 
+// Applique un delta SSE : champs remplacés, lignes du classement et courbes fusionnées par commercial
+function applyDelta(previous, delta) {
+  if (!previous || previous.error) return previous
+  const rows = new Map((previous.weeklyLeaderboard || []).map(row => [row.name, row]))
+  for (const name of delta.leaderboardRemoved) rows.delete(name)
+  for (const row of delta.leaderboard) rows.set(row.name, row)
+  return {
+    ...previous,
+    ...delta.fields,
+    version: delta.version,
+    weeklyLeaderboard: [...rows.values()].sort((a, b) => a.rank - b.rank),
+    dailyScores: { ...(previous.dailyScores || {}), ...delta.dailyScores },
+    recentCalls: [...delta.calls, ...(previous.recentCalls || [])].slice(0, 20)
+  }
+}
+
 const Dashboard = memo(function Dashboard() {
   const [stats, setStats] = useState(null)
   const [loading, setLoading] = useState(true)
   const [authenticated, setAuthenticated] = useState(false)
+  const [version, setVersion] = useState(null)
   const router = useRouter()
 
   useEffect(() => {
@@ -22,6 +39,8 @@ const Dashboard = memo(function Dashboard() {
     try {
       const response = await fetch('/api/stats')
       const data = await response.json()
+      const statsVersion = response.headers.get('X-Stats-Version')
+      if (statsVersion) setVersion(Number(statsVersion))
       
       if (data.error) {
         setStats({ error: true, message: data.message, instructions: data.instructions })
@@ -36,6 +55,22 @@ const Dashboard = memo(function Dashboard() {
     }
   }
 
+  // Mises à jour en direct : petits deltas poussés par le service de statistiques (SSE)
+  useEffect(() => {
+    if (!authenticated || version === null || typeof EventSource === 'undefined') return
+    // since ne sert qu'à la première connexion : à la reconnexion, le Last-Event-ID envoyé par le navigateur l'emporte
+    const source = new EventSource(`/api/events?since=${version}`)
+    source.addEventListener('delta', (event) => {
+      const delta = JSON.parse(event.data)
+      setStats(previous => applyDelta(previous, delta))
+    })
+    source.addEventListener('snapshot', (event) => {
+      const data = JSON.parse(event.data)
+      setStats(data.error ? { error: true, message: data.message, instructions: data.instructions } : data)
+    })
+    return () => source.close()
+  }, [authenticated, version])
+
   // Stabiliser les données pour éviter les re-renders
   const stableStats = useMemo(() => {
     if (!stats) return null
@@ -48,7 +83,7 @@ const Dashboard = memo(function Dashboard() {
       suggestedImprovements: stats.suggestedImprovements || [],
       dailyScores: stats.dailyScores || {}
     }
-  }, [stats?.lastUpdated, stats?.realCallsCount])
+  }, [stats?.lastUpdated, stats?.realCallsCount, stats?.version])
 
   if (!authenticated) {
     return (
@@ -308,13 +343,12 @@ const Dashboard = memo(function Dashboard() {
                 ))}
               </div>
               
-              {/* Courbes pour chaque commercial */}
-              {[
-                { name: 'Clara', color: '#10b981', data: [8.2, 8.5, 8.1, 8.8, 9.0, 8.7, 9.1, 8.9, 9.2, 8.8, 9.0, 8.6, 9.1, 8.9, 9.3, 9.0, 8.8, 9.2, 9.1, 8.9, 9.0, 9.2, 8.8, 9.1, 9.0, 8.9, 9.2, 9.1, 8.8, 9.0] },
-                { name: 'Hugo', color: '#3b82f6', data: [7.8, 8.0, 7.9, 8.2, 8.4, 8.1, 8.6, 8.3, 8.5, 8.2, 8.4, 8.0, 8.5, 8.3, 8.6, 8.4, 8.2, 8.5, 8.4, 8.1, 8.3, 8.5, 8.2, 8.4, 8.3, 8.1, 8.4, 8.3, 8.0, 8.2] },
-                { name: 'Max', color: '#8b5cf6', data: [7.2, 7.4, 7.1, 7.6, 7.8, 7.5, 7.9, 7.6, 7.8, 7.5, 7.7, 7.3, 7.8, 7.6, 7.9, 7.7, 7.5, 7.8, 7.7, 7.4, 7.6, 7.8, 7.5, 7.7, 7.6, 7.4, 7.7, 7.6, 7.3, 7.5] },
-                { name: 'Sarah', color: '#f59e0b', data: [6.8, 7.0, 6.9, 7.2, 7.4, 7.1, 7.5, 7.2, 7.4, 7.1, 7.3, 6.9, 7.4, 7.2, 7.5, 7.3, 7.1, 7.4, 7.3, 7.0, 7.2, 7.4, 7.1, 7.3, 7.2, 7.0, 7.3, 7.2, 6.9, 7.1] }
-              ].map((agent, agentIndex) => (
+              {/* Courbes pour chaque commercial (scores moyens quotidiens réels, null = pas d'appel) */}
+              {Object.entries(stableStats.dailyScores).map(([name, data], index) => ({
+                name,
+                color: ['#10b981', '#3b82f6', '#8b5cf6', '#f59e0b', '#ef4444', '#06b6d4'][index % 6],
+                data
+              })).map((agent, agentIndex) => (
                 <div key={agent.name} style={{ position: 'relative' }}>
                   {/* Ligne de connexion */}
                   <svg style={{
@@ -327,10 +361,11 @@ const Dashboard = memo(function Dashboard() {
                   }}>
                     <polyline
                       points={agent.data.map((score, dayIndex) => {
+                        if (score === null) return null;
                         const x = (dayIndex / 29) * 100;
                         const y = 100 - ((score / 10) * 100);
                         return `${x}%,${y}%`;
-                      }).join(' ')}
+                      }).filter(Boolean).join(' ')}
                       fill="none"
                       stroke={agent.color}
                       strokeWidth="2"
@@ -340,6 +375,7 @@ const Dashboard = memo(function Dashboard() {
                   
                   {/* Points */}
                   {agent.data.map((score, dayIndex) => {
+                    if (score === null) return null;
                     const x = (dayIndex / 29) * 100;
                     const y = 100 - ((score / 10) * 100);
                     return (
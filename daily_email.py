@@ -6,7 +6,6 @@ Envoie un bilan personnalisé à chaque employé basé sur ses vraies données d
 
 import os
 import json
-import smtplib
 from datetime import datetime, timedelta
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
@@ -14,6 +13,13 @@ from collections import defaultdict
 import os
 from dotenv import load_dotenv
 
+import metrics
+
+from analysis_loader import load_analyses
+from phrase_clusters import NAMESPACES, default_clusters
+from rep_progress import default_progress
+from smtp_delivery import SMTPPool, RetryQueue, DeliveryEngine
+
 # Charger les variables d'environnement
 load_dotenv()
 
@@ -21,37 +27,27 @@ SMTP_SERVER = os.getenv('SMTP_SERVER', 'smtp.gmail.com')
 SMTP_PORT = int(os.getenv('SMTP_PORT', 587))
 EMAIL_USER = os.getenv('SMTP_USERNAME')
 EMAIL_PASSWORD = os.getenv('SMTP_PASSWORD')
+SMTP_POOL_SIZE = int(os.getenv('SMTP_POOL_SIZE', 4))
+SMTP_MESSAGES_PER_MINUTE = int(os.getenv('SMTP_MESSAGES_PER_MINUTE', 60))
 
 def get_today_analyses():
-    """Récupère toutes les analyses d'aujourd'hui (ou les plus récentes pour test)"""
+    """Récupère les analyses d'aujourd'hui (seuls les fichiers du jour sont ouverts)"""
     today = datetime.now().strftime('%Y-%m-%d')
-    analyses = []
     
-    # Pour le test, utiliser les analyses disponibles
     if not os.path.exists('analyses'):
         print("❌ Dossier 'analyses' non trouvé")
         return []
     
-    for file_name in os.listdir('analyses'):
-        # Nouveau format : analyses_YYYY-MM-DD.json
-        if file_name.startswith('analyses_') and file_name.endswith('.json'):
-            try:
-                with open(os.path.join('analyses', file_name), 'r', encoding='utf-8') as f:
-                    daily_analyses = json.load(f)
-                    analyses.extend(daily_analyses)
-            except Exception as e:
-                print(f"Erreur lecture {file_name}: {e}")
-        
-        # Ancien format : call_XXX_YYYY-MM-DD.json
-        elif file_name.startswith('call_') and file_name.endswith('.json'):
-            try:
-                with open(os.path.join('analyses', file_name), 'r', encoding='utf-8') as f:
-                    analysis = json.load(f)
-                    analyses.append(analysis)
-            except Exception as e:
-                print(f"Erreur lecture {file_name}: {e}")
-    
-    return analyses
+    return load_analyses(start=today, end=today)
+
+def load_trends():
+    """
+    Tendances par commercial (7/30 jours, EWMA) lues dans la série de progression
+
+    La série est tenue à jour à chaque analyse sauvegardée (ingestion.py) : aucun
+    instantané n'est relu ni recalculé ici, seul le jour courant compte pour ce job.
+    """
+    return default_progress().trends(datetime.now().strftime('%Y-%m-%d'))["reps"]
 
 def group_analyses_by_assignee(analyses):
     """Groupe les analyses par assigné"""
@@ -95,6 +91,14 @@ def calculate_daily_stats(analyses):
     
     avg_score = sum(scores) / len(scores) if scores else 0
     
+    # Phrases quasi identiques ramenées au libellé de leur groupe avant comptage
+    clusters = default_clusters()
+    if clusters:
+        for field, phrases in (('blockers', all_blockers), ('successful_args', all_successful_args),
+                               ('failed_args', all_failed_args), ('improvements', all_improvements)):
+            labels = clusters.labels(NAMESPACES[field], phrases)
+            phrases[:] = [labels[phrase] for phrase in phrases]
+    
     return {
         'total_calls': total_calls,
         'average_score': round(avg_score, 1),
@@ -120,6 +124,21 @@ def create_email_content(assignee_name, stats):
     # Meilleur score de la journée
     best_score = max(stats['scores']) if stats['scores'] else 0
     
+    # Tendance : semaine en cours vs précédente, 30 jours et EWMA (série de progression)
+    trend = stats.get('trend') or {}
+    trend_html = ''
+    if trend.get('score7Days') is not None:
+        delta = trend.get('delta')
+        change = f" ({delta:+} vs previous 7 days)" if delta is not None else ""
+        trend_html = f"""
+                <div class="section">
+                    <h3>📆 Your Trend</h3>
+                    <div class="trend-item">Last 7 days: <strong>{trend['score7Days']}/10</strong>{change}</div>
+                    <div class="trend-item">Last 30 days: <strong>{trend['score30Days']}/10</strong> over {trend['calls30Days']} calls</div>
+                    {f'<div class="trend-item">Smoothed score (recent calls weigh more): <strong>{trend["ewma"]}/10</strong></div>' if trend.get('ewma') is not None else ''}
+                </div>
+                """
+    
     html_content = f"""
     <!DOCTYPE html>
     <html>
@@ -138,6 +157,7 @@ def create_email_content(assignee_name, stats):
             .section {{ margin: 25px 0; }}
             .section h3 {{ color: #333; margin-bottom: 15px; font-size: 18px; }}
             .success-item {{ background: #e8f5e8; padding: 12px; margin: 8px 0; border-radius: 6px; border-left: 3px solid #28a745; }}
+            .trend-item {{ background: #f3e5f5; padding: 12px; margin: 8px 0; border-radius: 6px; border-left: 3px solid #764ba2; }}
             .improvement-item {{ background: #e3f2fd; padding: 12px; margin: 8px 0; border-radius: 6px; border-left: 3px solid #2196f3; }}
             .footer {{ background: #f8f9fa; padding: 20px; text-align: center; color: #666; font-size: 12px; }}
         </style>
@@ -179,6 +199,8 @@ def create_email_content(assignee_name, stats):
                 </div>
                 ''' if top_successful else ''}
                 
+                {trend_html}
+                
                 {f'''
                 <div class="section">
                     <h3>📈 AI Suggestions for Tomorrow</h3>
@@ -203,48 +225,47 @@ def create_email_content(assignee_name, stats):
     
     return html_content
 
-def send_daily_email(assignee_email, assignee_name, stats):
+def build_daily_email(assignee_email, assignee_name, stats):
+    """Construit l'email quotidien d'un assigné (None si rien à envoyer)"""
+    # Créer le contenu de l'email
+    html_content = create_email_content(assignee_name, stats)
+    if not html_content:
+        print(f"❌ Pas de contenu pour {assignee_name}")
+        return None
+    
+    # Configuration de l'email
+    msg = MIMEMultipart('alternative')
+    msg['Subject'] = f"📊 Your Daily Sales Report - {datetime.now().strftime('%B %d, %Y')}"
+    msg['From'] = EMAIL_USER
+    msg['To'] = assignee_email
+    
+    # Ajouter le contenu HTML
+    html_part = MIMEText(html_content, 'html', 'utf-8')
+    msg.attach(html_part)
+    return msg
+
+def create_smtp_pool():
+    """Pool de connexions SMTP authentifiées (SSL sur le port 465, STARTTLS sinon)"""
+    return SMTPPool(SMTP_SERVER, SMTP_PORT, EMAIL_USER, EMAIL_PASSWORD, size=SMTP_POOL_SIZE)
+
+def send_daily_email(assignee_email, assignee_name, stats, pool=None):
     """Envoie l'email quotidien à un assigné"""
+    msg = build_daily_email(assignee_email, assignee_name, stats)
+    if msg is None:
+        return False
+    
+    own_pool = pool is None
+    pool = pool or create_smtp_pool()
     try:
-        # Créer le contenu de l'email
-        html_content = create_email_content(assignee_name, stats)
-        if not html_content:
-            print(f"❌ Pas de contenu pour {assignee_name}")
-            return False
-        
-        # Configuration de l'email
-        msg = MIMEMultipart('alternative')
-        msg['Subject'] = f"📊 Your Daily Sales Report - {datetime.now().strftime('%B %d, %Y')}"
-        msg['From'] = EMAIL_USER
-        msg['To'] = assignee_email
-        
-        # Ajouter le contenu HTML
-        html_part = MIMEText(html_content, 'html', 'utf-8')
-        msg.attach(html_part)
-        
-        # Envoyer l'email avec timeout
-        print(f"🔄 Connexion SMTP à {SMTP_SERVER}:{SMTP_PORT}...")
-        
-        # Utiliser SSL pour le port 465
-        if SMTP_PORT == 465:
-            import ssl
-            context = ssl.create_default_context()
-            with smtplib.SMTP_SSL(SMTP_SERVER, SMTP_PORT, context=context, timeout=30) as server:
-                server.login(EMAIL_USER, EMAIL_PASSWORD)
-                server.send_message(msg)
-        else:
-            # Utiliser STARTTLS pour les autres ports
-            with smtplib.SMTP(SMTP_SERVER, SMTP_PORT, timeout=30) as server:
-                server.starttls()
-                server.login(EMAIL_USER, EMAIL_PASSWORD)
-                server.send_message(msg)
-        
+        pool.send(msg)
         print(f"✅ Email envoyé à {assignee_name} ({assignee_email})")
         return True
-        
     except Exception as e:
         print(f"❌ Erreur envoi email à {assignee_name}: {e}")
         return False
+    finally:
+        if own_pool:
+            pool.close()
 
 def main():
     """Fonction principale"""
@@ -258,22 +279,48 @@ def main():
     
     if not today_analyses:
         print("❌ Aucune analyse trouvée pour aujourd'hui")
-        return
+        if not len(RetryQueue()):
+            return
     
     # Grouper par assigné
     assignee_data = group_analyses_by_assignee(today_analyses)
     print(f"👥 {len(assignee_data)} employés à contacter")
     
-    # Envoyer les emails
-    success_count = 0
+    # Tendances de chacun, lues une fois pour tous les emails
+    trends = load_trends()
+    
+    # Préparer les emails
+    messages = []
     for assignee_email, analyses in assignee_data.items():
         assignee_name = analyses[0]['name']
         stats = calculate_daily_stats(analyses)
-        
-        if send_daily_email(assignee_email, assignee_name, stats):
-            success_count += 1
+        if stats:
+            stats['trend'] = trends.get(assignee_name)
+        msg = build_daily_email(assignee_email, assignee_name, stats)
+        if msg is not None:
+            messages.append(msg)
+    
+    # Envoi parallèle sur un pool de connexions ; les échecs (et ceux des runs
+    # précédents) passent par la file de reprise
+    print(f"🔄 Connexion SMTP à {SMTP_SERVER}:{SMTP_PORT} ({SMTP_POOL_SIZE} connexions)...")
+    pool = create_smtp_pool()
+    retry_queue = RetryQueue()
+    try:
+        engine = DeliveryEngine(pool, retry_queue, workers=SMTP_POOL_SIZE, messages_per_minute=SMTP_MESSAGES_PER_MINUTE)
+        outcomes = engine.send_all(messages)
+    finally:
+        pool.close()
     
-    print(f"\n✅ {success_count}/{len(assignee_data)} emails envoyés avec succès")
+    print(f"\n✅ {outcomes['sent']}/{sum(outcomes.values())} emails envoyés avec succès")
+    if outcomes['queued']:
+        print(f"📥 {outcomes['queued']} email(s) en file de reprise ({len(retry_queue)} au total)")
+    if outcomes['uncertain']:
+        print(f"⚠️ {outcomes['uncertain']} email(s) peut-être déjà reçu(s), non renvoyé(s)")
+    if outcomes['abandoned']:
+        print(f"🗑️ {outcomes['abandoned']} email(s) abandonné(s) après trop de tentatives")
+    report_path = metrics.write_report("daily_email")
+    if report_path:
+        print(f"📏 Mesures du run: {report_path}")
     print("=" * 60)
 
 if __name__ == "__main__":
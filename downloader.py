@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Téléchargement des enregistrements Aircall pour CallX
+Session HTTP partagée (une connexion par hôte réutilisée), écriture en streaming
+dans un fichier temporaire, reprise par HTTP Range et renommage atomique.
+Seules les coupures réseau et les réponses 5xx (ou 408/429) sont retentées :
+une 4xx (lien expiré, enregistrement supprimé) échoue tout de suite.
+"""
+
+import os
+import time
+import requests
+from requests.adapters import HTTPAdapter
+
+CHUNK_SIZE = 256 * 1024
+
+# Codes 4xx qui valent quand même un nouvel essai (délai dépassé, limite de débit)
+RETRYABLE_CLIENT_STATUS = {408, 429}
+
+
+class DownloadError(Exception):
+    """Téléchargement impossible après toutes les tentatives"""
+
+
+class RecordingDownloader:
+    """Télécharge des fichiers en streaming via un pool de connexions partagé"""
+
+    def __init__(self, pool_size=8, timeout=30, retries=3, chunk_size=CHUNK_SIZE):
+        self.timeout = timeout
+        self.retries = retries
+        self.chunk_size = chunk_size
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def download(self, url, destination):
+        """
+        Télécharge `url` vers `destination` et renvoie la taille en octets
+
+        Les octets arrivent dans `destination.part` ; après une coupure, la tentative
+        suivante reprend à la fin du fichier partiel avec un en-tête Range. Le fichier
+        final n'apparaît qu'une fois la taille vérifiée contre Content-Length.
+        """
+        partial = destination + ".part"
+        # Le dossier (mp3/) peut ne pas exister sur une installation neuve
+        if os.path.dirname(destination):
+            os.makedirs(os.path.dirname(destination), exist_ok=True)
+        last_error = None
+        for attempt in range(self.retries + 1):
+            try:
+                size = self._fetch(url, partial)
+                os.replace(partial, destination)
+                return size
+            except (requests.RequestException, DownloadError) as e:
+                if not _retryable(e):
+                    raise DownloadError(f"{url}: {e}") from e
+                last_error = e
+                print(f"⚠️ Téléchargement interrompu ({attempt + 1}/{self.retries + 1}): {e}")
+                if attempt < self.retries:
+                    time.sleep(min(2 ** attempt, 10))
+        raise DownloadError(f"{url}: {last_error}")
+
+    def _fetch(self, url, partial):
+        offset = os.path.getsize(partial) if os.path.exists(partial) else 0
+        request_headers = {"Range": f"bytes={offset}-"} if offset else {}
+
+        with self.session.get(url, headers=request_headers, stream=True, timeout=self.timeout) as response:
+            if response.status_code == 416:
+                # Le fichier partiel est déjà complet (ou invalide) : on repart de zéro
+                os.remove(partial)
+                raise DownloadError("Range non satisfiable")
+            response.raise_for_status()
+
+            if offset and response.status_code != 206:
+                # Le serveur ignore Range : on réécrit tout
+                offset = 0
+            expected = _expected_size(response, offset)
+
+            with open(partial, 'ab' if offset else 'wb') as f:
+                for chunk in response.iter_content(chunk_size=self.chunk_size):
+                    if chunk:
+                        f.write(chunk)
+
+        size = os.path.getsize(partial)
+        if expected is not None and size != expected:
+            raise DownloadError(f"taille {size} au lieu de {expected} octets")
+        if size == 0:
+            os.remove(partial)
+            raise DownloadError("fichier vide")
+        return size
+
+
+def _retryable(error):
+    """Coupure réseau, fichier incomplet ou erreur serveur : un nouvel essai a une chance d'aboutir"""
+    if isinstance(error, requests.HTTPError) and error.response is not None:
+        status = error.response.status_code
+        return status >= 500 or status in RETRYABLE_CLIENT_STATUS
+    return True
+
+
+def _expected_size(response, offset):
+    """Taille totale attendue d'après Content-Range ou Content-Length"""
+    content_range = response.headers.get("Content-Range")
+    if response.status_code == 206 and content_range and "/" in content_range:
+        total = content_range.rsplit("/", 1)[1]
+        if total.isdigit():
+            return int(total)
+    content_length = response.headers.get("Content-Length")
+    if content_length and content_length.isdigit() and "Content-Encoding" not in response.headers:
+        return offset + int(content_length)
+    return None
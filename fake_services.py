@@ -0,0 +1,460 @@
+#!/usr/bin/env python3
+"""
+Faux services locaux pour CallX (développement et rejeu de charge)
+FakeAircall : API /v1/calls paginée sur des milliers d'appels synthétiques,
+avec limite de débit et enregistrements téléchargeables
+FakeOpenAI : /v1/chat/completions avec latence, erreurs 5xx et 429 simulés
+FakeSMTP : serveur SMTP local qui garde les messages reçus, avec coupures simulées
+"""
+
+import json
+import base64
+import random
+import socketserver
+import threading
+import time
+from email import message_from_bytes
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+FIRST_NAMES = ["Louan", "Camille", "Hugo", "Léa", "Nathan", "Chloé", "Lucas", "Inès", "Jules", "Manon"]
+LAST_NAMES = ["Bardou", "Martin", "Bernard", "Dubois", "Moreau", "Laurent", "Simon", "Michel", "Lefèvre", "Garcia"]
+
+
+def synthetic_calls(count, start, end, reps=10, recording_base=None, seed=0):
+    """Génère `count` appels au format Aircall répartis entre `start` et `end` (timestamps)"""
+    rng = random.Random(seed)
+    users = [
+        {"id": 1000 + i, "name": f"{FIRST_NAMES[i % 10]} {LAST_NAMES[(i // 10) % 10]}",
+         "email": f"rep{i}@example.com"}
+        for i in range(reps)
+    ]
+    calls = []
+    for i in range(count):
+        started_at = rng.randint(start, end)
+        duration = rng.randint(20, 1800)
+        call_id = 3_000_000_000 + i
+        calls.append({
+            "id": call_id,
+            "direction": rng.choice(["inbound", "outbound"]),
+            "status": "done",
+            "started_at": started_at,
+            "ended_at": started_at + duration,
+            "duration": duration,
+            "user": rng.choice(users),
+            "contact": {"name": f"Client {i % 500}"} if rng.random() > 0.2 else None,
+            "recording": f"{recording_base}/recordings/{call_id}.mp3" if recording_base and rng.random() > 0.1 else None,
+        })
+    calls.sort(key=lambda call: (call["started_at"], call["id"]))
+    return calls
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256
+
+
+class FakeService:
+    """Base commune : serveur HTTP local dans un thread, démarré par start()"""
+
+    handler_class = None
+
+    def __init__(self, latency=0.0, error_rate=0.0, requests_per_minute=None, seed=0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.requests_per_minute = requests_per_minute
+        self._window = []
+        self.rng = random.Random(seed)
+        self.requests_count = 0
+        self._lock = threading.Lock()
+        self._server = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self, host="127.0.0.1", port=0):
+        service = self
+
+        class Handler(self.handler_class):
+            pass
+        Handler.service = service
+        self._server = _Server((host, port), Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def _count(self):
+        with self._lock:
+            self.requests_count += 1
+            fail = self.rng.random() < self.error_rate
+        if self.latency:
+            time.sleep(self.latency)
+        return fail
+
+    def _allow(self):
+        if not self.requests_per_minute:
+            return True
+        with self._lock:
+            now = time.monotonic()
+            self._window = [t for t in self._window if now - t < 60]
+            if len(self._window) >= self.requests_per_minute:
+                return False
+            self._window.append(now)
+            return True
+
+
+class _JSONHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    service = None
+
+    def log_message(self, *args):
+        pass
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class _AircallHandler(_JSONHandler):
+
+    def do_GET(self):
+        service = self.service
+        fail = service._count()
+        parsed = urlparse(self.path)
+
+        if parsed.path.startswith("/recordings/"):
+            return self._send_recording(parsed.path)
+        if parsed.path != "/v1/calls" and not parsed.path.startswith("/v1/calls/"):
+            return self._send_json(404, {"error": "Not found"})
+        if not service._allow():
+            return self._send_json(429, {"error": "Too many requests"}, {"Retry-After": "1"})
+        if fail:
+            return self._send_json(503, {"error": "Service unavailable"})
+        if parsed.path.startswith("/v1/calls/"):
+            call_id = parsed.path.rsplit("/", 1)[1]
+            call = next((call for call in service.calls if str(call["id"]) == call_id), None)
+            if call is None:
+                return self._send_json(404, {"error": "Not found"})
+            return self._send_json(200, {"call": call})
+
+        query = {k: v[0] for k, v in parse_qs(parsed.query).items()}
+        page = int(query.get("page", 1))
+        per_page = min(int(query.get("per_page", 20)), 50)
+        start = int(query.get("from", 0))
+        end = int(query.get("to", 2 ** 40))
+
+        selected = [call for call in service.calls if start <= call["started_at"] <= end]
+        if query.get("order", "asc") == "desc":
+            selected.reverse()
+        total = len(selected)
+        if page * per_page > 10000:
+            return self._send_json(400, {"error": "Pagination limited to 10000 items"})
+        page_calls = selected[(page - 1) * per_page:page * per_page]
+        has_next = page * per_page < total
+        self._send_json(200, {
+            "calls": page_calls,
+            "meta": {
+                "count": len(page_calls),
+                "total": total,
+                "current_page": page,
+                "per_page": per_page,
+                "next_page_link": f"{service.url}/v1/calls?page={page + 1}" if has_next else None,
+                "previous_page_link": f"{service.url}/v1/calls?page={page - 1}" if page > 1 else None,
+            },
+        })
+
+    def _send_recording(self, path):
+        service = self.service
+        body = service.recording_bytes
+        requested = self.headers.get("Range")
+        with service._lock:
+            service.ranges.append(requested)
+            truncate = service.truncate_recordings > 0
+            service.truncate_recordings -= truncate
+        start = 0
+        if requested and service.range_requests and requested.startswith("bytes=") and requested.endswith("-"):
+            start = int(requested[len("bytes="):-1])
+        if start >= len(body) and start:
+            self.send_response(416)
+            self.send_header("Content-Range", f"bytes */{len(body)}")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(206 if start else 200)
+        self.send_header("Content-Type", "audio/mpeg")
+        self.send_header("Content-Length", str(len(body) - start))
+        if start:
+            self.send_header("Content-Range", f"bytes {start}-{len(body) - 1}/{len(body)}")
+        self.end_headers()
+        if truncate:
+            # Coupure au milieu du corps : moins d'octets que Content-Length annonce
+            self.wfile.write(body[start:start + (len(body) - start) // 2])
+            self.wfile.flush()
+            self.close_connection = True
+            return
+        self.wfile.write(body[start:])
+
+
+class FakeAircall(FakeService):
+    """
+    Faux Aircall : /v1/calls (from, to, order, page, per_page), /v1/calls/<id> et /recordings/<id>.mp3
+
+    `requests_per_minute` reproduit la limite de l'API (429 + Retry-After). Les
+    enregistrements acceptent Range (206 + Content-Range) sauf si `range_requests` est faux.
+    """
+
+    handler_class = _AircallHandler
+
+    def __init__(self, calls=None, recording_bytes=b"\x00" * 1024, range_requests=True, **kwargs):
+        super().__init__(**kwargs)
+        self.calls = sorted(calls or [], key=lambda call: (call["started_at"], call["id"]))
+        self.recording_bytes = recording_bytes
+        self.range_requests = range_requests  # False : Range ignoré, toujours 200 avec le fichier entier
+        self.truncate_recordings = 0          # prochains enregistrements coupés à mi-corps
+        self.ranges = []                      # en-têtes Range reçus (None sans Range)
+
+    def add_calls(self, calls):
+        with self._lock:
+            self.calls = sorted(self.calls + list(calls), key=lambda call: (call["started_at"], call["id"]))
+
+    def send_webhook(self, url, call, event="call.ended", token="test-token"):
+        """Envoie à `url` le webhook Aircall d'un appel (format {resource, event, token, data})"""
+        import requests
+        payload = {"resource": "call", "event": event, "timestamp": int(time.time()), "token": token, "data": call}
+        return requests.post(url, json=payload, timeout=10)
+
+
+SAMPLE_ANALYSIS = {
+    "mood_global": "7",
+    "temps_parole": "60% vendeur / 40% client",
+    "blocages_client": ["Le client trouve l'offre trop chère"],
+    "arguments_reussis": ["Expertise sectorielle"],
+    "arguments_non_reussis": ["Délai de placement"],
+    "ameliorations": ["Clarifier les termes techniques", "Poser plus de questions ouvertes"],
+}
+
+
+class _OpenAIHandler(_JSONHandler):
+
+    def do_POST(self):
+        service = self.service
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        if urlparse(self.path).path.rstrip("/") != "/v1/chat/completions":
+            return self._send_json(404, {"error": {"message": "Not found"}})
+        if not service._allow():
+            return self._send_json(429, {"error": {"message": "Rate limit reached", "type": "requests"}},
+                                   {"retry-after": str(service.retry_after)})
+        if service._count():
+            return self._send_json(500, {"error": {"message": "Internal error", "type": "server_error"}})
+
+        prompt_tokens = sum(len(m.get("content", "")) for m in request.get("messages", [])) // 4
+        content = json.dumps(service.analysis_for(request), ensure_ascii=False)
+        self._send_json(200, {
+            "id": f"chatcmpl-{service.requests_count}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "gpt-4"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": len(content) // 4,
+                      "total_tokens": prompt_tokens + len(content) // 4},
+        })
+
+
+class FakeOpenAI(FakeService):
+    """
+    Faux OpenAI compatible avec le SDK : OpenAI(api_key="test", base_url=fake.url + "/v1")
+
+    `latency` (s) par requête, `error_rate` de réponses 500, `requests_per_minute`
+    au-delà duquel le serveur répond 429 avec retry-after.
+    """
+
+    handler_class = _OpenAIHandler
+
+    def __init__(self, retry_after=1, analysis=None, **kwargs):
+        super().__init__(**kwargs)
+        self.retry_after = retry_after
+        self.analysis = analysis or SAMPLE_ANALYSIS
+
+    def analysis_for(self, request):
+        return self.analysis
+
+
+class _SMTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 256
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    """Sous-ensemble de SMTP : EHLO, AUTH PLAIN/LOGIN, MAIL, RCPT, DATA, RSET, NOOP, QUIT"""
+
+    service = None
+
+    def reply(self, line):
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        service = self.service
+        service.connections += 1
+        self.reply("220 fake-smtp ESMTP")
+        sender, recipients, sent_on_connection = None, [], 0
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode(errors="replace").strip()
+            verb = command.split(" ", 1)[0].upper()
+            if verb in ("EHLO", "HELO"):
+                self.wfile.write(b"250-fake-smtp\r\n250-AUTH PLAIN LOGIN\r\n250 8BITMIME\r\n")
+            elif verb == "AUTH":
+                self._auth(command)
+            elif verb == "MAIL":
+                if service._reject():
+                    # Refus temporaire avant DATA : le message n'est sûrement pas accepté
+                    self.reply("451 Temporary local problem, try again later")
+                    continue
+                sender, recipients = command.split(":", 1)[1].strip(), []
+                self.reply("250 OK")
+            elif verb == "RCPT":
+                recipients.append(command.split(":", 1)[1].strip().strip("<>"))
+                self.reply("250 OK")
+            elif verb == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                data = []
+                while True:
+                    chunk = self.rfile.readline()
+                    if not chunk or chunk in (b".\r\n", b".\n"):
+                        break
+                    data.append(chunk[1:] if chunk.startswith(b"..") else chunk)
+                if service._count():
+                    # Coupure simulée : le message n'est pas accepté
+                    return
+                service.received.append({"from": sender, "to": recipients,
+                                         "message": message_from_bytes(b"".join(data))})
+                sent_on_connection += 1
+                self.reply("250 OK queued")
+                if service.drop_after and sent_on_connection >= service.drop_after:
+                    # Le serveur ferme la connexion sans prévenir (comme après un délai d'inactivité)
+                    return
+            elif verb == "RSET":
+                sender, recipients = None, []
+                self.reply("250 OK")
+            elif verb == "NOOP":
+                self.reply("250 OK")
+            elif verb == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+    def _auth(self, command):
+        parts = command.split()
+        if parts[1].upper() == "LOGIN":
+            for prompt in ("VXNlcm5hbWU6", "UGFzc3dvcmQ6"):
+                self.reply(f"334 {prompt}")
+                self.rfile.readline()
+        elif len(parts) < 3:
+            self.reply("334 ")
+            base64.b64decode(self.rfile.readline().strip() or b"")
+        self.service.logins += 1
+        self.reply("235 Authentication successful")
+
+
+class FakeSMTP(FakeService):
+    """
+    Faux serveur SMTP (sans TLS) qui accepte tout identifiant et garde les messages dans `received`
+
+    Il ne propose pas STARTTLS : les clients doivent l'accepter explicitement
+    (SMTPPool(..., starttls=False) ou SMTP_STARTTLS=0).
+
+    `error_rate` coupe la connexion pendant DATA au lieu d'accepter le message (issue
+    incertaine pour le client) ; `reject_rate` refuse temporairement (451) dès MAIL FROM ;
+    `drop_after` ferme la connexion après N messages pour tester la reconnexion.
+    """
+
+    def __init__(self, drop_after=None, reject_rate=0.0, **kwargs):
+        super().__init__(**kwargs)
+        self.drop_after = drop_after
+        self.reject_rate = reject_rate
+        self.received = []
+        self.connections = 0
+        self.logins = 0
+
+    @property
+    def port(self):
+        return self._server.server_address[1]
+
+    def _reject(self):
+        with self._lock:
+            return self.rng.random() < self.reject_rate
+
+    def start(self, host="127.0.0.1", port=0):
+        class Handler(_SMTPHandler):
+            pass
+        Handler.service = self
+        self._server = _SMTPServer((host, port), Handler)
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Faux services CallX")
+    parser.add_argument("service", choices=["aircall", "openai", "smtp"])
+    parser.add_argument("--port", type=int, default=8901)
+    parser.add_argument("--calls", type=int, default=1000)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--reps", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.0, help="Latence par requête (s)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Part de réponses 5xx")
+    parser.add_argument("--rpm", type=int, default=None, help="Limite de requêtes par minute (429 au-delà)")
+    args = parser.parse_args()
+
+    if args.service == "smtp":
+        smtp_fake = FakeSMTP(latency=args.latency, error_rate=args.error_rate)
+        smtp_fake.start(port=args.port)
+        print(f"📮 Faux SMTP sur 127.0.0.1:{smtp_fake.port}")
+        print(f"   SMTP_STARTTLS=0 SMTP_SERVER=127.0.0.1 SMTP_PORT={smtp_fake.port} python daily_email.py")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            smtp_fake.stop()
+        raise SystemExit
+
+    if args.service == "openai":
+        openai_fake = FakeOpenAI(requests_per_minute=args.rpm, latency=args.latency, error_rate=args.error_rate)
+        openai_fake.start(port=args.port)
+        print(f"🤖 Faux OpenAI sur {openai_fake.url}/v1")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            openai_fake.stop()
+        raise SystemExit
+
+    now = int(time.time())
+    aircall = FakeAircall(requests_per_minute=None)
+    aircall.start(port=args.port)
+    aircall.add_calls(synthetic_calls(args.calls, now - args.days * 86400, now, reps=args.reps, recording_base=aircall.url))
+    print(f"📡 Faux Aircall sur {aircall.url}/v1 ({args.calls} appels)")
+    print(f"   AIRCALL_API_URL={aircall.url}/v1 python Xcall.py")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        aircall.stop()
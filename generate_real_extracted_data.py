@@ -6,165 +6,153 @@ Aucune donnée inventée, simulée ou générée
 
 import os
 import json
-from datetime import datetime
-from collections import Counter
+from datetime import datetime, timedelta
+
+import metrics
+from aggregates import DailyAggregates
+from analysis_table import AnalysisTable, leaderboard_from_totals
+from analysis_loader import load_analyses
+from rep_progress import MIN_SCORED, WINDOWS, default_progress, empty_stats, window_stats
+from sketches import StreamingAggregator
 
 def get_real_analyses():
     """Récupère toutes les vraies analyses existantes (fichiers consolidés par jour)"""
-    real_analyses = []
-    
     if not os.path.exists("analyses"):
         print("❌ Dossier 'analyses' non trouvé")
         return []
     
-    for file in os.listdir("analyses"):
-        # Nouveau format : analyses_YYYY-MM-DD.json (fichiers consolidés)
-        if file.startswith("analyses_") and file.endswith(".json"):
-            try:
-                with open(f"analyses/{file}", 'r', encoding='utf-8') as f:
-                    daily_analyses = json.load(f)
-                    # daily_analyses est une liste d'analyses pour ce jour
-                    real_analyses.extend(daily_analyses)
-            except Exception as e:
-                print(f"❌ Erreur lecture {file}: {e}")
-        
-        # Ancien format : call_XXX_YYYY-MM-DD.json (pour compatibilité)
-        elif file.startswith("call_") and file.endswith(".json"):
-            try:
-                with open(f"analyses/{file}", 'r', encoding='utf-8') as f:
-                    analysis = json.load(f)
-                    real_analyses.append(analysis)
-            except Exception as e:
-                print(f"❌ Erreur lecture {file}: {e}")
-    
-    return real_analyses
+    return load_analyses()
 
 def extract_all_real_data(analyses):
-    """Extrait TOUTES les données réelles des analyses"""
-    if not analyses:
+    """Extrait TOUTES les données réelles des analyses, en un seul passage (liste ou générateur)"""
+    data = StreamingAggregator().consume(analyses).result()
+    if not data["calls"]:
         return None
     
-    # Scores réels
-    real_scores = []
-    real_assignees = []
-    real_assignee_scores = {}  # Pour lier assigné à son score
-    
-    for analysis in analyses:
-        try:
-            score_str = analysis.get("mood_global", "0").replace("/10", "").strip()
-            if score_str.isdigit():
-                score = int(score_str)
-                real_scores.append(score)
-                
-                assignee = analysis.get("assignee_name", "Unknown")
-                if assignee not in real_assignees:
-                    real_assignees.append(assignee)
-                    real_assignee_scores[assignee] = score
-        except:
-            pass
-    
-    # Améliorations réelles
-    real_improvements = []
-    for analysis in analyses:
-        improvements = analysis.get("ameliorations", [])
-        real_improvements.extend(improvements)
-    
-    # Blocages réels
-    real_blockers = []
-    for analysis in analyses:
-        blockers = analysis.get("blocages_client", [])
-        real_blockers.extend(blockers)
-    
-    # Arguments réussis réels
-    real_successful_args = []
-    for analysis in analyses:
-        successful_args = analysis.get("arguments_reussis", [])
-        real_successful_args.extend(successful_args)
-    
-    # Arguments non réussis réels
-    real_failed_args = []
-    for analysis in analyses:
-        failed_args = analysis.get("arguments_non_reussis", [])
-        real_failed_args.extend(failed_args)
-    
-    return {
-        "scores": real_scores,
-        "assignees": real_assignees,
-        "assignee_scores": real_assignee_scores,
-        "improvements": real_improvements,
-        "blockers": real_blockers,
-        "successful_args": real_successful_args,
-        "failed_args": real_failed_args,
-        "total_calls": len(analyses)
+    data["assignees"] = list(data["reps"])
+    data["assignee_scores"] = {
+        name: round(rep["score_sum"] / rep["scored"], 1)
+        for name, rep in data["reps"].items() if rep["scored"]
     }
+    return data
 
-def calculate_average_progression(data):
-    """Calcule la progression moyenne basée sur les vraies données"""
-    if data["total_calls"] < 2:
-        return 0  # Pas assez de données pour calculer une progression
-    
-    # Pour l'instant, avec une seule analyse, on ne peut pas calculer de progression
-    # Quand il y aura plus d'analyses, on pourra comparer les scores dans le temps
-    return 0
-
-def calculate_best_progression(data):
-    """Calcule la meilleure progression basée sur les vraies données"""
-    if data["total_calls"] < 2:
-        return {"name": "", "progression": 0}  # Pas assez de données
-    
-    # Pour l'instant, avec une seule analyse, on ne peut pas calculer de progression
-    # Quand il y aura plus d'analyses, on pourra identifier qui progresse le plus
-    return {"name": "", "progression": 0}
+def calculate_average_progression(trends):
+    """Progression (%) du score moyen de l'équipe : 7 derniers jours vs 7 jours précédents"""
+    return trends["team"]["progression"] or 0
 
+def calculate_best_progression(trends, min_scored=MIN_SCORED):
+    """Commercial qui a le plus progressé (%) sur 7 jours, avec assez d'appels notés sur chaque semaine"""
+    candidates = [
+        (stats["progression"], name) for name, stats in trends["reps"].items()
+        if stats["progression"] is not None
+        and stats["scored7Days"] >= min_scored and stats["scoredPrevious7Days"] >= min_scored
+    ]
+    if not candidates:
+        return {"name": "", "progression": 0}  # Pas assez de données sur les deux semaines
+    progression, name = max(candidates)
+    return {"name": name, "progression": progression}
 
+def with_error_bound(entry, sketch, phrase):
+    """Ajoute la marge d'erreur d'un compte approché (rien si le compte est exact)"""
+    error = sketch.error(phrase)
+    if error:
+        entry["countError"] = error
+    return entry
 
-def generate_real_only_dashboard():
+def generate_real_only_dashboard(aggregates=None):
     """Génère le dashboard avec UNIQUEMENT les vraies données extraites"""
     
     print("🔄 Extraction des vraies données des analyses...")
     
-    # Récupérer les vraies analyses
-    real_analyses = get_real_analyses()
+    # Instantanés par jour : seuls les jours dont les fichiers ont changé sont recalculés
+    aggregates = aggregates or DailyAggregates()
+    with metrics.timer("dashboard_stage_seconds", stage="snapshots"):
+        changed_days = aggregates.refresh()
+    metrics.incr("dashboard_days_rebuilt", len(changed_days))
+    print(f"🗂️ {len(changed_days)} jour(s) recalculé(s) sur {len(aggregates.days())}")
     
-    if not real_analyses:
+    if not aggregates.days():
         print("❌ Aucune analyse réelle trouvée")
         return None
     
-    print(f"📊 {len(real_analyses)} analyses réelles trouvées")
-    
-    # Extraire toutes les données réelles
-    data = extract_all_real_data(real_analyses)
-    
-    if not data:
-        print("❌ Impossible d'extraire les données")
+    # Fusion des instantanés en un passage : totaux exacts, top phrases en mémoire bornée
+    with metrics.timer("dashboard_stage_seconds", stage="merge"):
+        aggregator = StreamingAggregator()
+        for day in aggregates.days():
+            aggregator.add_snapshot(aggregates.snapshot(day))
+        data = aggregator.result()
+    print(f"📊 {data['total_calls']} analyses réelles trouvées")
+    
+    # Fenêtres glissantes : 7 derniers jours, 7 jours précédents, 30 jours
+    today = datetime.now().strftime('%Y-%m-%d')
+    previous_end = (datetime.now() - timedelta(days=7)).strftime('%Y-%m-%d')
+    current_week = aggregates.window(today, 7)
+    previous_week = aggregates.window(previous_end, 7)
+    
+    # Progression par commercial : série compacte alignée sur les seuls jours modifiés
+    progress = default_progress()
+    with metrics.timer("dashboard_stage_seconds", stage="progress"):
+        progress.sync(aggregates)
+        trends = progress.trends(today)
+    
+    # Classement vectorisé sur les totaux par commercial des instantanés ; écarts 7 jours de la série
+    # Graphique et percentiles 30 jours : série par commercial et histogrammes de l'index, sans relire les analyses
+    with metrics.timer("dashboard_stage_seconds", stage="assemble"):
+        deltas = {name: stats["delta"] for name, stats in trends["reps"].items() if stats["delta"] is not None}
+        return assemble_dashboard(data, leaderboard_from_totals(data["reps"]), deltas, current_week, previous_week,
+                                  progress.daily_means(today, 30), aggregates.percentiles(today, 30), trends)
+
+def table_trends(table, reference, ewma):
+    """Tendances 7/30 jours calculées sur la seule sélection filtrée ; EWMA (tout l'historique) reprise de `ewma`"""
+    totals = table.window_totals(reference, WINDOWS)
+    reps = {name: dict(window_stats(windows), ewma=ewma.get(name, {}).get("ewma"))
+            for name, windows in totals["reps"].items()}
+    return {"team": window_stats(totals["team"]), "reps": reps}
+
+def generate_filtered_dashboard(start=None, end=None, assignee=None):
+    """Dashboard restreint à une période ('YYYY-MM-DD' inclus) et/ou un commercial"""
+    analyses = load_analyses(start=start, end=end, assignee=assignee)
+    if not analyses:
         return None
     
-    # Calculer les moyennes réelles
-    avg_score = sum(data["scores"]) / len(data["scores"]) if data["scores"] else 0
-    
-    
-    # Classement hebdo UNIQUEMENT avec les vrais assignés et leurs vrais scores
-    real_leaderboard = []
-    for i, (assignee, score) in enumerate(data["assignee_scores"].items()):
-        real_leaderboard.append({
-            "rank": i + 1,
-            "name": assignee,
-            "score": score,
-            "delta": 0,  # Pas de données historiques
-            "feedback": ""  # Pas de feedback inventé
-        })
-    
-    # Trier par score décroissant
-    real_leaderboard.sort(key=lambda x: x["score"], reverse=True)
-    for i, agent in enumerate(real_leaderboard):
-        agent["rank"] = i + 1
+    data = StreamingAggregator().consume(analyses).result()
+    table = AnalysisTable.from_analyses(analyses)
+    reference = end or datetime.now().strftime('%Y-%m-%d')
+    previous_end = (datetime.strptime(reference, '%Y-%m-%d') - timedelta(days=7)).strftime('%Y-%m-%d')
+    month_start = (datetime.strptime(reference, '%Y-%m-%d') - timedelta(days=29)).strftime('%Y-%m-%d')
+    # Fenêtres et progressions sur les analyses de la période (start compris), pas sur toute la série
+    trends = table_trends(table, reference, default_progress().trends(reference)["reps"])
+    if assignee:
+        # Tendances du seul commercial filtré (la progression « équipe » devient la sienne) ;
+        # sans ligne dans la série, des statistiques vides plutôt que celles de l'équipe
+        reps = {name: trends["reps"].get(name) or empty_stats() for name in data["reps"]}
+        trends = {"team": next(iter(reps.values())) if len(reps) == 1 else empty_stats(), "reps": reps}
+    return assemble_dashboard(data, table.leaderboard(), table.deltas(reference), table.window(reference, 7),
+                              table.window(previous_end, 7), table.daily_means(reference, 30),
+                              table.percentiles(start=month_start, end=reference), trends)
+
+def assemble_dashboard(data, leaderboard, deltas, current_week, previous_week, daily_scores, percentiles, trends):
+    """
+    Met en forme le dashboard à partir des agrégats, du classement (déjà trié par score
+    moyen, toutes les notes de chaque commercial), des écarts 7 jours, des fenêtres 7 jours,
+    des séries 30 jours et des tendances
+    """
+    # Classement UNIQUEMENT avec les vrais assignés et leur score moyen réel
+    real_leaderboard = [{
+        "rank": entry["rank"],
+        "name": entry["name"],
+        "score": entry["score"],
+        "delta": deltas.get(entry["name"]) or 0,  # Moyenne 7 jours vs 7 jours précédents
+        "ewma": trends["reps"].get(entry["name"], {}).get("ewma"),  # Moyenne mobile exponentielle (notes récentes favorisées)
+        "feedback": ""  # Pas de feedback inventé
+    } for entry in leaderboard]
     
     # Blocages réels avec occurrences réelles
     main_blockers = []
     if data["blockers"]:
-        blocker_counts = Counter(data["blockers"])
+        blocker_counts = data["blockers"]
         main_blockers = [
-            {"label": blocker, "occurrences": count}
+            with_error_bound({"label": blocker, "occurrences": count}, blocker_counts, blocker)
             for blocker, count in blocker_counts.most_common(10)
         ]
     
@@ -172,10 +160,10 @@ def generate_real_only_dashboard():
     effective_arguments = []
     if data["successful_args"]:
         # Compter les arguments réussis
-        successful_counts = Counter(data["successful_args"])
+        successful_counts = data["successful_args"]
         
         # Compter les arguments non réussis (tentatives échouées)
-        failed_counts = Counter(data["failed_args"])
+        failed_counts = data["failed_args"]
         
         # Pour chaque argument réussi, calculer le vrai success rate
         for arg, success_count in successful_counts.most_common(10):
@@ -189,53 +177,54 @@ def generate_real_only_dashboard():
             if total_attempts > 0:
                 success_rate = round((success_count / total_attempts) * 100)
                 
-                effective_arguments.append({
+                effective_arguments.append(with_error_bound({
                     "argument": arg,
                     "success_rate": f"{success_rate}%",
                     "context_sample": f"{success_count} succès sur {total_attempts} tentatives"
-                })
+                }, successful_counts, arg))
             else:
                 # Si pas d'échecs enregistrés, on assume que c'est 100% de succès
-                effective_arguments.append({
+                effective_arguments.append(with_error_bound({
                     "argument": arg,
                     "success_rate": "100%",
                     "context_sample": f"{success_count} succès (pas d'échecs enregistrés)"
-                })
+                }, successful_counts, arg))
     
     # Arguments non efficaces réels
     failed_arguments = []
     if data["failed_args"]:
-        failed_counts = Counter(data["failed_args"])
+        failed_counts = data["failed_args"]
         for arg, count in failed_counts.most_common(5):
-            failed_arguments.append({
+            failed_arguments.append(with_error_bound({
                 "argument": arg,
                 "failure_rate": "100%",  # Basé sur analyse réelle
                 "context_sample": f"Échoué {count} fois"
-            })
+            }, failed_counts, arg))
     
     # Améliorations réelles
     suggested_improvements = []
     if data["improvements"]:
-        improvement_counts = Counter(data["improvements"])
+        improvement_counts = data["improvements"]
         for improvement, count in improvement_counts.most_common(10):
-            suggested_improvements.append({
+            suggested_improvements.append(with_error_bound({
                 "improvement": improvement,
                 "linked_to": f"Suggéré {count} fois par GPT"
-            })
+            }, improvement_counts, improvement))
     
     # Données dashboard 100% réelles
     dashboard_data = {
         # Performance collective (vraies données uniquement)
-        "averageScore7Days": round(avg_score, 1),
-        "averageScorePrevious7Days": 0,  # Pas de données historiques
-        "callsCount7Days": data["total_calls"],
-        "callsCountPrevious7Days": 0,  # Pas de données historiques
+        "averageScore7Days": current_week["average"],
+        "averageScorePrevious7Days": previous_week["average"],
+        "callsCount7Days": current_week["calls"],
+        "callsCountPrevious7Days": previous_week["calls"],
         
         # Classement hebdo (vraies données uniquement)
         "weeklyLeaderboard": real_leaderboard,
         
-        # Graphique 30 jours (vide car pas de données historiques)
-        "dailyScores": {},
+        # Graphique 30 jours : score moyen quotidien par commercial (None = pas d'appel)
+        "dailyScores": daily_scores,
+        "scorePercentiles30Days": percentiles,
         
         # Insights de la semaine (vraies données uniquement)
         "mainBlockers": main_blockers,
@@ -245,17 +234,17 @@ def generate_real_only_dashboard():
         "suggestedImprovements": suggested_improvements,
         
         # Métriques de progression (calculées à partir des vraies données)
-        "averageProgression": calculate_average_progression(data),
-        "bestProgression": calculate_best_progression(data),
+        "averageProgression": calculate_average_progression(trends),
+        "bestProgression": calculate_best_progression(trends),
         
         # Métadonnées
         "lastUpdated": datetime.now().strftime('%Y-%m-%d %H:%M'),
         "dataSource": "100% Données extraites des analyses GPT",
         "realCallsCount": data["total_calls"],
-        "realAssigneesCount": len(data["assignees"]),
-        "realBlockersCount": len(data["blockers"]),
-        "realArgumentsCount": len(data["successful_args"]),
-        "realImprovementsCount": len(data["improvements"]),
+        "realAssigneesCount": len(data["reps"]),
+        "realBlockersCount": data["blockers"].total,
+        "realArgumentsCount": data["successful_args"].total,
+        "realImprovementsCount": data["improvements"].total,
         "isRealExtractedData": True
     }
     
@@ -288,6 +277,9 @@ if __name__ == "__main__":
     print("=" * 60)
     
     success = save_real_extracted_data()
+    report_path = metrics.write_report("dashboard")
+    if report_path:
+        print(f"📏 Mesures du run: {report_path}")
     
     if success:
         print("\n✅ Dashboard configuré avec UNIQUEMENT des données réelles extraites")
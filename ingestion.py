@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+"""
+Étapes du traitement d'un appel Aircall pour CallX
+Téléchargement → transcription → analyse GPT → sauvegarde, utilisables
+en boucle séquentielle ou dans le pipeline (pipeline.py)
+"""
+
+import os
+import json
+import time
+from datetime import datetime
+
+from analysis_client import AnalysisFailed, RUN_USAGE
+from analysis_log import append_analysis
+from audio import load_audio
+from downloader import RecordingDownloader, DownloadError
+import metrics
+from pipeline import Stage, run_pipeline
+from prompts import plan_analysis
+from rep_progress import default_progress
+from search_index import default_index
+import vad
+
+# Pré-filtre VAD avant Whisper (XCALL_VAD=0 pour le désactiver)
+USE_VAD = os.getenv('XCALL_VAD', '1') == '1'
+# Index de recherche plein texte alimenté à chaque sauvegarde (XCALL_SEARCH=0 pour le désactiver)
+USE_SEARCH_INDEX = os.getenv('XCALL_SEARCH', '1') == '1'
+# Série de progression par commercial mise à jour à chaque sauvegarde (XCALL_PROGRESS=0 pour le désactiver)
+USE_PROGRESS = os.getenv('XCALL_PROGRESS', '1') == '1'
+
+def new_job(call, ledger=None):
+    """Extrait d'un appel Aircall les infos utiles au traitement (et son état dans le registre)"""
+    started_at = datetime.fromtimestamp(call["started_at"])
+    return {
+        "ledger": ledger,
+        "state": (ledger.get(call["id"]) if ledger else None) or {},
+        "call": call,
+        "call_id": call["id"],
+        "duration": call["duration"],
+        "started_at": started_at,
+        "day": started_at.strftime('%Y-%m-%d'),
+        "assignee": call["user"]["name"] if call["user"] else "Unknown",
+        "assignee_email": call["user"]["email"] if call["user"] else "Unknown",
+        "client_name": call["contact"]["name"] if call["contact"] else "Unknown",
+    }
+
+
+def download_recording(job, downloader):
+    """Télécharge l'enregistrement de l'appel dans mp3/ (streaming, reprise possible)"""
+    call = job["call"]
+    print(f"📞 Call {job['call_id']} - {job['client_name']} - {job['assignee']} - {job['assignee_email']}")
+
+    if not call.get("recording"):
+        print("🎵 Pas d'enregistrement")
+        _mark(job, "skipped", error="Pas d'enregistrement")
+        _skipped(job, "no_recording")
+        return None
+
+    filename = f"mp3/call_{job['call_id']}_{job['day']}.mp3"
+    if job["state"].get("downloaded_at") and os.path.exists(filename):
+        print(f"♻️ Déjà téléchargé: {filename}")
+        job["audio_path"] = filename
+        return job
+
+    started = time.perf_counter()
+    try:
+        size = downloader.download(call["recording"], filename)
+    except DownloadError as e:
+        print(f"❌ Erreur téléchargement: {filename} ({e})")
+        metrics.incr("errors", stage="download")
+        _park(job, f"Téléchargement: {e}")
+        return None
+    elapsed = time.perf_counter() - started
+    metrics.observe("download_seconds", elapsed)
+    metrics.observe("download_bytes_per_second", size / max(elapsed, 1e-6))
+
+    print(f"✅ Fichier téléchargé: {filename} ({size} bytes)")
+    job["audio_path"] = filename
+    _mark(job, "downloaded", audio_path=filename)
+    return job
+
+
+def transcribe_recording(job, transcriber):
+    """Transcrit l'enregistrement (moteur de transcription.py) et sauvegarde le texte"""
+    transcript_path = f"transcriptions/call_{job['call_id']}_{job['day']}.txt"
+    if job["state"].get("transcribed_at") and os.path.exists(transcript_path):
+        with open(transcript_path, 'r', encoding='utf-8') as f:
+            job["transcript"] = f.read()
+        print(f"♻️ Transcription reprise: {transcript_path}")
+        return job
+
+    started = time.perf_counter()
+    audio = job["audio_path"]
+    timeline = None
+    if USE_VAD:
+        audio = load_audio(job["audio_path"])
+        speech = vad.prefilter(audio)
+        vad.RUN_STATS.add(speech)
+        if speech["skip"]:
+            print(f"🔇 Enregistrement silencieux ({speech['speech_seconds']:.1f}s de parole), skip Whisper")
+            _mark(job, "skipped", error="Enregistrement silencieux")
+            _skipped(job, "silence")
+            return None
+        print(f"🔇 {speech['trim_ratio']:.0%} de blanc retiré ({speech['duration']:.0f}s → {speech['speech_seconds']:.0f}s)")
+        audio, timeline = speech["audio"], speech["timeline"]
+
+    result = transcriber.transcribe(audio, language="fr")
+    transcript = result["text"].strip()
+    elapsed = time.perf_counter() - started
+    metrics.observe("transcription_seconds", elapsed)
+    if job["duration"]:
+        # Facteur temps réel : secondes de calcul par seconde d'enregistrement
+        metrics.observe("transcription_rtf", elapsed / job["duration"])
+    # Horodatages ramenés sur l'enregistrement d'origine
+    segments = timeline.remap_segments(result["segments"]) if timeline else result["segments"]
+    print(f"🔍 Transcript brut: '{transcript}'")
+    print(f"🔍 Longueur: {len(transcript)} caractères")
+
+    if len(transcript) < 10:
+        print("❌ Transcription trop courte, skip GPT")
+        _mark(job, "skipped", error="Transcription trop courte")
+        _skipped(job, "short_transcript")
+        return None
+    os.makedirs("transcriptions", exist_ok=True)
+    with open(transcript_path, 'w', encoding='utf-8') as f:
+        f.write(transcript)
+    # Segments horodatés (secondes de l'enregistrement d'origine) à côté du texte, pour retrouver un passage
+    os.makedirs("segments", exist_ok=True)
+    with open(f"segments/call_{job['call_id']}_{job['day']}.json", 'w', encoding='utf-8') as f:
+        json.dump([{"start": round(float(segment["start"]), 2), "end": round(float(segment["end"]), 2),
+                    "text": segment["text"].strip()} for segment in segments], f, ensure_ascii=False)
+
+    job["transcript"] = transcript
+    _mark(job, "transcribed", transcript_path=transcript_path)
+    return job
+
+
+def analyze_transcript(job, analyzer, cache=None):
+    """Analyse la transcription avec GPT (AnalysisExecutor : limites, retries, backoff ; modèle selon la longueur)"""
+    if job["state"].get("analyzed_at") and job["state"].get("analysis"):
+        print("♻️ Analyse reprise depuis le registre")
+        job["analysis"] = job["state"]["analysis"]
+        return job
+
+    plan = plan_analysis(job["transcript"])
+    # La version dépend du budget du palier : changer XCALL_MODEL_TIERS invalide les analyses concernées
+    cache_args = (job["transcript"], plan["prompt_version"], plan["model"], analyzer.temperature)
+    cached = cache.get(*cache_args) if cache else None
+    if cache:
+        metrics.incr("analysis_cache", result="hit" if cached is not None else "miss")
+    if cached is not None:
+        print("🗃️ Analyse trouvée dans le cache (aucun appel GPT)")
+        job["analysis"] = cached
+        _mark(job, "analyzed", analysis=cached)
+        return job
+
+    if plan["compressed"]:
+        print(f"✂️ Transcription réduite: {plan['original_tokens']} → {plan['transcript_tokens']} tokens")
+    started = time.perf_counter()
+    try:
+        analysis, response = analyzer.analyze(plan["messages"], model=plan["model"])
+    except AnalysisFailed as e:
+        # Mis de côté : repris au prochain run depuis la transcription, sans enregistrement "Erreur"
+        print(f"🅿️ Analyse mise de côté: {e}")
+        _park(job, e)
+        return None
+
+    latency = time.perf_counter() - started
+    print("GPT Response:", response.choices[0].message.content)
+    _record_usage(job, plan, response, latency)
+    if cache:
+        cache.put(*cache_args, analysis)
+
+    job["analysis"] = analysis
+    _mark(job, "analyzed", analysis=analysis)
+    return job
+
+
+def persist_analysis(job):
+    """Ajoute l'analyse au journal du jour (analyses/analyses_YYYY-MM-DD.jsonl)"""
+    analysis = job["analysis"]
+    analysis_with_email = {
+        **analysis,
+        "assignee_email": job["assignee_email"],
+        "assignee_name": job["assignee"],
+        "client_name": job["client_name"],
+        "call_id": job["call_id"],
+        "date": job["started_at"].strftime('%Y-%m-%d %H:%M')
+    }
+
+    # Un seul append synchronisé par analyse (compaction : python analysis_log.py)
+    with metrics.timer("persist_seconds"):
+        append_analysis(analysis_with_email, job["day"])
+        _mark(job, "persisted")
+    metrics.incr("calls_persisted")
+    if USE_SEARCH_INDEX:
+        # L'index se reconstruit depuis les fichiers : une erreur ici ne bloque pas la sauvegarde
+        try:
+            with metrics.timer("search_index_seconds"):
+                default_index().add(analysis_with_email, job.get("transcript"))
+        except Exception as e:
+            print(f"⚠️ Indexation de recherche impossible: {e}")
+    if USE_PROGRESS:
+        # Rattrapée depuis les instantanés quotidiens au prochain dashboard si cette mise à jour échoue
+        try:
+            default_progress().add(analysis_with_email, job["day"])
+        except Exception as e:
+            print(f"⚠️ Mise à jour de la progression impossible: {e}")
+    metrics.event("call_persisted", call_id=job["call_id"], day=job["day"], duration=job["duration"],
+                  mood=analysis.get("mood_global"))
+
+    print(f"📊 Mood: {analysis['mood_global']}/10")
+    print(f"💬 Temps parole: {analysis['temps_parole']}")
+    print(f"🚫 Blocages: {len(analysis['blocages_client'])}")
+    print(f"✅ Réussis: {len(analysis['arguments_reussis'])}")
+    print(f"❌ Échecs: {len(analysis['arguments_non_reussis'])}")
+    print(f"📈 Améliorations: {len(analysis['ameliorations'])}")
+    print("-" * 50)
+
+
+def _mark(job, stage, **fields):
+    if job["ledger"]:
+        job["ledger"].mark(job["call_id"], stage, day=job["day"], **fields)
+
+
+def _skipped(job, reason):
+    metrics.incr("calls_skipped", reason=reason)
+    metrics.event("call_skipped", call_id=job["call_id"], day=job["day"], reason=reason)
+
+
+def _park(job, error):
+    """Met l'appel de côté (Ledger.parked() le redonne au prochain run), en échec définitif après trop d'essais"""
+    metrics.incr("calls_parked")
+    status = job["ledger"].park(job["call_id"], error, day=job["day"]) if job["ledger"] else "parked"
+    if status == "failed":
+        print(f"🛑 Appel {job['call_id']} abandonné après {job['ledger'].max_attempts} essais")
+        metrics.incr("calls_failed")
+    metrics.event(f"call_{status}", call_id=job["call_id"], day=job["day"], error=str(error))
+
+
+def stage_failed(job, stage, error):
+    """Exception inattendue d'une étape ou de la sauvegarde : l'appel est mis de côté, le run continue"""
+    _park(job, f"{stage}: {type(error).__name__}: {error}")
+
+
+def _record_usage(job, plan, response, latency):
+    """Tokens et latence de l'appel GPT : bilan du run et registre (table usage)"""
+    usage = response.usage
+    prompt_tokens = usage.prompt_tokens if usage else plan["prompt_tokens"]
+    completion_tokens = usage.completion_tokens if usage else 0
+    saved_tokens = plan["original_tokens"] - plan["transcript_tokens"]
+    RUN_USAGE.add(plan["model"], prompt_tokens, completion_tokens, saved_tokens, latency)
+    metrics.observe("gpt_latency_seconds", latency, model=plan["model"])
+    metrics.observe("gpt_prompt_tokens", prompt_tokens, model=plan["model"])
+    metrics.observe("gpt_completion_tokens", completion_tokens, model=plan["model"])
+    if job["ledger"]:
+        job["ledger"].record_usage(job["call_id"], model=plan["model"], original_tokens=plan["original_tokens"],
+                                   prompt_tokens=prompt_tokens, completion_tokens=completion_tokens,
+                                   latency=round(latency, 3), compressed=int(plan["compressed"]))
+
+
+def process_calls_sequential(calls, transcriber, analyzer, ledger=None, cache=None):
+    """Traite les appels un par un (comportement historique), avec les mêmes étapes que le pipeline"""
+    stages = pipeline_stages(transcriber, analyzer, cache, download_workers=1)
+    for call in calls:
+        job = new_job(call, ledger)
+        for stage in stages:
+            try:
+                result = stage.func(job)
+            except Exception as e:
+                # Comme dans le pipeline : l'appel est mis de côté, les suivants continuent
+                print(f"❌ Erreur étape {stage.name}: {e}")
+                metrics.incr("errors", stage=stage.name)
+                metrics.event("stage_error", stage=stage.name, error=f"{type(e).__name__}: {e}")
+                stage_failed(job, stage.name, e)
+                result = None
+            job = result
+            if job is None:
+                break
+        if job is None:
+            print("-" * 50)
+            continue
+        try:
+            persist_analysis(job)
+        except Exception as e:
+            print(f"❌ Erreur écriture: {e}")
+            stage_failed(job, "writer", e)
+
+
+def pipeline_stages(transcriber, analyzer, cache=None, download_workers=4, transcribe_workers=1, analyze_workers=4):
+    """Étapes téléchargement → transcription → analyse, pour run_pipeline() ou un Pipeline longue durée"""
+    downloader = RecordingDownloader(pool_size=download_workers)
+    return [
+        Stage("download", lambda job: download_recording(job, downloader), download_workers),
+        Stage("transcribe", lambda job: transcribe_recording(job, transcriber), transcribe_workers),
+        Stage("analyze", lambda job: analyze_transcript(job, analyzer, cache), analyze_workers),
+    ]
+
+
+def process_calls_pipelined(calls, transcriber, analyzer, ledger=None, cache=None, download_workers=4, transcribe_workers=1, analyze_workers=4, queue_size=8):
+    """
+    Traite les appels en pipeline : téléchargements et appels GPT en parallèle,
+    Whisper sur son propre worker, un seul writer pour les fichiers du jour
+    """
+    stages = pipeline_stages(transcriber, analyzer, cache, download_workers, transcribe_workers, analyze_workers)
+    return run_pipeline((new_job(call, ledger) for call in calls), stages, persist_analysis, queue_size=queue_size,
+                        on_error=stage_failed)
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Registre des appels traités par CallX (SQLite)
+Une ligne par call_id avec l'état de chaque étape : downloaded, transcribed,
+analyzed, persisted. Remplace le scan des dossiers mp3/, transcriptions/ et
+analyses/ et permet de reprendre un appel à la dernière étape terminée.
+Un appel mis de côté (téléchargement ou GPT en échec) est repris aux runs
+suivants, puis marqué 'failed' après XCALL_MAX_ATTEMPTS essais.
+"""
+
+import os
+import json
+import sqlite3
+import threading
+import time
+
+from analysis_log import read_analyses_file, is_analyses_file
+
+LEDGER_FILE = os.getenv('XCALL_LEDGER_FILE', 'state/ledger.db')
+# Essais avant qu'un appel mis de côté ne passe en échec définitif
+MAX_ATTEMPTS = int(os.getenv('XCALL_MAX_ATTEMPTS', 5))
+
+STAGES = ["downloaded", "transcribed", "analyzed", "persisted"]
+
+# Statuts terminaux : l'appel ne sera plus retraité
+DONE_STATUSES = {"persisted", "skipped", "failed"}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS calls (
+    call_id INTEGER PRIMARY KEY,
+    day TEXT,
+    status TEXT NOT NULL DEFAULT 'new',
+    audio_path TEXT,
+    transcript_path TEXT,
+    analysis TEXT,
+    downloaded_at REAL,
+    transcribed_at REAL,
+    analyzed_at REAL,
+    persisted_at REAL,
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    updated_at REAL
+);
+CREATE INDEX IF NOT EXISTS calls_status ON calls(status);
+CREATE INDEX IF NOT EXISTS calls_day ON calls(day);
+CREATE TABLE IF NOT EXISTS usage (
+    call_id INTEGER NOT NULL,
+    model TEXT,
+    original_tokens INTEGER,
+    prompt_tokens INTEGER,
+    completion_tokens INTEGER,
+    latency REAL,
+    compressed INTEGER,
+    created_at REAL
+);
+CREATE INDEX IF NOT EXISTS usage_call ON usage(call_id);
+"""
+
+
+class Ledger:
+    """Accès au registre, partageable entre les threads du pipeline"""
+
+    def __init__(self, path=LEDGER_FILE, max_attempts=MAX_ATTEMPTS):
+        self.path = path
+        self.max_attempts = max_attempts
+        fresh = not os.path.exists(path)
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        if "attempts" not in {row[1] for row in self._conn.execute("PRAGMA table_info(calls)")}:
+            self._conn.execute("ALTER TABLE calls ADD COLUMN attempts INTEGER NOT NULL DEFAULT 0")
+        self._lock = threading.Lock()
+        if fresh:
+            imported = self.import_existing_files()
+            if imported:
+                print(f"📒 Registre initialisé depuis les fichiers existants ({imported} appels)")
+
+    def close(self):
+        self._conn.close()
+
+    def get(self, call_id):
+        """État d'un appel (dict) ou None s'il est inconnu"""
+        with self._lock:
+            cursor = self._conn.execute("SELECT * FROM calls WHERE call_id = ?", (int(call_id),))
+            row = cursor.fetchone()
+            if row is None:
+                return None
+            state = dict(zip([c[0] for c in cursor.description], row))
+        if state["analysis"]:
+            state["analysis"] = json.loads(state["analysis"])
+        return state
+
+    def pending(self, calls):
+        """Filtre les appels qui ne sont pas encore terminés (une seule requête indexée)"""
+        ids = [int(call["id"]) for call in calls]
+        done = set()
+        with self._lock:
+            for i in range(0, len(ids), 500):
+                chunk = ids[i:i + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT call_id FROM calls WHERE call_id IN ({placeholders}) "
+                    f"AND status IN ({','.join('?' * len(DONE_STATUSES))})",
+                    [*chunk, *sorted(DONE_STATUSES)],
+                )
+                done.update(row[0] for row in rows)
+        return [call for call in calls if int(call["id"]) not in done]
+
+    def mark(self, call_id, stage, day=None, **fields):
+        """
+        Enregistre la fin d'une étape ('downloaded', 'transcribed', 'analyzed', 'persisted')
+        ou un statut terminal ('skipped', 'failed', ...) avec les champs associés
+        """
+        now = time.time()
+        values = {"status": stage, "updated_at": now, "error": fields.pop("error", None)}
+        if stage in STAGES:
+            values[f"{stage}_at"] = now
+        if "analysis" in fields:
+            fields["analysis"] = json.dumps(fields["analysis"], ensure_ascii=False)
+        values.update(fields)
+        if day:
+            values["day"] = day
+
+        columns = ", ".join(values)
+        placeholders = ", ".join("?" * len(values))
+        updates = ", ".join(f"{column} = excluded.{column}" for column in values)
+        with self._lock:
+            self._conn.execute(
+                f"INSERT INTO calls (call_id, {columns}) VALUES (?, {placeholders}) "
+                f"ON CONFLICT(call_id) DO UPDATE SET {updates}",
+                [int(call_id), *values.values()],
+            )
+
+    def park(self, call_id, error, day=None):
+        """
+        Met un appel de côté (repris au prochain run) ; renvoie son statut,
+        'failed' (terminal) une fois max_attempts essais atteints
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO calls (call_id, day, status, error, attempts, updated_at) VALUES (?, ?, 'parked', ?, 1, ?) "
+                "ON CONFLICT(call_id) DO UPDATE SET status = 'parked', error = excluded.error, "
+                "attempts = attempts + 1, updated_at = excluded.updated_at, day = COALESCE(excluded.day, day)",
+                (int(call_id), day, str(error), now),
+            )
+            self._conn.execute("UPDATE calls SET status = 'failed' WHERE call_id = ? AND attempts >= ?",
+                               (int(call_id), self.max_attempts))
+            return self._conn.execute("SELECT status FROM calls WHERE call_id = ?", (int(call_id),)).fetchone()[0]
+
+    def parked(self):
+        """call_id des appels mis de côté, du plus ancien au plus récent"""
+        with self._lock:
+            return [row[0] for row in self._conn.execute(
+                "SELECT call_id FROM calls WHERE status = 'parked' ORDER BY updated_at")]
+
+    def record_usage(self, call_id, **fields):
+        """Trace un appel GPT (modèle, tokens, latence) pour suivre les coûts"""
+        fields["created_at"] = time.time()
+        columns = ", ".join(fields)
+        placeholders = ", ".join("?" * len(fields))
+        with self._lock:
+            self._conn.execute(f"INSERT INTO usage (call_id, {columns}) VALUES (?, {placeholders})",
+                               [int(call_id), *fields.values()])
+
+    def counts(self):
+        """Nombre d'appels par statut"""
+        with self._lock:
+            return dict(self._conn.execute("SELECT status, COUNT(*) FROM calls GROUP BY status").fetchall())
+
+    def import_existing_files(self, base_dir="."):
+        """
+        Reprend l'historique depuis mp3/, transcriptions/ et analyses/
+
+        Un appel n'est considéré terminé que si son analyse est présente ; un mp3
+        seul donne l'état 'downloaded' (il sera transcrit et analysé au prochain run).
+        """
+        states = {}
+
+        def note(call_id, day, stage, **fields):
+            state = states.setdefault(int(call_id), {"day": day, "stage": None})
+            if state["stage"] is None or STAGES.index(stage) > STAGES.index(state["stage"]):
+                state["stage"] = stage
+            state.update(fields)
+
+        for folder, stage, field in [("mp3", "downloaded", "audio_path"), ("transcriptions", "transcribed", "transcript_path")]:
+            path = os.path.join(base_dir, folder)
+            if not os.path.exists(path):
+                continue
+            for file_name in os.listdir(path):
+                parts = os.path.splitext(file_name)[0].split("_")
+                if file_name.startswith("call_") and len(parts) == 3 and parts[1].isdigit():
+                    note(parts[1], parts[2], stage, **{field: f"{folder}/{file_name}"})
+
+        analyses_dir = os.path.join(base_dir, "analyses")
+        if os.path.exists(analyses_dir):
+            for file_name in os.listdir(analyses_dir):
+                if not is_analyses_file(file_name):
+                    continue
+                try:
+                    content = read_analyses_file(os.path.join(analyses_dir, file_name))
+                except Exception as e:
+                    print(f"❌ Erreur lecture {file_name}: {e}")
+                    continue
+                for analysis in content:
+                    if analysis.get("call_id") is not None:
+                        note(analysis["call_id"], str(analysis.get("date", ""))[:10], "persisted")
+
+        for call_id, state in states.items():
+            stage = state.pop("stage")
+            self.mark(call_id, stage, **state)
+        return len(states)
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Instrumentation CallX : compteurs, histogrammes et chronos par étape
+Activée par XCALL_METRICS=1 ; sinon chaque appel est un no-op (un test de
+booléen). Les événements sont écrits en JSON, une ligne chacun, dans
+XCALL_METRICS_LOG (défaut : state/metrics.jsonl, "-" = stderr). Les mesures
+s'exposent au format texte Prometheus (prometheus_text) ou dans un rapport
+JSON de fin de run (write_report).
+
+    with metrics.timer("download_seconds"):
+        ...
+    metrics.observe("transcription_rtf", elapsed / duration, backend="whisper")
+    metrics.incr("calls_skipped", reason="silence")
+"""
+
+import os
+import sys
+import json
+import time
+import bisect
+import threading
+from contextlib import contextmanager, nullcontext
+
+ENABLED = os.getenv('XCALL_METRICS', '0') == '1'
+LOG_FILE = os.getenv('XCALL_METRICS_LOG', 'state/metrics.jsonl')
+REPORT_DIR = os.getenv('XCALL_METRICS_REPORT_DIR', 'state/metrics')
+
+# Bornes des histogrammes : secondes par défaut, ou ratio / débit selon le nom
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+BUCKETS = {
+    "transcription_rtf": (0.02, 0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1, 1.5, 2, 5),
+    "download_bytes_per_second": (1e4, 5e4, 1e5, 5e5, 1e6, 5e6, 1e7, 5e7, 1e8),
+    "gpt_prompt_tokens": (100, 250, 500, 1000, 2000, 4000, 8000, 16000),
+    "gpt_completion_tokens": (50, 100, 200, 400, 800, 1600),
+}
+
+
+class Histogram:
+    """Histogramme à bornes fixes : compte, somme, min/max et percentiles approchés"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def percentile(self, q):
+        """Borne haute du bucket contenant le q-ième percentile (max pour le dernier bucket)"""
+        if not self.count:
+            return None
+        rank = q / 100 * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                return min(self.buckets[index], self.max) if index < len(self.buckets) else self.max
+        return self.max
+
+    def summary(self):
+        return {"count": self.count, "sum": round(self.sum, 6),
+                "mean": round(self.sum / self.count, 6) if self.count else None,
+                "min": self.min, "max": self.max,
+                "p50": self.percentile(50), "p90": self.percentile(90), "p99": self.percentile(99)}
+
+
+class Registry:
+    """Mesures d'un processus (thread-safe)"""
+
+    def __init__(self, log_file=LOG_FILE):
+        self.log_file = log_file
+        self.started_at = time.time()
+        self.counters = {}
+        self.histograms = {}
+        self._lock = threading.Lock()
+        self._log = None
+
+    def incr(self, name, value=1, **labels):
+        key = (name, _labels(labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = (name, _labels(labels))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(BUCKETS.get(name, DEFAULT_BUCKETS))
+            histogram.observe(value)
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """Chronomètre un bloc (histogramme `name`, en secondes) ; une exception compte dans `<name>_errors`"""
+        started = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.incr(f"{name}_errors", **labels)
+            raise
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def event(self, name, **fields):
+        """Écrit un événement structuré (une ligne JSON)"""
+        line = json.dumps({"ts": round(time.time(), 3), "event": name, **fields}, ensure_ascii=False, default=str)
+        with self._lock:
+            if self._log is None:
+                if self.log_file == "-":
+                    self._log = sys.stderr
+                else:
+                    if os.path.dirname(self.log_file):
+                        os.makedirs(os.path.dirname(self.log_file), exist_ok=True)
+                    self._log = open(self.log_file, 'a', encoding='utf-8', buffering=1)
+            self._log.write(line + "\n")
+
+    def report(self):
+        """Toutes les mesures du run, sérialisables en JSON"""
+        with self._lock:
+            counters = {_key_name(key): value for key, value in sorted(self.counters.items())}
+            histograms = {_key_name(key): histogram.summary() for key, histogram in sorted(self.histograms.items())}
+        return {"started_at": self.started_at, "duration": round(time.time() - self.started_at, 3),
+                "counters": counters, "histograms": histograms}
+
+    def prometheus_text(self, prefix="xcall_"):
+        """Exposition au format texte Prometheus (compteurs et histogrammes cumulés)"""
+        lines = []
+        with self._lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted((key, (h.buckets, list(h.counts), h.count, h.sum)) for key, h in self.histograms.items())
+        typed = set()
+        for (name, labels), value in counters:
+            metric = f"{prefix}{name}_total"
+            if metric not in typed:
+                lines.append(f"# TYPE {metric} counter")
+                typed.add(metric)
+            lines.append(f"{metric}{_format_labels(labels)} {value}")
+        for (name, labels), (buckets, counts, count, total) in histograms:
+            metric = f"{prefix}{name}"
+            if metric not in typed:
+                lines.append(f"# TYPE {metric} histogram")
+                typed.add(metric)
+            cumulative = 0
+            for bound, bucket_count in zip(list(buckets) + ["+Inf"], counts):
+                cumulative += bucket_count
+                lines.append(f"{metric}_bucket{_format_labels(labels + (('le', str(bound)),))} {cumulative}")
+            lines.append(f"{metric}_sum{_format_labels(labels)} {total}")
+            lines.append(f"{metric}_count{_format_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def write_report(self, name="run", directory=REPORT_DIR):
+        """Écrit le rapport JSON du run et renvoie son chemin"""
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{name}_{time.strftime('%Y%m%d_%H%M%S')}.json")
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.report(), f, indent=2, ensure_ascii=False)
+        return path
+
+
+def _labels(labels):
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _key_name(key):
+    name, labels = key
+    if not labels:
+        return name
+    return name + "{" + ",".join(f"{k}={v}" for k, v in labels) + "}"
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in labels)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(labels, escaped)) + "}"
+
+
+REGISTRY = Registry()
+
+
+_NULL_TIMER = nullcontext()
+
+
+# API du module : tout est ignoré tant que XCALL_METRICS n'est pas activé
+
+def incr(name, value=1, **labels):
+    if ENABLED:
+        REGISTRY.incr(name, value, **labels)
+
+
+def observe(name, value, **labels):
+    if ENABLED:
+        REGISTRY.observe(name, value, **labels)
+
+
+def timer(name, **labels):
+    return REGISTRY.timer(name, **labels) if ENABLED else _NULL_TIMER
+
+
+def event(name, **fields):
+    if ENABLED:
+        REGISTRY.event(name, **fields)
+
+
+def report():
+    return REGISTRY.report() if ENABLED else None
+
+
+def prometheus_text():
+    return REGISTRY.prometheus_text() if ENABLED else "# XCALL_METRICS=1 pour activer les mesures\n"
+
+
+def write_report(name="run"):
+    return REGISTRY.write_report(name) if ENABLED else None
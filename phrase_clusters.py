@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+"""
+Regroupement des phrases quasi identiques écrites par GPT (MinHash + LSH)
+« Clarifier les termes techniques » et « Clarifier le jargon technique »
+doivent compter ensemble. Chaque phrase est normalisée (minuscules, sans
+accents ni mots vides, pluriel/féminin retirés) puis réduite à une signature
+MinHash ; les bandes LSH donnent en temps quasi constant les groupes
+candidats, départagés par la similarité de Jaccard exacte des mots.
+
+L'index phrase → groupe est persistant (state/phrase_clusters.db, bandes LSH
+comprises) : une phrase déjà vue est résolue par une recherche indexée puis
+mémorisée, une nouvelle est rattachée au groupe le plus proche ou en ouvre
+un, sans jamais relire tout l'index. Les groupes sont séparés par espace de
+noms (blocages, arguments, améliorations) ; arguments réussis et non réussis
+partagent le leur pour que le taux de succès compare les mêmes groupes.
+Deux phrases aux négations différentes (« pas », « non », « sans »...) ne sont
+jamais regroupées. Le libellé d'un groupe est sa première phrase (dans l'ordre
+où les phrases arrivent).
+
+    python phrase_clusters.py --rebuild       (regroupe toutes les analyses existantes)
+    python phrase_clusters.py --show arguments
+"""
+
+import os
+import re
+import zlib
+import random
+import struct
+import hashlib
+import sqlite3
+import argparse
+import threading
+import unicodedata
+
+from aggregates import COUNTER_FIELDS
+
+CLUSTERS_FILE = os.getenv('XCALL_CLUSTERS_FILE', 'state/phrase_clusters.db')
+# Regroupement actif par défaut (XCALL_PHRASE_CLUSTERS=0 : comptes par phrase exacte)
+ENABLED = os.getenv('XCALL_PHRASE_CLUSTERS', '1') == '1'
+# Similarité de Jaccard minimale entre les mots d'une phrase et ceux du libellé du groupe
+THRESHOLD = float(os.getenv('XCALL_CLUSTER_THRESHOLD', 0.5))
+
+# 27 bandes de 3 lignes : deux phrases partagent une bande avec ~97 % de chances à Jaccard 0,5 (~63 % à 0,33,
+# candidats écartés ensuite par la similarité exacte)
+BANDS = 27
+ROWS = 3
+NUM_PERM = BANDS * ROWS
+# Permutations (a·x + b) mod p, a et b tirés uniformément dans [1, p) ; calcul en entiers Python (pas de débordement)
+_PRIME = (1 << 61) - 1
+_rng = random.Random(20251006)
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(1, _PRIME)) for _ in range(NUM_PERM)]
+# Version de la famille de hachage : les bandes d'un index plus ancien sont recalculées à l'ouverture
+HASH_VERSION = 3
+
+# Champ du dashboard -> espace de noms des groupes
+NAMESPACES = {
+    "blockers": "blockers",
+    "successful_args": "arguments",
+    "failed_args": "arguments",
+    "improvements": "improvements",
+}
+
+# Mots vides (sans accents) ; les négations (pas, ne, non, sans) sont gardées : elles changent le sens
+STOPWORDS = set("""
+a au aux avec ce ces cet cette d dans de des du elle en et est etre il ils l la le les leur leurs lui ma mes
+mon nos notre nous on ou par plus pour qu que qui sa se ses son sur ta tes ton tres un une vos votre vous y
+""".split())
+# Négations (formes normalisées par stem) : deux phrases dont les négations diffèrent ne sont jamais regroupées,
+# « Prix compétitif » et « Prix non compétitif » sont des arguments opposés
+NEGATIONS = {"pas", "ne", "n", "non", "sans", "jamai", "aucun", "ni", "rien"}
+
+_WORD = re.compile(r"[a-z0-9]+")
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS clusters (
+    id INTEGER PRIMARY KEY,
+    namespace TEXT NOT NULL,
+    label TEXT NOT NULL,
+    tokens TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS clusters_tokens ON clusters (namespace, tokens);
+CREATE TABLE IF NOT EXISTS buckets (
+    namespace TEXT NOT NULL,
+    key INTEGER NOT NULL,
+    cluster_id INTEGER NOT NULL,
+    PRIMARY KEY (namespace, key, cluster_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS phrases (
+    namespace TEXT NOT NULL,
+    phrase TEXT NOT NULL,
+    cluster_id INTEGER NOT NULL,
+    PRIMARY KEY (namespace, phrase)
+) WITHOUT ROWID;
+"""
+
+
+def stem(word):
+    """Racine grossière : pluriel (s, x) puis féminin (e) retirés"""
+    if len(word) > 3 and word[-1] in "sx":
+        word = word[:-1]
+    if len(word) > 3 and word[-1] == "e":
+        word = word[:-1]
+    return word
+
+
+def tokens(phrase):
+    """Mots significatifs d'une phrase, normalisés (ensemble trié)"""
+    text = phrase.lower()
+    if not text.isascii():
+        text = unicodedata.normalize("NFKD", text.replace("œ", "oe").replace("æ", "ae"))
+        text = "".join(c for c in text if not unicodedata.combining(c))
+    return sorted({stem(word) for word in _WORD.findall(text) if word not in STOPWORDS})
+
+
+def word_hash(word):
+    """Empreinte 64 bits stable d'un mot (indépendante de PYTHONHASHSEED)"""
+    return int.from_bytes(hashlib.blake2b(word.encode(), digest_size=8).digest(), "little")
+
+
+def signature(words):
+    """Signature MinHash d'un ensemble de mots (NUM_PERM entiers de 8 octets, sérialisés)"""
+    hashes = [word_hash(word) for word in words]
+    return struct.pack(f"<{NUM_PERM}Q", *(min((a * x + b) % _PRIME for x in hashes) for a, b in _PERMUTATIONS))
+
+
+def band_keys(sig):
+    """Une clé entière par bande : numéro de bande et empreinte de ses ROWS valeurs"""
+    width = ROWS * 8
+    return [(band << 32) | zlib.crc32(sig[band * width:(band + 1) * width]) for band in range(BANDS)]
+
+
+def jaccard(a, b):
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+
+class PhraseClusters:
+    """Index persistant phrase → groupe, partageable entre threads et processus"""
+
+    def __init__(self, path=CLUSTERS_FILE, threshold=THRESHOLD):
+        self.threshold = threshold
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+        if self._conn.execute("PRAGMA user_version").fetchone()[0] != HASH_VERSION:
+            self._rehash()
+        # (espace, phrase) -> libellé ; le groupe d'une phrase ne change plus une fois attribué
+        self._memo = {}
+
+    def close(self):
+        self._conn.close()
+
+    def _rehash(self):
+        """Recalcule les bandes LSH de tous les groupes (après un changement de famille de hachage)"""
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._conn.execute("DELETE FROM buckets")
+            for cluster_id, namespace, key in self._conn.execute("SELECT id, namespace, tokens FROM clusters").fetchall():
+                self._conn.executemany("INSERT OR IGNORE INTO buckets (namespace, key, cluster_id) VALUES (?, ?, ?)",
+                                       [(namespace, band, cluster_id) for band in band_keys(signature(key.split(" ")))])
+            self._conn.execute(f"PRAGMA user_version = {HASH_VERSION}")
+            self._conn.execute("COMMIT")
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+
+    # Résolution
+
+    def label(self, namespace, phrase):
+        return self.labels(namespace, [phrase])[phrase]
+
+    def labels(self, namespace, phrases):
+        """{phrase: libellé de son groupe} ; les phrases inconnues sont rattachées en une transaction"""
+        labels, missing = {}, {}
+        for phrase in phrases:
+            label = self._memo.get((namespace, phrase))
+            if label is None:
+                # Ordre d'arrivée conservé : la première phrase d'un groupe en reste le libellé d'un run à l'autre
+                missing[phrase] = None
+            else:
+                labels[phrase] = label
+        if missing:
+            with self._lock:
+                labels.update(self._resolve(namespace, list(missing)))
+        return labels
+
+    def _resolve(self, namespace, phrases):
+        found = self._lookup(namespace, phrases)
+        new = [phrase for phrase in phrases if phrase not in found]
+        if new:
+            # Écriture exclusive : un autre processus a pu rattacher ces phrases entre-temps
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                found.update(self._lookup(namespace, new))
+                for phrase in new:
+                    if phrase not in found:
+                        found[phrase] = self._place(namespace, phrase)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        for phrase, label in found.items():
+            self._memo[(namespace, phrase)] = label
+        return found
+
+    def _lookup(self, namespace, phrases):
+        """Libellés des phrases déjà rattachées (par ce processus ou un autre)"""
+        found, phrases = {}, list(phrases)
+        for start in range(0, len(phrases), 500):
+            chunk = phrases[start:start + 500]
+            found.update(self._conn.execute(
+                "SELECT p.phrase, c.label FROM phrases p JOIN clusters c ON c.id = p.cluster_id "
+                f"WHERE p.namespace = ? AND p.phrase IN ({','.join('?' * len(chunk))})", (namespace, *chunk)))
+        return found
+
+    def _place(self, namespace, phrase):
+        """Rattache une nouvelle phrase au groupe le plus proche au-dessus du seuil, ou ouvre un groupe"""
+        # Phrase sans mot significatif (« ? », « ok ») : seule la même phrase la rejoint
+        words = tokens(phrase) or ["\x00" + "_".join(phrase.lower().split())]
+        key = " ".join(words)
+        match = self._conn.execute("SELECT id, label FROM clusters WHERE namespace = ? AND tokens = ?",
+                                   (namespace, key)).fetchone()
+        if match is None:
+            bands = band_keys(signature(words))
+            word_set, best = frozenset(words), 0.0
+            negations = word_set & NEGATIONS
+            candidate_ids = {row[0] for row in self._conn.execute(
+                f"SELECT cluster_id FROM buckets WHERE namespace = ? AND key IN ({','.join('?' * BANDS)})",
+                (namespace, *bands))}
+            candidates = self._conn.execute(
+                f"SELECT id, label, tokens FROM clusters WHERE id IN ({','.join('?' * len(candidate_ids))})",
+                tuple(candidate_ids)) if candidate_ids else ()
+            for cluster_id, label, candidate in candidates:
+                candidate = frozenset(candidate.split(" "))
+                if candidate & NEGATIONS != negations:
+                    continue
+                similarity = jaccard(word_set, candidate)
+                if similarity >= self.threshold and similarity > best:
+                    match, best = (cluster_id, label), similarity
+            if match is None:
+                cursor = self._conn.execute("INSERT INTO clusters (namespace, label, tokens) VALUES (?, ?, ?)",
+                                            (namespace, phrase, key))
+                match = (cursor.lastrowid, phrase)
+                self._conn.executemany("INSERT INTO buckets (namespace, key, cluster_id) VALUES (?, ?, ?)",
+                                       [(namespace, band, match[0]) for band in bands])
+        self._conn.execute("INSERT INTO phrases (namespace, phrase, cluster_id) VALUES (?, ?, ?)",
+                           (namespace, phrase, match[0]))
+        return match[1]
+
+    # Agrégation
+
+    def canonical_counts(self, namespace, counts):
+        """{phrase: compte} -> {libellé: compte total du groupe}"""
+        labels = self.labels(namespace, list(counts))
+        merged = {}
+        for phrase, count in counts.items():
+            label = labels[phrase]
+            merged[label] = merged.get(label, 0) + count
+        return merged
+
+    def members(self, namespace):
+        """{libellé: [phrases]} des groupes d'un espace de noms"""
+        groups = {}
+        rows = self._conn.execute("SELECT c.label, p.phrase FROM phrases p JOIN clusters c ON c.id = p.cluster_id "
+                                  "WHERE p.namespace = ?", (namespace,))
+        for label, phrase in rows:
+            groups.setdefault(label, []).append(phrase)
+        return groups
+
+    def rebuild(self, analyses):
+        """
+        Efface l'index et regroupe toutes les phrases des analyses ; renvoie {espace: (phrases, groupes)}
+        Les processus déjà lancés gardent les libellés en mémoire jusqu'à leur redémarrage.
+        """
+        with self._lock:
+            self._conn.executescript("DELETE FROM phrases; DELETE FROM buckets; DELETE FROM clusters;")
+            self._memo.clear()
+        phrases = {namespace: {} for namespace in set(NAMESPACES.values())}
+        for analysis in analyses:
+            for field, source in COUNTER_FIELDS.items():
+                for phrase in analysis.get(source, []):
+                    phrases[NAMESPACES[field]][phrase] = None
+        summary = {}
+        for namespace, seen in phrases.items():
+            labels = self.labels(namespace, list(seen))
+            summary[namespace] = (len(seen), len(set(labels.values())))
+        return summary
+
+
+_DEFAULT = None
+_DEFAULT_LOCK = threading.Lock()
+
+
+def default_clusters():
+    """Index partagé du processus, ou None si le regroupement est désactivé"""
+    global _DEFAULT
+    if not ENABLED:
+        return None
+    if _DEFAULT is None:
+        with _DEFAULT_LOCK:
+            if _DEFAULT is None:
+                _DEFAULT = PhraseClusters()
+    return _DEFAULT
+
+
+if __name__ == "__main__":
+    from analysis_loader import iter_analyses
+
+    parser = argparse.ArgumentParser(description="Groupes de phrases quasi identiques (blocages, arguments, améliorations)")
+    parser.add_argument("--rebuild", action="store_true", help="Regroupe à nouveau toutes les analyses existantes")
+    parser.add_argument("--show", choices=sorted(set(NAMESPACES.values())), help="Affiche les groupes à plusieurs phrases")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD)
+    args = parser.parse_args()
+
+    clusters = PhraseClusters(threshold=args.threshold)
+    if args.rebuild:
+        for namespace, (phrase_count, cluster_count) in sorted(clusters.rebuild(iter_analyses()).items()):
+            print(f"🧩 {namespace}: {phrase_count} phrases → {cluster_count} groupes")
+    if args.show:
+        groups = sorted(clusters.members(args.show).items(), key=lambda item: -len(item[1]))
+        for label, members in groups:
+            if len(members) > 1:
+                print(f"🧩 {label} ({len(members)})")
+                for member in members:
+                    if member != label:
+                        print(f"   • {member}")
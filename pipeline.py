@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Pipeline à étapes pour CallX
+Chaque étape a ses propres workers (threads) reliés par des files bornées,
+et un seul writer consomme les résultats dans l'ordre de soumission
+"""
+
+import queue
+import threading
+import traceback
+
+import metrics
+
+_STOP = object()
+
+
+class Stage:
+    """Une étape du pipeline : une fonction appliquée par `workers` threads"""
+
+    def __init__(self, name, func, workers=1):
+        self.name = name
+        self.func = func
+        self.workers = max(1, int(workers))
+
+
+class Pipeline:
+    """
+    Pipeline longue durée : start(), submit(item) autant de fois que nécessaire, puis close()
+
+    Une fonction d'étape renvoie l'élément (éventuellement enrichi) pour le passer à
+    l'étape suivante, ou None pour l'abandonner. Le writer est appelé depuis un seul
+    thread, dans l'ordre des submit(), ce qui donne le même résultat qu'une boucle séquentielle.
+    on_drop(item), si fourni, est appelé pour chaque élément abandonné (None ou exception) ;
+    on_error(item, stage, error) l'est avant, pour une exception d'une étape ou du writer.
+    """
+
+    def __init__(self, stages, writer, queue_size=8, on_drop=None, on_error=None):
+        self.stages = stages
+        self.writer = writer
+        self.on_drop = on_drop
+        self.on_error = on_error
+        self.queue_size = queue_size
+        self._queues = [queue.Queue(maxsize=queue_size) for _ in range(len(stages) + 1)]
+        self._threads = []
+        self._remaining = [stage.workers for stage in stages]
+        self._lock = threading.Lock()
+        self._next_seq = 0
+        self.errors = []
+
+    def start(self):
+        for index, stage in enumerate(self.stages):
+            for n in range(stage.workers):
+                thread = threading.Thread(target=self._work, args=(index,), name=f"{stage.name}-{n}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+        writer_thread = threading.Thread(target=self._write, name="writer", daemon=True)
+        writer_thread.start()
+        self._threads.append(writer_thread)
+        return self
+
+    def submit(self, item):
+        """Ajoute un élément en entrée (bloque si la première file est pleine)"""
+        with self._lock:
+            seq = self._next_seq
+            self._next_seq += 1
+        self._queues[0].put((seq, item))
+
+    def close(self):
+        """Signale la fin des entrées et attend que tout soit écrit"""
+        for _ in range(self.stages[0].workers if self.stages else 1):
+            self._queues[0].put(_STOP)
+        for thread in self._threads:
+            thread.join()
+
+    def _work(self, index):
+        stage = self.stages[index]
+        inbox, outbox = self._queues[index], self._queues[index + 1]
+        while True:
+            entry = inbox.get()
+            if entry is _STOP:
+                break
+            seq, item = entry
+            if item is not None:
+                submitted = item
+                try:
+                    item = stage.func(item)
+                except Exception as e:
+                    print(f"❌ Erreur étape {stage.name}: {e}")
+                    metrics.incr("errors", stage=stage.name)
+                    metrics.event("stage_error", stage=stage.name, error=f"{type(e).__name__}: {e}")
+                    self.errors.append((stage.name, seq, traceback.format_exc()))
+                    self._failed(submitted, stage.name, e)
+                    item = None
+                if item is None:
+                    self._dropped(submitted)
+            # Un élément abandonné passe quand même pour ne pas bloquer le writer
+            outbox.put((seq, item))
+
+        with self._lock:
+            self._remaining[index] -= 1
+            last = self._remaining[index] == 0
+        if last:
+            next_workers = self.stages[index + 1].workers if index + 1 < len(self.stages) else 1
+            for _ in range(next_workers):
+                outbox.put(_STOP)
+
+    def _dropped(self, item):
+        if self.on_drop is None:
+            return
+        try:
+            self.on_drop(item)
+        except Exception as e:
+            print(f"❌ Erreur on_drop: {e}")
+
+    def _failed(self, item, stage, error):
+        if self.on_error is None:
+            return
+        try:
+            self.on_error(item, stage, error)
+        except Exception as e:
+            print(f"❌ Erreur on_error: {e}")
+
+    def _write(self):
+        inbox = self._queues[-1]
+        pending = {}
+        expected = 0
+        while True:
+            entry = inbox.get()
+            if entry is _STOP:
+                break
+            seq, item = entry
+            pending[seq] = item
+            while expected in pending:
+                ready = pending.pop(expected)
+                expected += 1
+                if ready is None:
+                    continue
+                try:
+                    self.writer(ready)
+                except Exception as e:
+                    print(f"❌ Erreur écriture: {e}")
+                    self.errors.append(("writer", expected - 1, traceback.format_exc()))
+                    self._failed(ready, "writer", e)
+                    self._dropped(ready)
+
+
+def run_pipeline(items, stages, writer, queue_size=8, on_error=None):
+    """Fait passer tous les éléments dans le pipeline et attend la fin"""
+    pipeline = Pipeline(stages, writer, queue_size=queue_size, on_error=on_error).start()
+    for item in items:
+        pipeline.submit(item)
+    pipeline.close()
+    return pipeline
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""
+Prompt d'analyse GPT des appels CallX
+- Le contexte business et les consignes forment un préfixe fixe (message système),
+  identique d'un appel à l'autre et donc réutilisable par le cache de prompt d'OpenAI
+- La transcription est comptée en tokens localement ; au-delà du budget elle est
+  compressée (mots de remplissage retirés) puis fenêtrée autour des objections
+- Le modèle est choisi selon la longueur (paliers configurables)
+
+PROMPT_VERSION change dès que le contexte, les consignes ou la compression
+changent ; la version d'une requête (plan_analysis()["prompt_version"]) y ajoute
+le budget du palier retenu, car il décide du texte envoyé au modèle : c'est elle
+qui sert de clé au cache d'analyses.
+"""
+
+import os
+import re
+import json
+import hashlib
+
+# Business context
+BUSINESS_CONTEXT = """
+VOTRE BUSINESS: Ce que vous faites : Cabinet de recrutement spécialisé qui connecte les meilleurs talents tech aux entreprises ambitieuses.
+Proposition de valeur : Expertise sectorielle, approche humaine et placements durables fondés sur la confiance.
+Un bon business : Crée de la valeur réelle, des relations solides et reste aligné avec ses valeurs.
+"""
+
+INSTRUCTIONS = """
+IMPORTANT: Répondez UNIQUEMENT avec du JSON valide, sans texte avant ou après.
+
+Analysez l'appel transmis par l'utilisateur et fournissez EXACTEMENT ce format JSON:
+
+{
+  "mood_global": "Note sur 10",
+  "temps_parole": "Répartition % vendeur vs client",
+  "blocages_client": ["Blocage 1 avec verbatim exact", "Blocage 2 avec verbatim exact"],
+  "arguments_reussis": ["Argument qui a marché avec verbatim", "Autre argument réussi"],
+  "arguments_non_reussis": ["Argument qui n'a pas marché avec verbatim", "Autre échec"],
+  "ameliorations": ["Amélioration 1", "Amélioration 2", "Amélioration 3"]
+}
+
+CRITÈRES IMPORTANTS:
+- "arguments_reussis": Seulement les arguments où le CLIENT a montré un intérêt réel, une adhésion, ou une réaction positive claire
+- "arguments_non_reussis": Les arguments où le client a résisté, refusé, ou montré de l'indifférence
+- Ne pas mettre dans "arguments_reussis" si le client n'a pas réagi positivement
+- Une transcription longue peut avoir été raccourcie : "[...]" marque un passage retiré
+
+Répondez UNIQUEMENT avec le JSON, rien d'autre.
+"""
+
+SYSTEM_PROMPT = BUSINESS_CONTEXT + INSTRUCTIONS
+
+USER_TEMPLATE = "TRANSCRIPTION DE L'APPEL:\n{transcript}"
+
+# Paliers de modèles : le premier dont max_tokens couvre la transcription est retenu.
+# XCALL_MODEL_TIERS='[{"max_tokens": 800, "model": "gpt-4o-mini"}, {"model": "gpt-4", "budget": 6000}]'
+DEFAULT_MODEL_TIERS = [
+    {"max_tokens": 800, "model": "gpt-4o-mini", "budget": 6000},
+    {"model": "gpt-4", "budget": 6000},
+]
+MODEL_TIERS = json.loads(os.getenv('XCALL_MODEL_TIERS', 'null')) or DEFAULT_MODEL_TIERS
+
+# Version de l'algorithme de compression (à incrémenter si FILLERS / fenêtrage changent)
+COMPRESSION_VERSION = "1"
+
+PROMPT_VERSION = hashlib.sha256(
+    (SYSTEM_PROMPT + USER_TEMPLATE + COMPRESSION_VERSION).encode("utf-8")
+).hexdigest()[:16]
+
+DEFAULT_BUDGET = 6000
+
+
+def prompt_version(budget):
+    """Version du prompt pour un budget de transcription donné (clé du cache d'analyses)"""
+    return f"{PROMPT_VERSION}-b{int(budget)}"
+
+FILLERS = re.compile(
+    r"\b(?:euh+|heu+|hum+|hm+|bah|ben|du coup|en fait|voilà|hein|tu vois|vous voyez)\b[,.]?\s*",
+    re.IGNORECASE,
+)
+
+OBJECTION_KEYWORDS = re.compile(
+    r"\b(?:cher|prix|tarif|budget|coût|concurren\w*|pas intéress\w*|pas le moment|déjà un|"
+    r"rappel\w*|réfléchir|hésit\w*|inquiet\w*|problème|non merci|pas besoin|engagement|délai)\b",
+    re.IGNORECASE,
+)
+
+try:
+    import tiktoken
+    _ENCODING = tiktoken.get_encoding("cl100k_base")
+except ImportError:
+    _ENCODING = None
+
+
+def count_tokens(text):
+    """Nombre de tokens (tiktoken si installé, sinon estimation ≈ 4 caractères par token)"""
+    if _ENCODING is not None:
+        return len(_ENCODING.encode(text))
+    return len(text) // 4 + 1
+
+
+def _sentences(text):
+    return [s for s in re.split(r"(?<=[.!?])\s+", text) if s]
+
+
+def _windows(sentence, cost, max_tokens):
+    """Découpe un passage trop long (transcription sans ponctuation) en fenêtres de mots d'environ max_tokens"""
+    words = sentence.split()
+    size = max(1, len(words) * max_tokens // cost)
+    return [" ".join(words[i:i + size]) for i in range(0, len(words), size)]
+
+
+def compress_transcript(transcript, budget):
+    """
+    Ramène une transcription sous `budget` tokens
+
+    1. retire les mots de remplissage ("euh", "du coup", ...)
+    2. si c'est encore trop long, garde le début et la fin de l'appel et les phrases
+       autour des objections, en remplaçant les passages retirés par "[...]" ; une
+       phrase trop longue (Whisper sans ponctuation) est d'abord découpée en fenêtres
+       de mots, ce qui garde au moins des fenêtres de début et de fin
+    """
+    if count_tokens(transcript) <= budget:
+        return transcript
+    text = re.sub(r"\s{2,}", " ", FILLERS.sub("", transcript)).strip()
+    if count_tokens(text) <= budget:
+        return text
+
+    window = max(1, budget // 8)
+    sentences = []
+    for sentence in _sentences(text):
+        cost = count_tokens(sentence)
+        sentences.extend(_windows(sentence, cost, window) if cost > window else [sentence])
+    costs = [count_tokens(s) + 1 for s in sentences]
+    keep = set()
+    used = 0
+
+    def take(index):
+        nonlocal used
+        if 0 <= index < len(sentences) and index not in keep and used + costs[index] <= budget:
+            keep.add(index)
+            used += costs[index]
+
+    # Ouverture et conclusion de l'appel
+    for index in range(min(3, len(sentences))):
+        take(index)
+    for index in range(len(sentences) - 3, len(sentences)):
+        take(index)
+    # Objections avec une phrase de contexte de part et d'autre
+    for index, sentence in enumerate(sentences):
+        if OBJECTION_KEYWORDS.search(sentence):
+            for neighbour in (index, index - 1, index + 1):
+                take(neighbour)
+    # Le budget restant est comblé dans l'ordre de l'appel
+    for index in range(len(sentences)):
+        take(index)
+
+    parts = []
+    previous = -1
+    for index in sorted(keep):
+        if index != previous + 1:
+            parts.append("[...]")
+        parts.append(sentences[index])
+        previous = index
+    if previous != len(sentences) - 1:
+        parts.append("[...]")
+    return " ".join(parts)
+
+
+def choose_tier(transcript_tokens, tiers=None):
+    for tier in tiers or MODEL_TIERS:
+        if tier.get("max_tokens") is None or transcript_tokens <= tier["max_tokens"]:
+            return tier
+    return (tiers or MODEL_TIERS)[-1]
+
+
+def plan_analysis(transcript, tiers=None):
+    """
+    Prépare une requête d'analyse : modèle, messages et compte de tokens
+
+    Renvoie {"model", "messages", "prompt_version", "original_tokens", "transcript_tokens",
+    "prompt_tokens", "compressed"}.
+    """
+    original_tokens = count_tokens(transcript)
+    tier = choose_tier(original_tokens, tiers)
+    budget = tier.get("budget", DEFAULT_BUDGET)
+    text = compress_transcript(transcript, budget)
+    transcript_tokens = count_tokens(text) if text is not transcript else original_tokens
+    messages = [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": USER_TEMPLATE.format(transcript=text)},
+    ]
+    return {
+        "model": tier["model"],
+        "messages": messages,
+        "prompt_version": prompt_version(budget),
+        "original_tokens": original_tokens,
+        "transcript_tokens": transcript_tokens,
+        "prompt_tokens": count_tokens(SYSTEM_PROMPT) + transcript_tokens,
+        "compressed": text != transcript,
+    }
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Limiteur de débit (seau à jetons) partagé entre threads pour CallX
+Utilisé pour respecter les quotas d'API (Aircall, OpenAI, SMTP)
+"""
+
+import threading
+import time
+
+
+class RateLimiter:
+    """
+    Seau à jetons : `rate` jetons par `per` secondes, avec une réserve de `burst` jetons
+
+    acquire(n) bloque jusqu'à ce que n jetons soient disponibles. Un limiteur
+    avec rate=None ne limite rien.
+    """
+
+    def __init__(self, rate, per=60.0, burst=None):
+        self.rate = rate
+        self.per = per
+        self.capacity = burst if burst is not None else rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self, amount=1):
+        if not self.rate:
+            return
+        # Une demande plus grosse que le seau passerait jamais : on la plafonne
+        amount = min(amount, self.capacity)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now >= self._blocked_until and self._tokens >= amount:
+                    self._tokens -= amount
+                    return
+                wait = max(self._blocked_until - now, (amount - self._tokens) * self.per / self.rate)
+            time.sleep(min(wait, 5.0))
+
+    def pause(self, seconds):
+        """Bloque tous les appelants pendant `seconds` (ex: Retry-After reçu du serveur)"""
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+
+    def _refill(self, now):
+        elapsed = now - self._updated
+        self._updated = now
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.rate / self.per)
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+Progression des commerciaux : série temporelle compacte (SQLite)
+Une ligne par commercial et par jour (appels, notes, somme des notes) et,
+par commercial, une moyenne mobile exponentielle des notes (demi-vie
+XCALL_PROGRESS_HALF_LIFE jours). L'EWMA est tenue sous forme de sommes
+pondérées ramenées au jour le plus récent : chaque analyse la met à jour en
+O(1), y compris en rattrapage (un jour ancien compte avec son vrai poids).
+Les fenêtres 7 jours, 7 jours précédents et 30 jours se lisent sur au plus
+30 lignes par commercial, quelle que soit la longueur de l'historique.
+
+La série est alimentée à chaque analyse sauvegardée (ingestion.py) et
+alignée sur les instantanés quotidiens (aggregates.py) des jours modifiés :
+un jour resynchronisé remplace ses lignes, sans double compte.
+
+    python rep_progress.py
+    python rep_progress.py --day 2025-09-30 --rebuild
+"""
+
+import os
+import sqlite3
+import argparse
+import threading
+from datetime import datetime
+
+from aggregates import DailyAggregates, parse_score
+from analysis_table import to_day_number, from_day_number
+
+PROGRESS_FILE = os.getenv('XCALL_PROGRESS_FILE', 'state/progress.db')
+# Demi-vie de la moyenne mobile exponentielle, en jours
+HALF_LIFE_DAYS = float(os.getenv('XCALL_PROGRESS_HALF_LIFE', 7))
+# Notes minimales sur chacune des deux semaines pour prétendre à la meilleure progression
+MIN_SCORED = int(os.getenv('XCALL_PROGRESS_MIN_SCORED', 3))
+
+# Fenêtres en jours avant le jour de référence (bornes incluses)
+WINDOWS = {"7Days": (0, 6), "Previous7Days": (7, 13), "30Days": (0, 29)}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS daily (
+    rep TEXT NOT NULL,
+    day TEXT NOT NULL,
+    calls INTEGER NOT NULL,
+    scored INTEGER NOT NULL,
+    score_sum INTEGER NOT NULL,
+    PRIMARY KEY (rep, day)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS daily_day ON daily (day);
+CREATE TABLE IF NOT EXISTS reps (
+    rep TEXT PRIMARY KEY,
+    ref_day INTEGER NOT NULL,
+    weight REAL NOT NULL,
+    weighted_sum REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sources (
+    day TEXT PRIMARY KEY,
+    fingerprint TEXT
+);
+"""
+
+
+def window_stats(totals):
+    """Statistiques d'un commercial (ou de l'équipe) à partir de ses totaux par fenêtre"""
+    stats = {}
+    for window, (calls, scored, score_sum) in totals.items():
+        stats[f"calls{window}"] = calls
+        stats[f"scored{window}"] = scored
+        stats[f"score{window}"] = round(score_sum / scored, 1) if scored else None
+    current, previous = totals["7Days"], totals["Previous7Days"]
+    stats["delta"] = stats["progression"] = None
+    if current[1] and previous[1]:
+        current_mean, previous_mean = current[2] / current[1], previous[2] / previous[1]
+        stats["delta"] = round(current_mean - previous_mean, 1)
+        if previous_mean:
+            stats["progression"] = round((current_mean - previous_mean) / previous_mean * 100)
+    return stats
+
+
+def empty_stats():
+    """Statistiques d'un commercial sans aucune ligne dans la série (aucun appel sur 30 jours)"""
+    return dict(window_stats({window: (0, 0, 0) for window in WINDOWS}), ewma=None)
+
+
+class ProgressStore:
+    """Série quotidienne par commercial et EWMA, partageable entre threads et processus"""
+
+    def __init__(self, path=PROGRESS_FILE, half_life=HALF_LIFE_DAYS):
+        self.decay = 0.5 ** (1 / half_life)
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    def close(self):
+        self._conn.close()
+
+    # Alimentation
+
+    def add(self, analysis, day=None):
+        """
+        Compte une nouvelle analyse (jour du fichier `day`, sinon date de l'appel) ;
+        renvoie False si le jour est illisible. La prochaine synchronisation du
+        jour remplace ses lignes, l'analyse n'est donc jamais comptée deux fois.
+        """
+        day = day or str(analysis.get("date", ""))[:10]
+        try:
+            datetime.strptime(day, '%Y-%m-%d')
+        except ValueError:
+            return False
+        score = parse_score(analysis)
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._apply(analysis.get("assignee_name", "Unknown"), day, 1, int(score is not None), score or 0)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return True
+
+    def _apply(self, rep, day, calls, scored, score_sum):
+        """Ajoute (ou retire, valeurs négatives) des totaux à un jour et à l'EWMA du commercial"""
+        self._conn.execute(
+            "INSERT INTO daily (rep, day, calls, scored, score_sum) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT (rep, day) DO UPDATE SET calls = calls + excluded.calls, "
+            "scored = scored + excluded.scored, score_sum = score_sum + excluded.score_sum",
+            (rep, day, calls, scored, score_sum))
+        self._conn.execute("DELETE FROM daily WHERE rep = ? AND day = ? AND calls <= 0", (rep, day))
+        if not scored and not score_sum:
+            # Une resynchronisation peut changer la somme sans changer le nombre de notes
+            return
+        number = to_day_number(day)
+        row = self._conn.execute("SELECT ref_day, weight, weighted_sum FROM reps WHERE rep = ?", (rep,)).fetchone()
+        ref_day, weight, weighted_sum = row or (number, 0.0, 0.0)
+        if number > ref_day:
+            # Nouveau jour de référence : tout l'historique vieillit d'autant
+            factor = self.decay ** (number - ref_day)
+            ref_day, weight, weighted_sum = number, weight * factor, weighted_sum * factor
+        factor = self.decay ** (ref_day - number)
+        self._conn.execute("INSERT OR REPLACE INTO reps (rep, ref_day, weight, weighted_sum) VALUES (?, ?, ?, ?)",
+                           (rep, ref_day, weight + factor * scored, weighted_sum + factor * score_sum))
+
+    def sync(self, aggregates):
+        """Aligne la série sur les instantanés (déjà rafraîchis) des jours modifiés ; renvoie ces jours"""
+        with self._lock:
+            known = dict(self._conn.execute("SELECT day, fingerprint FROM sources").fetchall())
+        changed = []
+        for day in sorted(set(known) | set(aggregates.index)):
+            digest = aggregates.index.get(day, {}).get("fingerprint")
+            if known.get(day) == digest:
+                continue
+            reps = aggregates.snapshot(day)["reps"] if digest else {}
+            with self._lock:
+                self._conn.execute("BEGIN IMMEDIATE")
+                try:
+                    current = {row[0]: row[1:] for row in self._conn.execute(
+                        "SELECT rep, calls, scored, score_sum FROM daily WHERE day = ?", (day,))}
+                    for rep in set(current) | set(reps):
+                        new = reps.get(rep, {})
+                        old = current.get(rep, (0, 0, 0))
+                        delta = [new.get(key, 0) - value for key, value in zip(("calls", "scored", "score_sum"), old)]
+                        if any(delta):
+                            self._apply(rep, day, *delta)
+                    if digest:
+                        self._conn.execute("INSERT OR REPLACE INTO sources (day, fingerprint) VALUES (?, ?)", (day, digest))
+                    else:
+                        self._conn.execute("DELETE FROM sources WHERE day = ?", (day,))
+                    self._conn.execute("COMMIT")
+                except BaseException:
+                    self._conn.execute("ROLLBACK")
+                    raise
+            changed.append(day)
+        return changed
+
+    def rebuild(self, aggregates):
+        with self._lock:
+            self._conn.executescript("DELETE FROM daily; DELETE FROM reps; DELETE FROM sources;")
+        return self.sync(aggregates)
+
+    # Lecture
+
+    def trends(self, end_day):
+        """
+        {"team": stats, "reps": {commercial: stats}} au jour `end_day`
+
+        stats : calls/scored/score pour 7Days, Previous7Days et 30Days, delta
+        (points) et progression (%) de la semaine sur la précédente, et pour
+        chaque commercial son EWMA (toutes les notes connues, pondérées par âge).
+        Un commercial sans appel sur 30 jours mais avec un historique figure
+        avec des fenêtres vides et son EWMA.
+        """
+        end = to_day_number(end_day)
+        with self._lock:
+            rows = self._conn.execute("SELECT rep, day, calls, scored, score_sum FROM daily WHERE day BETWEEN ? AND ?",
+                                      (from_day_number(end - 29), end_day)).fetchall()
+            ewma = {rep: round(weighted_sum / weight, 1)
+                    for rep, weight, weighted_sum in self._conn.execute("SELECT rep, weight, weighted_sum FROM reps")
+                    if weight > 0}
+        totals = {}  # commercial (None = équipe) -> {fenêtre: [appels, notes, somme]}
+        for rep, day, calls, scored, score_sum in rows:
+            offset = end - to_day_number(day)
+            for name in (rep, None):
+                windows = totals.setdefault(name, {window: [0, 0, 0] for window in WINDOWS})
+                for window, (low, high) in WINDOWS.items():
+                    if low <= offset <= high:
+                        total = windows[window]
+                        total[0] += calls
+                        total[1] += scored
+                        total[2] += score_sum
+        reps = {}
+        for name, windows in totals.items():
+            if name is not None:
+                reps[name] = window_stats(windows)
+                reps[name]["ewma"] = ewma.get(name)
+        for name in set(ewma) - set(reps):
+            # Aucun appel sur 30 jours mais un historique : fenêtres vides, EWMA conservée
+            reps[name] = dict(empty_stats(), ewma=ewma[name])
+        team = window_stats(totals.get(None) or {window: [0, 0, 0] for window in WINDOWS})
+        return {"team": team, "reps": reps}
+
+    def daily_means(self, end_day, length=30):
+        """{commercial: [moyenne du jour ou None] × length}, du plus ancien au plus récent"""
+        start = to_day_number(end_day) - length + 1
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT rep, day, scored, score_sum FROM daily WHERE day BETWEEN ? AND ? AND scored > 0 ORDER BY rep",
+                (from_day_number(start), end_day)).fetchall()
+        series = {}
+        for rep, day, scored, score_sum in rows:
+            series.setdefault(rep, [None] * length)[to_day_number(day) - start] = round(score_sum / scored, 1)
+        return series
+
+
+_DEFAULT = None
+_DEFAULT_LOCK = threading.Lock()
+
+
+def default_progress():
+    """Série partagée du processus (ouverte à la première utilisation)"""
+    global _DEFAULT
+    if _DEFAULT is None:
+        with _DEFAULT_LOCK:
+            if _DEFAULT is None:
+                _DEFAULT = ProgressStore()
+    return _DEFAULT
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Progression des commerciaux (7/30 jours, EWMA)")
+    parser.add_argument("--day", default=datetime.now().strftime('%Y-%m-%d'), help="Jour de référence (YYYY-MM-DD)")
+    parser.add_argument("--rebuild", action="store_true", help="Reconstruit la série depuis les instantanés quotidiens")
+    args = parser.parse_args()
+
+    store = ProgressStore()
+    aggregates = DailyAggregates()
+    aggregates.refresh()
+    changed = store.rebuild(aggregates) if args.rebuild else store.sync(aggregates)
+    if changed:
+        print(f"📈 {len(changed)} jour(s) synchronisé(s)")
+
+    found = store.trends(args.day)
+    team = found["team"]
+    print(f"👥 Équipe: {team['score7Days']} sur 7 jours ({team['calls7Days']} appels), "
+          f"{team['scorePrevious7Days']} la semaine précédente, {team['score30Days']} sur 30 jours")
+    for name, stats in sorted(found["reps"].items(), key=lambda item: -(item[1]["progression"] or 0)):
+        delta = f"{stats['delta']:+}" if stats["delta"] is not None else "-"
+        print(f"   • {name}: 7j {stats['score7Days']} ({delta}), 30j {stats['score30Days']}, "
+              f"EWMA {stats['ewma']} - {stats['calls7Days']} appels cette semaine")
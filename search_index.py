@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+"""
+Index de recherche plein texte des appels CallX (SQLite FTS5)
+Une entrée par call_id : transcription et champs de l'analyse (blocages,
+arguments, améliorations), avec commercial, client, date et mood en facettes.
+Le tokenizer unicode61 ignore la casse et les accents, et chaque mot cherche
+aussi ses formes féminin/pluriel : « tres cher » trouve « Très chère ».
+L'index est alimenté à chaque analyse sauvegardée (ingestion.py) et
+rattrape l'historique (analyses/ + transcriptions/) jour par jour, en ne
+relisant que les fichiers modifiés.
+
+    python search_index.py "trop cher" --rep "Louan Bardou" --from 2025-09-01
+    python search_index.py '"déjà un prestataire"' --field blockers
+    python search_index.py --rebuild
+"""
+
+import os
+import re
+import json
+import time
+import hashlib
+import sqlite3
+import argparse
+import threading
+
+from aggregates import fingerprint
+from analysis_loader import files_by_day, read_files
+from analysis_log import ANALYSES_DIR, iter_unique
+
+SEARCH_FILE = os.getenv('XCALL_SEARCH_FILE', 'state/search.db')
+TRANSCRIPTIONS_DIR = "transcriptions"
+
+# Colonnes indexées -> champ de l'analyse (None = transcription)
+FIELDS = {
+    "transcript": None,
+    "blockers": "blocages_client",
+    "successes": "arguments_reussis",
+    "failures": "arguments_non_reussis",
+    "improvements": "ameliorations",
+}
+# Poids BM25 par colonne : une phrase relevée par l'analyse compte plus qu'un mot de la transcription
+WEIGHTS = (1.0, 3.0, 2.0, 2.0, 2.0)
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS calls (
+    call_id INTEGER PRIMARY KEY,
+    rep TEXT,
+    rep_email TEXT,
+    client TEXT,
+    day TEXT,
+    date TEXT,
+    mood INTEGER,
+    indexed_at REAL,
+    digest TEXT
+);
+CREATE INDEX IF NOT EXISTS calls_rep ON calls(rep);
+CREATE INDEX IF NOT EXISTS calls_day ON calls(day);
+CREATE VIRTUAL TABLE IF NOT EXISTS documents USING fts5(
+    {", ".join(FIELDS)},
+    tokenize = "unicode61 remove_diacritics 2"
+);
+CREATE TABLE IF NOT EXISTS sources (
+    day TEXT PRIMARY KEY,
+    fingerprint TEXT
+);
+"""
+
+_TERM = re.compile(r'"([^"]*)"|(\S+)')
+_WORD = re.compile(r"\w+")
+# Terminaisons du féminin et du pluriel (cher, chère, chers, chères)
+_ENDINGS = ("es", "s", "e")
+
+
+def word_variants(word):
+    """Formes d'un mot au masculin/féminin, singulier/pluriel (les accents sont ignorés par l'index)"""
+    root = word
+    for ending in _ENDINGS:
+        if word.lower().endswith(ending) and len(word) - len(ending) >= 3:
+            root = word[:-len(ending)]
+            break
+    if len(root) < 3:
+        return [word]
+    return list(dict.fromkeys([word, root] + [root + ending for ending in _ENDINGS]))
+
+
+def build_query(text):
+    """
+    Requête FTS5 sûre à partir d'une saisie libre
+
+    Les mots sont combinés en ET et acceptent leurs formes féminin/pluriel,
+    "entre guillemets" = expression exacte, mot* = préfixe, OR entre deux termes.
+    Apostrophes et ponctuation ne cassent pas la syntaxe (l'offre → "l offre").
+    """
+    parts = []
+    for phrase, word in _TERM.findall(text):
+        if word == "OR":
+            if parts and parts[-1] != "OR":
+                parts.append("OR")
+            continue
+        tokens = _WORD.findall(phrase or word)
+        if not tokens:
+            continue
+        if word.endswith("*"):
+            term = '"' + " ".join(tokens) + '"*'
+        elif word and len(tokens) == 1:
+            variants = word_variants(tokens[0].lower())
+            term = " OR ".join(f'"{variant}"' for variant in variants)
+            term = f"({term})" if len(variants) > 1 else term
+        else:
+            term = '"' + " ".join(tokens) + '"'
+        parts.append(term)
+    while parts and parts[-1] == "OR":
+        parts.pop()
+    # ET explicite : FTS5 n'accepte pas l'ET implicite devant une parenthèse
+    query = []
+    for part in parts:
+        if query and part != "OR" and query[-1] != "OR":
+            query.append("AND")
+        query.append(part)
+    return " ".join(query)
+
+
+def _score(analysis):
+    value = str(analysis.get("mood_global", "")).replace("/10", "").strip()
+    return int(value) if value.isdigit() else None
+
+
+class SearchIndex:
+    """Index FTS5 des appels, partageable entre threads"""
+
+    def __init__(self, path=SEARCH_FILE):
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        if "digest" not in {row[1] for row in self._conn.execute("PRAGMA table_info(calls)")}:
+            # Index d'avant l'empreinte par appel : chaque appel sera réindexé une fois au prochain rattrapage
+            self._conn.execute("ALTER TABLE calls ADD COLUMN digest TEXT")
+        self._lock = threading.Lock()
+
+    def close(self):
+        self._conn.close()
+
+    # Alimentation
+
+    def add(self, analysis, transcript=None):
+        """Indexe (ou remplace) un appel ; renvoie False si l'analyse n'a pas de call_id"""
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                added = self._add(analysis, transcript)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return added
+
+    def _add(self, analysis, transcript):
+        call_id = analysis.get("call_id")
+        if not str(call_id).isdigit():
+            return False
+        call_id = int(call_id)
+        date = str(analysis.get("date", ""))
+        self._conn.execute(
+            "INSERT OR REPLACE INTO calls (call_id, rep, rep_email, client, day, date, mood, indexed_at, digest) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (call_id, analysis.get("assignee_name"), analysis.get("assignee_email"), analysis.get("client_name"),
+             date[:10], date, _score(analysis), time.time(), _digest(analysis, transcript)),
+        )
+        columns = [transcript or ""] + ["\n".join(analysis.get(field) or []) for field in list(FIELDS.values())[1:]]
+        self._conn.execute("DELETE FROM documents WHERE rowid = ?", (call_id,))
+        self._conn.execute(f"INSERT INTO documents (rowid, {', '.join(FIELDS)}) VALUES (?, ?, ?, ?, ?, ?)",
+                           (call_id, *columns))
+        return True
+
+    def sync(self, directory=ANALYSES_DIR, transcriptions_dir=TRANSCRIPTIONS_DIR):
+        """
+        Rattrape les jours dont les fichiers d'analyses ont changé ; dans ces jours, seuls les appels
+        nouveaux ou modifiés (analyse ou transcription) sont réindexés. Renvoie leur nombre
+        """
+        with self._lock:
+            known = dict(self._conn.execute("SELECT day, fingerprint FROM sources").fetchall())
+        added = 0
+        for day, file_names in sorted(files_by_day(directory).items()):
+            digest = fingerprint(directory, file_names)
+            if known.get(day) == digest:
+                continue
+            analyses = list(iter_unique(*read_files(directory, file_names)))
+            with self._lock:
+                indexed = dict(self._conn.execute("SELECT call_id, digest FROM calls WHERE day = ?", (day,)))
+                self._conn.execute("BEGIN")
+                try:
+                    for analysis in analyses:
+                        call_id = analysis.get("call_id")
+                        if not str(call_id).isdigit():
+                            continue
+                        transcript = _read_transcript(transcriptions_dir, call_id, str(analysis.get("date", ""))[:10])
+                        if indexed.get(int(call_id)) == _digest(analysis, transcript):
+                            continue
+                        added += self._add(analysis, transcript)
+                    self._conn.execute("INSERT OR REPLACE INTO sources (day, fingerprint) VALUES (?, ?)", (day, digest))
+                    self._conn.execute("COMMIT")
+                except BaseException:
+                    self._conn.execute("ROLLBACK")
+                    raise
+        return added
+
+    def rebuild(self, directory=ANALYSES_DIR, transcriptions_dir=TRANSCRIPTIONS_DIR):
+        with self._lock:
+            self._conn.executescript("DELETE FROM calls; DELETE FROM documents; DELETE FROM sources;")
+        added = self.sync(directory, transcriptions_dir)
+        with self._lock:
+            self._conn.execute("INSERT INTO documents (documents) VALUES ('optimize')")
+        return added
+
+    # Recherche
+
+    def search(self, text, rep=None, start=None, end=None, field=None, limit=20, offset=0, highlight=("[", "]")):
+        """
+        Appels correspondant à `text`, du plus pertinent au moins pertinent (BM25)
+
+        Filtres : commercial (nom ou email), jours inclus 'YYYY-MM-DD', colonne
+        (transcript, blockers, successes, failures, improvements). Renvoie
+        {"query", "total", "results": [...], "facets": {"reps", "days"}, "took_ms"}.
+        """
+        started = time.perf_counter()
+        query = build_query(text)
+        if field:
+            if field not in FIELDS:
+                raise ValueError(f"Champ inconnu: {field} (choix: {', '.join(FIELDS)})")
+            query = f"{{{field}}} : ({query})" if query else ""
+        empty = {"query": query, "total": 0, "results": [], "facets": {"reps": {}, "days": {}}}
+        if not query:
+            return {**empty, "took_ms": 0.0}
+
+        conditions, params = ["documents MATCH ?"], [query]
+        if rep:
+            conditions.append("(calls.rep = ? OR calls.rep_email = ?)")
+            params += [rep, rep]
+        if start:
+            conditions.append("calls.day >= ?")
+            params.append(start)
+        if end:
+            conditions.append("calls.day <= ?")
+            params.append(end)
+        where = " AND ".join(conditions)
+        base = f"FROM documents JOIN calls ON calls.call_id = documents.rowid WHERE {where}"
+        weights = ", ".join(str(w) for w in WEIGHTS)
+        with self._lock:
+            try:
+                rows = self._conn.execute(
+                    f"SELECT calls.call_id, calls.rep, calls.client, calls.date, calls.mood, "
+                    f"bm25(documents, {weights}) AS rank, "
+                    f"snippet(documents, -1, ?, ?, '…', 16) "
+                    f"{base} ORDER BY rank LIMIT ? OFFSET ?",
+                    [*highlight, *params, limit, offset],
+                ).fetchall()
+                # Total et facettes en un seul parcours des correspondances
+                groups = self._conn.execute(f"SELECT calls.rep, calls.day, COUNT(*) {base} GROUP BY 1, 2",
+                                            params).fetchall()
+            except sqlite3.OperationalError as e:
+                raise ValueError(f"Requête invalide: {text} ({e})") from e
+        reps, days = {}, {}
+        for rep_name, day, count in groups:
+            reps[rep_name] = reps.get(rep_name, 0) + count
+            days[day] = days.get(day, 0) + count
+        return {
+            "query": query,
+            "total": sum(reps.values()),
+            "results": [
+                {"call_id": call_id, "rep": rep_name, "client": client, "date": date, "mood": mood,
+                 "score": round(-rank, 3), "snippet": snippet}
+                for call_id, rep_name, client, date, mood, rank, snippet in rows
+            ],
+            "facets": {"reps": dict(sorted(reps.items(), key=lambda item: -item[1])),
+                       "days": dict(sorted(days.items(), reverse=True))},
+            "took_ms": round((time.perf_counter() - started) * 1000, 2),
+        }
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM calls").fetchone()[0]
+
+
+def _digest(analysis, transcript):
+    """Empreinte de ce qui est indexé pour un appel : l'analyse et sa transcription"""
+    content = json.dumps(analysis, sort_keys=True, ensure_ascii=False) + "\0" + (transcript or "")
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def _read_transcript(directory, call_id, day):
+    path = os.path.join(directory, f"call_{call_id}_{day}.txt")
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+_DEFAULT = None
+_DEFAULT_LOCK = threading.Lock()
+
+
+def default_index():
+    """Index partagé du processus (ouvert à la première utilisation)"""
+    global _DEFAULT
+    if _DEFAULT is None:
+        with _DEFAULT_LOCK:
+            if _DEFAULT is None:
+                _DEFAULT = SearchIndex()
+    return _DEFAULT
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Recherche plein texte dans les appels CallX")
+    parser.add_argument("query", nargs="?", help='Mots, "expression exacte", préfixe*, OR')
+    parser.add_argument("--rep", help="Nom ou email du commercial")
+    parser.add_argument("--from", dest="start", help="Premier jour (YYYY-MM-DD)")
+    parser.add_argument("--to", dest="end", help="Dernier jour inclus (YYYY-MM-DD)")
+    parser.add_argument("--field", choices=list(FIELDS), help="Limiter la recherche à un champ")
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--json", action="store_true", help="Résultats en JSON")
+    parser.add_argument("--rebuild", action="store_true", help="Reconstruit l'index depuis analyses/ et transcriptions/")
+    args = parser.parse_args()
+
+    index = SearchIndex()
+    if args.rebuild:
+        print(f"🔎 Index reconstruit: {index.rebuild()} appels")
+    else:
+        added = index.sync()
+        if added:
+            print(f"🔎 {added} appel(s) ajouté(s) ou mis à jour dans l'index")
+    if args.query:
+        found = index.search(args.query, rep=args.rep, start=args.start, end=args.end, field=args.field, limit=args.limit)
+        if args.json:
+            print(json.dumps(found, indent=2, ensure_ascii=False))
+        else:
+            print(f"🔎 {found['total']} appel(s) pour {found['query']} ({found['took_ms']} ms)\n")
+            for result in found["results"]:
+                print(f"📞 {result['call_id']} - {result['date']} - {result['rep']} - {result['client']} - mood {result['mood']}")
+                print(f"   {' '.join(result['snippet'].split())}\n")
+            if found["facets"]["reps"]:
+                print("👥 " + ", ".join(f"{name} ({count})" for name, count in found["facets"]["reps"].items()))
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Agrégation en flux pour CallX
+SpaceSaving garde les phrases les plus fréquentes (blocages, arguments,
+améliorations) dans une mémoire bornée par `capacity`, avec pour chaque phrase
+une borne d'erreur sur son compte. Tant que le nombre de phrases distinctes
+reste sous la capacité, les comptes sont exacts et most_common() renvoie
+exactement ce que renverrait collections.Counter. Les phrases quasi identiques
+sont d'abord ramenées au libellé de leur groupe (phrase_clusters.py).
+"""
+
+import os
+import heapq
+import itertools
+
+from aggregates import COUNTER_FIELDS, parse_score
+from phrase_clusters import NAMESPACES, default_clusters
+
+TOPK_CAPACITY = int(os.getenv('XCALL_TOPK_CAPACITY', 1000))
+
+
+class SpaceSaving:
+    """
+    Sketch Space-Saving (Metwally et al.) pondéré
+
+    Pour une phrase suivie, count - error <= vrai compte <= count. Une phrase
+    non suivie apparaît au plus min_count() fois, et min_count() <= total / capacity.
+    """
+
+    def __init__(self, capacity=TOPK_CAPACITY):
+        self.capacity = capacity
+        self.total = 0
+        self.evictions = 0
+        self._counts = {}   # phrase -> [compte estimé, erreur]
+        self._heap = []     # (compte, ordre, phrase) ; entrées périmées ignorées
+        self._order = itertools.count()
+
+    def update(self, item, count=1):
+        self.total += count
+        entry = self._counts.get(item)
+        if entry is not None:
+            entry[0] += count
+        elif len(self._counts) < self.capacity:
+            entry = self._counts[item] = [count, 0]
+        else:
+            # La phrase la moins comptée cède sa place ; son compte devient l'erreur de la nouvelle
+            floor, evicted = self._pop_min()
+            del self._counts[evicted]
+            self.evictions += 1
+            entry = self._counts[item] = [floor + count, floor]
+        heapq.heappush(self._heap, (entry[0], next(self._order), item))
+        if len(self._heap) > 4 * self.capacity + 64:
+            self._rebuild_heap()
+
+    def update_many(self, items):
+        for item in items:
+            self.update(item)
+
+    def __bool__(self):
+        return bool(self._counts)
+
+    def __len__(self):
+        return len(self._counts)
+
+    def __contains__(self, item):
+        return item in self._counts
+
+    def get(self, item, default=0):
+        """Compte estimé (borne haute) d'une phrase suivie, sinon `default`"""
+        entry = self._counts.get(item)
+        return entry[0] if entry else default
+
+    def error(self, item):
+        entry = self._counts.get(item)
+        return entry[1] if entry else self.min_count()
+
+    def min_count(self):
+        """Compte maximal d'une phrase non suivie (0 tant que le sketch n'a rien évincé)"""
+        if not self.evictions:
+            return 0
+        return self._peek_min()[0]
+
+    def most_common(self, n=None):
+        """[(phrase, compte)] par compte décroissant, à égalité dans l'ordre d'arrivée (comme Counter)"""
+        ranked = sorted(self._counts.items(), key=lambda kv: kv[1][0], reverse=True)
+        return [(item, entry[0]) for item, entry in ranked[:n]]
+
+    def _peek_min(self):
+        while True:
+            count, _, item = self._heap[0]
+            entry = self._counts.get(item)
+            if entry is not None and entry[0] == count:
+                return count, item
+            heapq.heappop(self._heap)
+
+    def _pop_min(self):
+        count, item = self._peek_min()
+        heapq.heappop(self._heap)
+        return count, item
+
+    def _rebuild_heap(self):
+        self._heap = [(entry[0], next(self._order), item) for item, entry in self._counts.items()]
+        heapq.heapify(self._heap)
+
+
+class StreamingAggregator:
+    """
+    Statistiques du dashboard en un seul passage sur un flux d'analyses
+
+    Scores et totaux par commercial sont exacts ; les phrases (COUNTER_FIELDS)
+    sont comptées par groupe de phrases quasi identiques (`clusters`, index
+    partagé par défaut, désactivé par XCALL_PHRASE_CLUSTERS=0) dans des
+    sketches SpaceSaving de capacité bornée.
+    """
+
+    def __init__(self, capacity=TOPK_CAPACITY, clusters=None):
+        self.clusters = clusters if clusters is not None else default_clusters()
+        self.calls = 0
+        self.scored = 0
+        self.score_sum = 0
+        self.reps = {}
+        self.sketches = {field: SpaceSaving(capacity) for field in COUNTER_FIELDS}
+
+    def add(self, analysis):
+        self.calls += 1
+        rep = self.reps.setdefault(analysis.get("assignee_name", "Unknown"), {"calls": 0, "scored": 0, "score_sum": 0})
+        rep["calls"] += 1
+        score = parse_score(analysis)
+        if score is not None:
+            self.scored += 1
+            self.score_sum += score
+            rep["scored"] += 1
+            rep["score_sum"] += score
+        for field, source in COUNTER_FIELDS.items():
+            phrases = analysis.get(source, [])
+            if self.clusters and phrases:
+                labels = self.clusters.labels(NAMESPACES[field], phrases)
+                phrases = [labels[phrase] for phrase in phrases]
+            self.sketches[field].update_many(phrases)
+
+    def add_snapshot(self, snapshot):
+        """Ajoute un instantané quotidien (voir aggregates.py) sans relire ses analyses"""
+        for key in ("calls", "scored", "score_sum"):
+            setattr(self, key, getattr(self, key) + snapshot[key])
+        for name, rep in snapshot["reps"].items():
+            total = self.reps.setdefault(name, {"calls": 0, "scored": 0, "score_sum": 0})
+            for key in total:
+                total[key] += rep[key]
+        for field in COUNTER_FIELDS:
+            sketch = self.sketches[field]
+            counts = snapshot[field]
+            if self.clusters and counts:
+                counts = self.clusters.canonical_counts(NAMESPACES[field], counts)
+            for phrase, count in counts.items():
+                sketch.update(phrase, count)
+
+    def consume(self, analyses):
+        for analysis in analyses:
+            self.add(analysis)
+        return self
+
+    def result(self):
+        data = {"calls": self.calls, "total_calls": self.calls, "scored": self.scored,
+                "score_sum": self.score_sum, "reps": self.reps}
+        data.update(self.sketches)
+        return data
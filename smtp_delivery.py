@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+Envoi des emails CallX par SMTP
+SMTPPool garde quelques connexions authentifiées ouvertes et les partage entre
+threads (STARTTLS obligatoire : pas d'identifiants en clair) ; une connexion
+coupée par le serveur avant DATA est rouverte sans perdre le message. DeliveryEngine envoie en parallèle sous un plafond de messages par
+minute ; un envoi qui échoue encore est mis dans une file de reprise SQLite
+(state/email_retry.db) rejouée au run suivant, avec backoff.
+"""
+
+import os
+import ssl
+import time
+import queue
+import email
+import sqlite3
+import smtplib
+import threading
+from email import policy
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+from rate_limit import RateLimiter
+
+MESSAGES_PER_MINUTE = int(os.getenv('SMTP_MESSAGES_PER_MINUTE', 60))
+POOL_SIZE = int(os.getenv('SMTP_POOL_SIZE', 4))
+RETRY_FILE = os.getenv('XCALL_EMAIL_RETRY_FILE', 'state/email_retry.db')
+MAX_ATTEMPTS = int(os.getenv('XCALL_EMAIL_MAX_ATTEMPTS', 5))
+
+# STARTTLS obligatoire hors port 465 ; SMTP_STARTTLS=0 seulement pour le faux serveur local (fake_services.py)
+STARTTLS = os.getenv('SMTP_STARTTLS', '1') == '1'
+
+# Erreurs de connexion : avant DATA on rouvre la connexion et on renvoie le message, après DATA l'issue est incertaine
+RECONNECT_ERRORS = (smtplib.SMTPServerDisconnected, ConnectionError, TimeoutError)
+# Issues d'un envoi, comptées par DeliveryEngine.send_all
+OUTCOMES = ("sent", "queued", "uncertain", "abandoned")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS retries (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    recipient TEXT NOT NULL,
+    message TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    last_error TEXT,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS retries_next ON retries(next_attempt_at);
+"""
+
+
+class DeliveryUncertain(Exception):
+    """Connexion perdue ou délai dépassé après le début de DATA : le serveur a pu accepter le message, il n'est pas renvoyé"""
+
+
+class _DataTracking:
+    """Note le début de DATA ; au-delà, un renvoi pourrait doubler le message"""
+
+    data_started = False
+
+    def data(self, msg):
+        self.data_started = True
+        return super().data(msg)
+
+
+class _SMTP(_DataTracking, smtplib.SMTP):
+    pass
+
+
+class _SMTP_SSL(_DataTracking, smtplib.SMTP_SSL):
+    pass
+
+
+class SMTPPool:
+    """Connexions SMTP authentifiées réutilisables (TLS implicite sur 465, STARTTLS obligatoire sinon)"""
+
+    def __init__(self, server, port, username=None, password=None, size=POOL_SIZE, timeout=30, starttls=STARTTLS):
+        self.server = server
+        self.port = port
+        self.username = username
+        self.password = password
+        self.timeout = timeout
+        self.starttls = starttls
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self.connections_opened = 0
+
+    def connect(self):
+        if self.port == 465:
+            connection = _SMTP_SSL(self.server, self.port, context=ssl.create_default_context(), timeout=self.timeout)
+        else:
+            connection = _SMTP(self.server, self.port, timeout=self.timeout)
+            connection.ehlo()
+            if self.starttls:
+                if not connection.has_extn("starttls"):
+                    # Extension absente ou retirée en chemin : les identifiants ne partent pas en clair
+                    connection.close()
+                    raise smtplib.SMTPNotSupportedError(f"{self.server}:{self.port} ne propose pas STARTTLS")
+                connection.starttls(context=ssl.create_default_context())
+                connection.ehlo()
+        if self.username:
+            connection.login(self.username, self.password)
+        self.connections_opened += 1
+        return connection
+
+    def send(self, message):
+        """
+        Envoie un message sur une connexion du pool ; une connexion coupée avant DATA
+        est rouverte une fois. Une coupure ou un délai dépassé après le début de DATA
+        lève DeliveryUncertain : le message a pu être accepté, il n'est renvoyé ni ici ni plus tard.
+        """
+        with self._slots:
+            connection = self._take()
+            try:
+                try:
+                    self._send(connection, message)
+                except RECONNECT_ERRORS:
+                    if connection.data_started:
+                        raise
+                    self._discard(connection)
+                    connection = self.connect()
+                    self._send(connection, message)
+            except RECONNECT_ERRORS as e:
+                self._discard(connection)
+                if connection.data_started:
+                    raise DeliveryUncertain(f"connexion perdue pendant DATA: {type(e).__name__}: {e}") from e
+                raise
+            except BaseException:
+                self._discard(connection)
+                raise
+            self._idle.put(connection)
+
+    @staticmethod
+    def _send(connection, message):
+        connection.data_started = False
+        connection.send_message(message)
+
+    def close(self):
+        while True:
+            try:
+                connection = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                connection.quit()
+            except Exception:
+                pass
+
+    def _take(self):
+        try:
+            connection = self._idle.get_nowait()
+        except queue.Empty:
+            return self.connect()
+        try:
+            # Une connexion restée inactive a pu être fermée par le serveur
+            if connection.noop()[0] == 250:
+                return connection
+        except OSError:  # SMTPException en hérite
+            pass
+        self._discard(connection)
+        return self.connect()
+
+    def _discard(self, connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+
+class RetryQueue:
+    """File de reprise durable des emails non envoyés"""
+
+    def __init__(self, path=RETRY_FILE, max_attempts=MAX_ATTEMPTS, base_delay=300):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self._lock = threading.Lock()
+
+    def push(self, message, error, attempts=1, retry_id=None):
+        """Met (ou remet) un message en file ; abandonné après max_attempts tentatives"""
+        now = time.time()
+        with self._lock:
+            if retry_id is not None:
+                if attempts >= self.max_attempts:
+                    self._conn.execute("DELETE FROM retries WHERE id = ?", (retry_id,))
+                    return False
+                self._conn.execute(
+                    "UPDATE retries SET attempts = ?, next_attempt_at = ?, last_error = ? WHERE id = ?",
+                    (attempts, now + self.base_delay * 2 ** (attempts - 1), str(error), retry_id),
+                )
+                return True
+            self._conn.execute(
+                "INSERT INTO retries (recipient, message, attempts, next_attempt_at, last_error, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (message['To'], message.as_string(), attempts, now + self.base_delay, str(error), now),
+            )
+        return True
+
+    def due(self, now=None):
+        """[(id, message, tentatives)] dont la prochaine tentative est échue"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, message, attempts FROM retries WHERE next_attempt_at <= ? ORDER BY id",
+                (now if now is not None else time.time(),),
+            ).fetchall()
+        return [(row[0], email.message_from_string(row[1], policy=policy.SMTP), row[2]) for row in rows]
+
+    def done(self, retry_id):
+        with self._lock:
+            self._conn.execute("DELETE FROM retries WHERE id = ?", (retry_id,))
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM retries").fetchone()[0]
+
+    def close(self):
+        self._conn.close()
+
+
+class DeliveryEngine:
+    """Envoi concurrent sous plafond de débit, avec file de reprise"""
+
+    def __init__(self, pool, retry_queue=None, workers=None, messages_per_minute=MESSAGES_PER_MINUTE):
+        self.pool = pool
+        self.retries = retry_queue
+        self.workers = workers or POOL_SIZE
+        self.limiter = RateLimiter(messages_per_minute, per=60.0)
+
+    def send_all(self, messages):
+        """
+        Envoie les messages ; renvoie le nombre de messages par issue :
+        sent, queued (file de reprise), uncertain (peut-être reçu, non renvoyé)
+        et abandoned (trop de tentatives, ou pas de file de reprise)
+        """
+        jobs = [(message, None, 0) for message in messages]
+        if self.retries is not None:
+            jobs = [(message, retry_id, attempts) for retry_id, message, attempts in self.retries.due()] + jobs
+        outcomes = dict.fromkeys(OUTCOMES, 0)
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="smtp") as executor:
+            for outcome in executor.map(lambda job: self._deliver(*job), jobs):
+                outcomes[outcome] += 1
+        return outcomes
+
+    def _deliver(self, message, retry_id, attempts):
+        self.limiter.acquire()
+        try:
+            with metrics.timer("email_send_seconds"):
+                self.pool.send(message)
+        except DeliveryUncertain as e:
+            print(f"⚠️ Email pour {message['To']} peut-être déjà reçu, non renvoyé: {e}")
+            metrics.incr("errors", stage="email_uncertain")
+            if retry_id is not None:
+                self.retries.done(retry_id)
+            return "uncertain"
+        except Exception as e:
+            print(f"❌ Erreur envoi email à {message['To']}: {e}")
+            metrics.incr("errors", stage="email")
+            if self.retries is not None and self.retries.push(message, e, attempts=attempts + 1, retry_id=retry_id):
+                print(f"📥 Email pour {message['To']} mis en file de reprise")
+                return "queued"
+            print(f"🗑️ Email pour {message['To']} abandonné après {attempts + 1} tentative(s)")
+            return "abandoned"
+        if retry_id is not None:
+            self.retries.done(retry_id)
+        metrics.incr("emails_sent")
+        print(f"✅ Email envoyé à {message['To']}")
+        return "sent"
@@ -0,0 +1,356 @@
+#!/usr/bin/env python3
+"""
+Service de statistiques CallX (FastAPI)
+Le dashboard est gardé en mémoire, déjà sérialisé et compressé. Un thread
+surveille le dossier analyses/ et ne recalcule que lorsque des fichiers
+changent (instantanés par jour, voir aggregates.py) ; chaque recalcul
+incrémente la version et l'ETag. Les requêtes filtrées (période, commercial)
+sont mises en cache pour la version courante.
+
+/search fait une recherche plein texte (transcriptions et analyses) dans
+l'index FTS5 (search_index.py), rattrapé à chaque nouvelle version.
+
+/events pousse en Server-Sent Events un petit delta par nouvelle version
+(nouveaux appels, lignes du classement et compteurs modifiés) ; ?since=<version>
+(ou Last-Event-ID) rejoue les deltas manqués, ou renvoie un snapshot complet
+si la version demandée n'est plus dans l'historique ou vient d'un autre
+démarrage du service (l'id des événements porte l'époque de démarrage).
+
+    uvicorn stats_service:app --port 8000    (ou python stats_service.py)
+"""
+
+import os
+import gzip
+import html
+import asyncio
+import json
+import hashlib
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+
+import metrics
+
+from aggregates import DailyAggregates, files_by_day, fingerprint
+from analysis_loader import load_analyses
+from generate_real_extracted_data import generate_real_only_dashboard, generate_filtered_dashboard
+from search_index import SEARCH_FILE, SearchIndex
+
+STATS_HOST = os.getenv('XCALL_STATS_HOST', '127.0.0.1')
+STATS_PORT = int(os.getenv('XCALL_STATS_PORT', 8000))
+POLL_SECONDS = float(os.getenv('XCALL_STATS_POLL_SECONDS', 2))
+FILTERED_CACHE_SIZE = int(os.getenv('XCALL_STATS_CACHE_SIZE', 256))
+EVENT_HISTORY = int(os.getenv('XCALL_STATS_EVENT_HISTORY', 500))
+HEARTBEAT_SECONDS = 15
+
+# Champs du dashboard envoyés à part dans les deltas (ligne par ligne / commercial par commercial)
+KEYED_FIELDS = ("weeklyLeaderboard", "dailyScores")
+CALL_SUMMARY_FIELDS = ("call_id", "date", "assignee_name", "client_name", "mood_global")
+
+NO_DATA = {
+    "error": True,
+    "message": "Aucune donnée réelle trouvée. Lancez 'python Xcall.py' pour analyser des appels.",
+    "instructions": [
+        "1. Assurez-vous d'avoir des analyses dans le dossier 'analyses/'",
+        "2. Lancez: python Xcall.py",
+        "3. Rechargez le dashboard"
+    ]
+}
+
+
+class Payload:
+    """Réponse JSON prête à servir : corps brut, corps gzip et ETag"""
+
+    def __init__(self, data, version):
+        self.data = data
+        self.version = version
+        self.body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self.gzipped = gzip.compress(self.body, compresslevel=6)
+        self.etag = f'"{version}-{hashlib.sha256(self.body).hexdigest()[:16]}"'
+
+
+def diff_dashboards(previous, current, new_calls):
+    """Delta entre deux versions du dashboard : appels ajoutés, lignes et compteurs modifiés"""
+    fields = {key: value for key, value in current.items()
+              if key not in KEYED_FIELDS and previous.get(key) != value}
+    previous_rows = {row["name"]: row for row in previous.get("weeklyLeaderboard", [])}
+    current_rows = {row["name"]: row for row in current.get("weeklyLeaderboard", [])}
+    previous_scores = previous.get("dailyScores", {})
+    return {
+        "calls": new_calls,
+        "fields": fields,
+        "leaderboard": [row for name, row in current_rows.items() if previous_rows.get(name) != row],
+        "leaderboardRemoved": [name for name in previous_rows if name not in current_rows],
+        "dailyScores": {name: series for name, series in current.get("dailyScores", {}).items()
+                        if previous_scores.get(name) != series},
+    }
+
+
+def sse(event, data, version, epoch):
+    return f"id: {epoch}.{version}\nevent: {event}\ndata: {data}\n\n"
+
+
+def parse_event_id(value):
+    """(époque, version) d'un Last-Event-ID "époque.version", None s'il est illisible"""
+    epoch, _, version = (value or "").partition(".")
+    if not (epoch.isdigit() and version.isdigit()):
+        return None
+    return int(epoch), int(version)
+
+
+class StatsStore:
+    """Dashboard en mémoire, recalculé seulement quand les analyses changent"""
+
+    def __init__(self, directory="analyses", poll_seconds=POLL_SECONDS, cache_size=FILTERED_CACHE_SIZE):
+        self.directory = directory
+        self.poll_seconds = poll_seconds
+        self.cache_size = cache_size
+        self.aggregates = DailyAggregates(directory)
+        self.epoch = time.time_ns() // 1_000_000  # les versions repartent de 0 à chaque démarrage
+        self.version = 0
+        self.current = Payload(NO_DATA, 0)
+        self._signature = None
+        self._filtered = OrderedDict()
+        self._lock = threading.Lock()
+        self._listeners = []
+        self._stop = threading.Event()
+        self._events = deque(maxlen=EVENT_HISTORY)  # (version, type, JSON)
+        self._call_ids = {}  # jour -> call_id déjà publiés
+
+    def signature(self):
+        """Empreinte peu coûteuse du dossier (stat des fichiers, sans les lire)"""
+        days = files_by_day(self.directory)
+        return tuple(sorted((day, fingerprint(self.directory, names)) for day, names in days.items()))
+
+    def refresh(self, force=False):
+        """Recalcule le dashboard si les fichiers ont changé ; renvoie True si une nouvelle version est publiée"""
+        signature = self.signature()
+        if signature == self._signature and not force:
+            return False
+        previous_days = dict(self._signature or ())
+        changed_days = [day for day, digest in signature if previous_days.get(day) != digest]
+        new_calls = self._new_calls(changed_days)
+        with metrics.timer("dashboard_build_seconds", kind="full"):
+            data = generate_real_only_dashboard(self.aggregates) or NO_DATA
+        with self._lock:
+            first = self._signature is None
+            self._signature = signature
+            self.version += 1
+            previous, self.current = self.current, Payload(data, self.version)
+            self._filtered.clear()
+            if not first:
+                self._publish(previous, self.current, new_calls)
+            listeners = list(self._listeners)
+        for listener in listeners:
+            listener(previous, self.current)
+        return True
+
+    def filtered(self, start=None, end=None, rep=None):
+        """Payload d'une requête filtrée, en cache pour la version courante"""
+        key = (self.version, start, end, rep)
+        with self._lock:
+            payload = self._filtered.get(key)
+            if payload is not None:
+                self._filtered.move_to_end(key)
+                metrics.incr("stats_cache", result="hit")
+                return payload
+        metrics.incr("stats_cache", result="miss")
+        with metrics.timer("dashboard_build_seconds", kind="filtered"):
+            data = generate_filtered_dashboard(start=start, end=end, assignee=rep) or NO_DATA
+        payload = Payload(data, key[0])
+        with self._lock:
+            self._filtered[key] = payload
+            while len(self._filtered) > self.cache_size:
+                self._filtered.popitem(last=False)
+        return payload
+
+    def events_since(self, version, epoch=None):
+        """
+        (événements postérieurs à `version`, complet) ; complet=False si l'historique ne
+        remonte pas assez loin ou si la version vient d'un autre démarrage (époque différente,
+        ou version au-delà de la version courante)
+        """
+        with self._lock:
+            if (epoch is not None and epoch != self.epoch) or version > self.version:
+                return [], False
+            if version == self.version:
+                return [], True
+            if not self._events or self._events[0][0] > version + 1:
+                return [], False
+            return [event for event in self._events if event[0] > version], True
+
+    def _publish(self, previous, current, new_calls):
+        if "error" in previous.data or "error" in current.data:
+            # Passage de "pas de données" à des données (ou l'inverse) : le client repart d'un snapshot
+            self._events.append((current.version, "snapshot", current.body.decode("utf-8")))
+            return
+        delta = diff_dashboards(previous.data, current.data, new_calls)
+        delta["version"] = current.version
+        self._events.append((current.version, "delta", json.dumps(delta, ensure_ascii=False)))
+
+    def _new_calls(self, days):
+        """Résumés des appels apparus dans les jours modifiés depuis la dernière version"""
+        summaries = []
+        for day in days:
+            known = self._call_ids.setdefault(day, set())
+            for analysis in load_analyses(start=day, end=day, directory=self.directory):
+                call_id = analysis.get("call_id")
+                if call_id in known:
+                    continue
+                known.add(call_id)
+                summaries.append({key: analysis.get(key) for key in CALL_SUMMARY_FIELDS})
+        return summaries
+
+    def subscribe(self, listener):
+        """listener(ancien Payload, nouveau Payload) est appelé à chaque nouvelle version"""
+        with self._lock:
+            self._listeners.append(listener)
+
+    def watch(self):
+        """Surveille le dossier d'analyses dans un thread de fond"""
+        def loop():
+            while not self._stop.wait(self.poll_seconds):
+                try:
+                    if self.refresh():
+                        print(f"🔄 Statistiques mises à jour (version {self.version})")
+                except Exception as e:
+                    print(f"❌ Erreur mise à jour des statistiques: {e}")
+        threading.Thread(target=loop, name="stats-watch", daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+
+
+def etag_matches(if_none_match, etag):
+    """
+    If-None-Match contient-il `etag` ? Liste d'entity-tags séparés par des virgules,
+    comparaison faible (W/ ignoré) et exacte, ou "*"
+    """
+    tags = [tag.strip() for tag in (if_none_match or "").split(",")]
+    return "*" in tags or etag in (tag[2:] if tag.startswith("W/") else tag for tag in tags)
+
+
+def respond(request, payload):
+    """Réponse avec ETag : 304 si le client a déjà cette version, gzip s'il l'accepte"""
+    headers = {"ETag": payload.etag, "Cache-Control": "no-cache", "X-Stats-Version": str(payload.version)}
+    if etag_matches(request.headers.get("if-none-match"), payload.etag):
+        return Response(status_code=304, headers=headers)
+    headers["Vary"] = "Accept-Encoding"
+    if "gzip" in request.headers.get("accept-encoding", ""):
+        headers["Content-Encoding"] = "gzip"
+        return Response(payload.gzipped, media_type="application/json", headers=headers)
+    return Response(payload.body, media_type="application/json", headers=headers)
+
+
+def create_app(directory="analyses", search_path=SEARCH_FILE, watch=True):
+    """
+    Application HTTP du service ; le dashboard et l'index de recherche ne sont ouverts
+    qu'au démarrage du serveur (lifespan), jamais à l'import du module
+    """
+
+    @asynccontextmanager
+    async def lifespan(app):
+        started = time.time()
+        store = StatsStore(directory)
+        search = SearchIndex(search_path)
+        # Les appels apparus dans analyses/ entrent dans l'index de recherche à chaque nouvelle version
+        store.subscribe(lambda previous, current: search.sync(directory))
+        store.refresh(force=True)
+        search.sync(directory)
+        print(f"📊 Statistiques chargées en {time.time() - started:.2f}s (version {store.version})")
+        if watch:
+            store.watch()
+        app.state.store, app.state.search = store, search
+        try:
+            yield
+        finally:
+            store.stop()
+            search.close()
+
+    app = FastAPI(title="CallX stats", lifespan=lifespan)
+
+    @app.get("/stats")
+    def get_stats(request: Request, start: str = None, end: str = None, rep: str = None):
+        """Dashboard complet, ou restreint à une période (YYYY-MM-DD) et/ou un commercial"""
+        store = request.app.state.store
+        if start or end or rep:
+            return respond(request, store.filtered(start, end, rep))
+        return respond(request, store.current)
+
+    @app.get("/search")
+    def get_search(request: Request, q: str, rep: str = None, start: str = None, end: str = None,
+                   field: str = None, limit: int = 20, offset: int = 0):
+        """Appels dont la transcription ou l'analyse contient `q` (extraits surlignés avec <mark>, facettes)"""
+        try:
+            found = request.app.state.search.search(q, rep=rep, start=start, end=end, field=field,
+                                                    limit=min(limit, 100), offset=offset, highlight=("\x02", "\x03"))
+        except ValueError as e:
+            return JSONResponse({"error": str(e)}, status_code=400)
+        # Le texte des appels est échappé : seuls les <mark> de surlignage restent du HTML
+        for result in found["results"]:
+            result["snippet"] = html.escape(result["snippet"]).replace("\x02", "<mark>").replace("\x03", "</mark>")
+        return found
+
+    @app.get("/events")
+    async def get_events(request: Request, since: int = None):
+        """
+        Flux SSE des mises à jour : événements "delta" (une version chacun) ou "snapshot"
+
+        `since` (première connexion) ou l'en-tête Last-Event-ID rejoue les versions
+        manquées. Last-Event-ID l'emporte : EventSource se reconnecte à la même URL,
+        dont le `since` d'origine est périmé.
+        """
+        store = request.app.state.store
+        epoch = None
+        last_event = parse_event_id(request.headers.get("last-event-id"))
+        if last_event:
+            epoch, since = last_event
+
+        async def stream():
+            nonlocal epoch
+            last = store.version if since is None else since
+            idle = 0.0
+            while not await request.is_disconnected():
+                events, complete = store.events_since(last, epoch)
+                if not complete:
+                    current = store.current
+                    events = [(current.version, "snapshot", current.body.decode("utf-8"))]
+                epoch = store.epoch
+                for version, event, data in events:
+                    yield sse(event, data, version, store.epoch)
+                    last = version
+                if events:
+                    idle = 0.0
+                elif idle >= HEARTBEAT_SECONDS:
+                    # Commentaire SSE : garde la connexion ouverte à travers les proxys
+                    yield ": keep-alive\n\n"
+                    idle = 0.0
+                await asyncio.sleep(0.5)
+                idle += 0.5
+
+        return StreamingResponse(stream(), media_type="text/event-stream",
+                                 headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+    @app.get("/health")
+    def health(request: Request):
+        return {"status": "ok", "version": request.app.state.store.version}
+
+    @app.get("/metrics")
+    def get_metrics():
+        """Mesures au format texte Prometheus (XCALL_METRICS=1)"""
+        return PlainTextResponse(metrics.prometheus_text(), media_type="text/plain; version=0.0.4")
+
+    return app
+
+
+app = create_app()
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(app, host=STATS_HOST, port=STATS_PORT)
@@ -0,0 +1,38 @@
+"""Fixtures communes : modules du dépôt importables, dossier de travail isolé, faux services"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_services import FakeAircall, FakeOpenAI, FakeSMTP  # noqa: E402
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """mp3/, transcriptions/, analyses/ et state/ dans un dossier temporaire"""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def aircall():
+    fake = FakeAircall().start()
+    yield fake
+    fake.stop()
+
+
+@pytest.fixture
+def openai_fake():
+    fake = FakeOpenAI().start()
+    yield fake
+    fake.stop()
+
+
+@pytest.fixture
+def smtp_fake():
+    fake = FakeSMTP().start()
+    yield fake
+    fake.stop()
@@ -0,0 +1,75 @@
+"""Instantanés quotidiens : recalcul sur changement d'empreinte, fenêtres et percentiles lus sur l'index"""
+
+import json
+import os
+
+import numpy as np
+
+from aggregates import DailyAggregates, histogram_percentiles
+
+
+def write_day(directory, day, scores, rep="Alice"):
+    analyses = [{"call_id": f"{day}-{i}", "assignee_name": rep, "mood_global": f"{score}/10",
+                 "date": f"{day} 10:00"} for i, score in enumerate(scores)]
+    path = directory / f"analyses_{day}.json"
+    path.write_text(json.dumps(analyses), encoding="utf-8")
+    return path
+
+
+def aggregates(tmp_path):
+    return DailyAggregates(str(tmp_path / "analyses"), str(tmp_path / "aggregates"))
+
+
+def test_only_changed_days_are_rebuilt(tmp_path):
+    (tmp_path / "analyses").mkdir()
+    write_day(tmp_path / "analyses", "2025-09-01", [4, 6])
+    path = write_day(tmp_path / "analyses", "2025-09-02", [8])
+    assert aggregates(tmp_path).refresh() == ["2025-09-01", "2025-09-02"]
+
+    # Rien n'a changé : aucun recalcul, même depuis une nouvelle instance (index sur disque)
+    assert aggregates(tmp_path).refresh() == []
+
+    write_day(tmp_path / "analyses", "2025-09-02", [8, 10])
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    store = aggregates(tmp_path)
+    assert store.refresh() == ["2025-09-02"]
+    assert store.snapshot("2025-09-02")["score_sum"] == 18
+
+    path.unlink()
+    assert store.refresh() == ["2025-09-02"]
+    assert store.days() == ["2025-09-01"]
+
+
+def test_old_snapshot_version_is_rebuilt(tmp_path):
+    (tmp_path / "analyses").mkdir()
+    write_day(tmp_path / "analyses", "2025-09-01", [5])
+    store = aggregates(tmp_path)
+    store.refresh()
+    store.index["2025-09-01"]["version"] = 1
+    assert store.refresh() == ["2025-09-01"]
+
+
+def test_window_and_percentiles_cover_only_the_requested_days(tmp_path):
+    (tmp_path / "analyses").mkdir()
+    days = {"2025-09-01": [1, 2], "2025-09-05": [3, 9], "2025-09-07": [7, 7, 10]}
+    for day, scores in days.items():
+        write_day(tmp_path / "analyses", day, scores)
+    store = aggregates(tmp_path)
+    store.refresh()
+
+    # Les 3 jours finissant le 7 : le 5 et le 7 seulement
+    assert store.window("2025-09-07", 3) == {"calls": 5, "scored": 5, "average": 7.2}
+    assert store.window("2025-09-04", 3) == {"calls": 0, "scored": 0, "average": 0}
+    recent = [3, 9, 7, 7, 10]
+    assert store.percentiles("2025-09-07", 3) == {
+        f"p{q}": round(float(np.percentile(recent, q)), 1) for q in (25, 50, 75, 90)}
+    assert store.percentiles("2025-09-04", 3) == {}
+
+
+def test_histogram_percentiles_match_numpy():
+    rng = np.random.default_rng(0)
+    scores = rng.integers(1, 11, 501)
+    counts = {str(score): int((scores == score).sum()) for score in range(1, 11)}
+    assert histogram_percentiles(counts, (10, 25, 50, 75, 90)) == {
+        f"p{q}": round(float(np.percentile(scores, q)), 1) for q in (10, 25, 50, 75, 90)}
@@ -0,0 +1,104 @@
+"""Nouvelles tentatives, backoff et Retry-After d'AnalysisExecutor (client OpenAI simulé)"""
+
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import analysis_client
+from analysis_client import AnalysisExecutor, AnalysisFailed
+
+
+class APIError(Exception):
+    """Erreur au format du SDK OpenAI : status_code et response.headers"""
+
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+        self.response = SimpleNamespace(headers=headers or {})
+
+
+class APITimeoutError(Exception):
+    pass
+
+
+class MockOpenAI:
+    """Client simulé : renvoie (ou lève) les réponses prévues, dans l'ordre"""
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.requests = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def with_options(self, **options):
+        return self
+
+    def _create(self, **request):
+        self.requests.append(request)
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        message = SimpleNamespace(content=outcome)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=None)
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    waits = []
+    monkeypatch.setattr(analysis_client.time, "sleep", waits.append)
+    return waits
+
+
+def executor(client, **options):
+    return AnalysisExecutor(client, requests_per_minute=None, tokens_per_minute=None, **options)
+
+
+def test_retries_server_errors_then_succeeds(sleeps):
+    client = MockOpenAI(APIError(500), APITimeoutError("timeout"), json.dumps({"mood_global": "8"}))
+    analysis, _ = executor(client).analyze("Transcription")
+    assert analysis == {"mood_global": "8"}
+    assert len(client.requests) == 3
+    assert len(sleeps) == 2
+
+
+def test_retry_after_header_is_honoured(sleeps):
+    client = MockOpenAI(APIError(429, {"retry-after": "7"}), APIError(503, {"retry-after-ms": "250"}), "{}")
+    executor(client).analyze("Transcription")
+    assert sleeps == [7.0, 0.25]
+
+
+def test_backoff_is_bounded_and_grows(sleeps, monkeypatch):
+    monkeypatch.setattr(analysis_client.random, "uniform", lambda low, high: high)
+    client = MockOpenAI(*[APIError(502)] * 4, "{}")
+    executor(client, max_backoff=5).analyze("Transcription")
+    assert sleeps == [1, 2, 4, 5]
+
+
+def test_gives_up_after_max_retries_without_final_sleep(sleeps):
+    client = MockOpenAI(*[APIError(500)] * 3)
+    with pytest.raises(AnalysisFailed, match="3 tentatives"):
+        executor(client, max_retries=2).analyze("Transcription")
+    assert len(client.requests) == 3
+    assert len(sleeps) == 2
+
+
+def test_client_errors_are_not_retried(sleeps):
+    client = MockOpenAI(APIError(400))
+    with pytest.raises(AnalysisFailed):
+        executor(client).analyze("Transcription")
+    assert len(client.requests) == 1
+    assert sleeps == []
+
+
+def test_non_json_answer_fails():
+    with pytest.raises(AnalysisFailed, match="non JSON"):
+        executor(MockOpenAI("Désolé, je ne peux pas.")).analyze("Transcription")
+
+
+def test_429_pauses_the_shared_limiter(sleeps, monkeypatch):
+    client = MockOpenAI(APIError(429, {"retry-after": "3"}), "{}")
+    analyzer = executor(client)
+    paused = []
+    monkeypatch.setattr(analyzer.requests, "pause", paused.append)
+    analyzer.analyze("Transcription")
+    assert paused == [3.0]
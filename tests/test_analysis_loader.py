@@ -0,0 +1,43 @@
+"""Cache des fichiers d'analyses décodés : LRU bornée et copies indépendantes"""
+
+import json
+
+from analysis_loader import ParsedFileCache
+
+
+def write_day(directory, day, count):
+    path = directory / f"analyses_{day}.json"
+    path.write_text(json.dumps([{"call_id": i, "blocages_client": ["Prix"]} for i in range(count)]))
+    return str(path)
+
+
+def test_loaded_records_are_copies(tmp_path):
+    cache = ParsedFileCache(persistent=False)
+    path = write_day(tmp_path, "2025-01-01", 3)
+    first = cache.load(path)
+    first[0]["blocages_client"].append("Délai")
+    first.pop()
+    assert cache.load(path) == [{"call_id": i, "blocages_client": ["Prix"]} for i in range(3)]
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_memory_is_bounded_least_recently_used_first(tmp_path):
+    paths = [write_day(tmp_path, f"2025-01-0{day}", 50) for day in range(1, 5)]
+    probe = ParsedFileCache(persistent=False)
+    probe.load(paths[0])
+    cache = ParsedFileCache(persistent=False, max_bytes=probe._bytes * 2)
+
+    cache.load(paths[0])
+    cache.load(paths[1])
+    cache.load(paths[0])  # paths[1] devient le moins récemment utilisé
+    cache.load(paths[2])
+    assert list(cache._memory) == [paths[0], paths[2]]
+    assert cache._bytes <= cache.max_bytes
+
+
+def test_disk_cache_survives_a_new_process(tmp_path):
+    path = write_day(tmp_path, "2025-01-01", 2)
+    ParsedFileCache(str(tmp_path / "parsed")).load(path)
+    fresh = ParsedFileCache(str(tmp_path / "parsed"))
+    assert len(fresh.load(path)) == 2
+    assert (fresh.hits, fresh.misses) == (1, 0)
@@ -0,0 +1,40 @@
+"""Journal des analyses : ajouts concurrents pendant la compaction"""
+
+import os
+import threading
+
+from analysis_log import append_analysis, compact_day, log_path, read_day
+
+
+def test_compaction_never_drops_concurrent_appends(tmp_path):
+    directory = str(tmp_path)
+    day = "2025-01-01"
+
+    def writer(offset):
+        for i in range(250):
+            append_analysis({"call_id": offset + i}, day, directory)
+
+    stop = threading.Event()
+
+    def compactor():
+        while not stop.is_set():
+            compact_day(day, directory)
+
+    compacting = threading.Thread(target=compactor)
+    compacting.start()
+    writers = [threading.Thread(target=writer, args=(k * 10_000,)) for k in range(4)]
+    for thread in writers:
+        thread.start()
+    for thread in writers:
+        thread.join()
+    stop.set()
+    compacting.join()
+
+    assert len(read_day(day, directory)) == 1000
+    compact_day(day, directory)
+    assert not os.path.exists(log_path(day, directory))
+    assert len(read_day(day, directory)) == 1000
+
+
+def test_compact_missing_journal(tmp_path):
+    assert compact_day("2025-01-01", str(tmp_path)) == 0
@@ -0,0 +1,77 @@
+"""Table colonnaire : classement sur toutes les notes, écarts 7 jours, même classement depuis les instantanés"""
+
+import numpy as np
+
+from analysis_table import AnalysisTable, leaderboard_from_totals
+from generate_real_extracted_data import assemble_dashboard, table_trends
+from rep_progress import empty_stats
+from sketches import StreamingAggregator
+
+
+def analysis(rep, score, date, call_id):
+    return {"assignee_name": rep, "mood_global": f"{score}/10", "date": f"{date} 10:00", "call_id": call_id}
+
+
+ANALYSES = [
+    analysis("Alice", 3, "2025-09-01", 1),
+    analysis("Alice", 9, "2025-09-02", 2),
+    analysis("Alice", 9, "2025-09-09", 3),
+    analysis("Bruno", 7, "2025-09-02", 4),
+    analysis("Bruno", 5, "2025-09-09", 5),
+    {"assignee_name": "Chloé", "mood_global": "N/A", "date": "2025-09-09 11:00", "call_id": 6},
+]
+
+
+def test_leaderboard_averages_every_score_of_a_rep():
+    table = AnalysisTable.from_analyses(ANALYSES)
+    # Alice : (3 + 9 + 9) / 3 = 7.0 et non 3 (sa première note) ; Chloé n'a aucune note
+    assert table.leaderboard() == [
+        {"rank": 1, "name": "Alice", "score": 7.0, "calls": 3},
+        {"rank": 2, "name": "Bruno", "score": 6.0, "calls": 2},
+    ]
+
+
+def test_deltas_compare_the_last_week_with_the_previous_one():
+    table = AnalysisTable.from_analyses(ANALYSES)
+    assert table.deltas("2025-09-09") == {"Alice": 3.0, "Bruno": -2.0}
+
+
+def test_snapshot_totals_rank_like_the_table():
+    data = StreamingAggregator(clusters=False).consume(ANALYSES).result()
+    assert leaderboard_from_totals(data["reps"]) == AnalysisTable.from_analyses(ANALYSES).leaderboard()
+
+
+def test_dashboard_leaderboard_uses_ranked_rows_and_deltas():
+    table = AnalysisTable.from_analyses(ANALYSES)
+    data = StreamingAggregator(clusters=False).consume(ANALYSES).result()
+    trends = {"team": empty_stats(), "reps": {"Alice": dict(empty_stats(), ewma=8.1)}}
+    dashboard = assemble_dashboard(data, table.leaderboard(), table.deltas("2025-09-09"), table.window("2025-09-09", 7),
+                                   table.window("2025-09-02", 7), {}, table.percentiles(), trends)
+    assert [(row["rank"], row["name"], row["score"], row["delta"], row["ewma"])
+            for row in dashboard["weeklyLeaderboard"]] == [(1, "Alice", 7.0, 3.0, 8.1), (2, "Bruno", 6.0, -2.0, None)]
+
+
+def test_group_by_matches_a_per_rep_loop():
+    rng = np.random.default_rng(0)
+    reps = [f"Rep {i}" for i in range(40)]
+    analyses = [analysis(reps[rng.integers(40)], int(rng.integers(1, 11)), f"2025-09-{rng.integers(1, 29):02d}", i)
+                for i in range(2000)]
+    expected = {}
+    for record in analyses:
+        expected.setdefault(record["assignee_name"], []).append(int(record["mood_global"].split("/")[0]))
+    board = AnalysisTable.from_analyses(analyses).leaderboard()
+    assert {row["name"]: row["score"] for row in board} == {
+        name: round(sum(scores) / len(scores), 1) for name, scores in expected.items()}
+    assert [row["score"] for row in board] == sorted((row["score"] for row in board), reverse=True)
+
+
+def test_filtered_dashboard_windows_ignore_analyses_before_start():
+    in_range = [analysis("Alice", 9, "2025-09-08", 7), analysis("Alice", 7, "2025-09-09", 8)]
+    table = AnalysisTable.from_analyses(in_range)
+    trends = table_trends(table, "2025-09-09", {"Alice": {"ewma": 6.5}})
+    # Fenêtres calculées sur la seule sélection (pas sur toute la série) ; EWMA reprise telle quelle
+    assert trends["reps"]["Alice"]["calls30Days"] == 2
+    assert trends["reps"]["Alice"]["score7Days"] == 8.0
+    assert trends["reps"]["Alice"]["ewma"] == 6.5
+    assert trends["team"]["calls30Days"] == 2
+    assert table.percentiles(start="2025-08-11", end="2025-09-09") == {"p25": 7.5, "p50": 8.0, "p75": 8.5, "p90": 8.8}
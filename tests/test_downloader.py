@@ -0,0 +1,111 @@
+"""Téléchargement des enregistrements : dossier créé, 4xx non retentées, pas d'attente après le dernier essai"""
+
+import os
+
+import pytest
+
+import downloader
+from downloader import DownloadError, RecordingDownloader
+from fake_services import FakeAircall
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    calls = []
+    monkeypatch.setattr(downloader.time, "sleep", calls.append)
+    return calls
+
+
+def test_download_creates_missing_folder(workdir, aircall):
+    size = RecordingDownloader().download(f"{aircall.url}/recordings/1.mp3", "mp3/1.mp3")
+
+    assert size == len(aircall.recording_bytes)
+    assert os.path.getsize("mp3/1.mp3") == size
+    assert not os.path.exists("mp3/1.mp3.part")
+
+
+def test_client_error_is_not_retried(workdir, aircall, sleeps):
+    with pytest.raises(DownloadError, match="404"):
+        RecordingDownloader(retries=3).download(f"{aircall.url}/v1/calls/404", "mp3/404.mp3")
+
+    assert aircall.requests_count == 1
+    assert sleeps == []
+
+
+def test_server_error_is_retried_without_final_sleep(workdir, sleeps):
+    fake = FakeAircall(error_rate=1.0).start()
+    try:
+        with pytest.raises(DownloadError, match="503"):
+            RecordingDownloader(retries=2).download(f"{fake.url}/v1/calls", "mp3/503.mp3")
+    finally:
+        fake.stop()
+
+    assert fake.requests_count == 3
+    assert sleeps == [1, 2]
+
+
+def recording_service(**options):
+    # Octets tous différents : un morceau mal recollé se voit
+    return FakeAircall(recording_bytes=bytes(range(256)) * 16, **options).start()
+
+
+def test_partial_file_is_resumed_with_range(workdir, sleeps):
+    fake = recording_service()
+    os.makedirs("mp3")
+    with open("mp3/1.mp3.part", "wb") as f:
+        f.write(fake.recording_bytes[:1000])
+    try:
+        size = RecordingDownloader().download(f"{fake.url}/recordings/1.mp3", "mp3/1.mp3")
+    finally:
+        fake.stop()
+
+    assert fake.ranges == ["bytes=1000-"]
+    assert size == len(fake.recording_bytes)
+    with open("mp3/1.mp3", "rb") as f:
+        assert f.read() == fake.recording_bytes
+    assert not os.path.exists("mp3/1.mp3.part")
+
+
+def test_server_ignoring_range_rewrites_the_whole_file(workdir, sleeps):
+    fake = recording_service(range_requests=False)
+    os.makedirs("mp3")
+    with open("mp3/1.mp3.part", "wb") as f:
+        f.write(b"x" * 1000)
+    try:
+        RecordingDownloader().download(f"{fake.url}/recordings/1.mp3", "mp3/1.mp3")
+    finally:
+        fake.stop()
+
+    # 200 au lieu de 206 : le fichier partiel est remplacé, pas complété
+    assert fake.ranges == ["bytes=1000-"]
+    with open("mp3/1.mp3", "rb") as f:
+        assert f.read() == fake.recording_bytes
+
+
+def test_body_shorter_than_content_length_is_resumed(workdir, sleeps):
+    fake = recording_service()
+    fake.truncate_recordings = 1
+    # Petits morceaux : les octets reçus avant la coupure sont déjà écrits dans le .part
+    try:
+        RecordingDownloader(retries=2, chunk_size=256).download(f"{fake.url}/recordings/1.mp3", "mp3/1.mp3")
+    finally:
+        fake.stop()
+
+    # Première réponse coupée à mi-corps, la seconde repart de ce qui a été reçu
+    assert fake.ranges == [None, f"bytes={len(fake.recording_bytes) // 2}-"]
+    assert sleeps == [1]
+    with open("mp3/1.mp3", "rb") as f:
+        assert f.read() == fake.recording_bytes
+
+
+def test_truncated_download_never_becomes_the_final_file(workdir, sleeps):
+    fake = recording_service()
+    fake.truncate_recordings = 10
+    try:
+        with pytest.raises(DownloadError):
+            RecordingDownloader(retries=1, chunk_size=256).download(f"{fake.url}/recordings/1.mp3", "mp3/1.mp3")
+    finally:
+        fake.stop()
+
+    assert not os.path.exists("mp3/1.mp3")
+    assert 0 < os.path.getsize("mp3/1.mp3.part") < len(fake.recording_bytes)
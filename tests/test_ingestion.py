@@ -0,0 +1,341 @@
+"""Curseur Aircall, reprise depuis le registre, appels ignorés ou mis de côté, pipeline vs séquentiel"""
+
+import os
+import json
+import time
+import random
+import threading
+
+import numpy as np
+import pytest
+from openai import OpenAI
+
+import ingestion
+from Xcall import fetch_parked, processed_prefix
+from aircall_sync import AircallSync
+from analysis_client import AnalysisExecutor
+from downloader import RecordingDownloader
+from fake_services import SAMPLE_ANALYSIS, synthetic_calls
+from ledger import Ledger
+
+
+class FakeTranscriber:
+    """Renvoie toujours le même texte et compte les transcriptions"""
+
+    def __init__(self, text="Bonjour, je vous appelle au sujet de votre recrutement."):
+        self.text = text
+        self.calls = 0
+
+    def transcribe(self, audio, language="fr"):
+        self.calls += 1
+        return {"text": self.text, "segments": [{"start": 0.0, "end": 1.0, "text": self.text}]}
+
+
+class UnevenTranscriber(FakeTranscriber):
+    """Latence variable selon l'appel ; `short` : transcription trop courte, `broken` : exception"""
+
+    def __init__(self, short=(), broken=()):
+        super().__init__()
+        self.short, self.broken = set(short), set(broken)
+        self.rng = random.Random(3)
+        self._lock = threading.Lock()
+
+    def transcribe(self, audio, language="fr"):
+        call_id = int(os.path.basename(audio).split("_")[1])
+        with self._lock:
+            delay = self.rng.uniform(0, 0.05)
+            self.calls += 1
+        time.sleep(delay)
+        if call_id in self.broken:
+            raise RuntimeError("moteur de transcription tombé")
+        text = "Allô ?" if call_id in self.short else f"{self.text} Appel {call_id}."
+        return {"text": text, "segments": [{"start": 0.0, "end": 1.0, "text": text}]}
+
+
+@pytest.fixture(autouse=True)
+def no_side_stores(monkeypatch):
+    # Ni VAD (pas de vrai mp3), ni index de recherche, ni série de progression partagés
+    monkeypatch.setattr(ingestion, "USE_VAD", False)
+    monkeypatch.setattr(ingestion, "USE_SEARCH_INDEX", False)
+    monkeypatch.setattr(ingestion, "USE_PROGRESS", False)
+
+
+@pytest.fixture
+def ledger(workdir):
+    ledger = Ledger(str(workdir / "state" / "ledger.db"), max_attempts=2)
+    yield ledger
+    ledger.close()
+
+
+def make_calls(aircall, count=3, start=1_700_000_000):
+    calls = synthetic_calls(count, start, start + 3600, recording_base=aircall.url, seed=1)
+    for call in calls:
+        call["recording"] = f"{aircall.url}/recordings/{call['id']}.mp3"
+    aircall.add_calls(calls)
+    return calls
+
+
+def executor(openai_fake, **options):
+    client = OpenAI(api_key="test", base_url=openai_fake.url + "/v1")
+    return AnalysisExecutor(client, max_retries=1, max_backoff=0.01, **options)
+
+
+# Curseur
+
+def test_advance_cursor_ignores_calls_in_progress():
+    calls = [
+        {"id": 1, "started_at": 100, "ended_at": 160},
+        {"id": 3, "started_at": 200, "ended_at": None},
+        {"id": 2, "started_at": 150, "ended_at": 170},
+    ]
+    assert AircallSync.advance_cursor(None, calls) == {"started_at": 150, "call_id": 2}
+    assert AircallSync.advance_cursor({"started_at": 300, "call_id": 9}, calls) == {"started_at": 300, "call_id": 9}
+
+
+def test_cursor_round_trip_and_new_calls(workdir, aircall):
+    calls = make_calls(aircall, count=5, start=int(time.time()) - 7200)
+    sync = AircallSync({}, base_url=aircall.url + "/v1", cursor_file=str(workdir / "state" / "cursor.json"))
+    assert [call["id"] for call in sync.fetch_new_calls()] == [call["id"] for call in calls]
+
+    sync.save_cursor(sync.advance_cursor(None, calls[:2]))
+    assert sync.load_cursor() == {"started_at": calls[1]["started_at"], "call_id": calls[1]["id"]}
+    # La fenêtre de relecture repasse sur les appels déjà vus, le registre les filtre
+    assert {call["id"] for call in calls} <= {call["id"] for call in sync.fetch_new_calls()}
+
+
+def test_processed_prefix_stops_at_first_call_left_out():
+    calls = [{"id": i} for i in range(5)]
+    pending = [calls[1], calls[3], calls[4]]
+    assert processed_prefix(calls, pending, pending[:1]) == calls[:3]
+    assert processed_prefix(calls, pending, pending) == calls
+
+
+# Registre
+
+def test_sequential_persists_and_pending_excludes_done(workdir, aircall, openai_fake, ledger):
+    calls = make_calls(aircall)
+    transcriber = FakeTranscriber()
+    analyzer = executor(openai_fake)
+    ingestion.process_calls_sequential(calls, transcriber, analyzer, ledger=ledger)
+
+    assert ledger.pending(calls) == []
+    assert ledger.counts() == {"persisted": 3}
+    assert ledger.get(calls[0]["id"])["analysis"] == SAMPLE_ANALYSIS
+    assert transcriber.calls == 3
+    day = ingestion.new_job(calls[0])["day"]
+    with open(f"segments/call_{calls[0]['id']}_{day}.json", encoding="utf-8") as f:
+        assert json.load(f) == [{"start": 0.0, "end": 1.0, "text": transcriber.text}]
+
+
+def test_resume_from_transcript_skips_download_and_whisper(workdir, aircall, openai_fake, ledger):
+    call = make_calls(aircall, count=1)[0]
+    job = ingestion.new_job(call)
+    os.makedirs("transcriptions")
+    transcript_path = f"transcriptions/call_{call['id']}_{job['day']}.txt"
+    with open(transcript_path, "w", encoding="utf-8") as f:
+        f.write("Transcription déjà faite lors du run précédent.")
+    os.makedirs("mp3")
+    open(f"mp3/call_{call['id']}_{job['day']}.mp3", "wb").close()
+    ledger.mark(call["id"], "downloaded", day=job["day"], audio_path=f"mp3/call_{call['id']}_{job['day']}.mp3")
+    ledger.mark(call["id"], "transcribed", day=job["day"], transcript_path=transcript_path)
+
+    transcriber = FakeTranscriber()
+    ingestion.process_calls_sequential([call], transcriber, executor(openai_fake), ledger=ledger)
+
+    assert transcriber.calls == 0
+    assert aircall.requests_count == 0  # pas de nouveau téléchargement
+    assert ledger.get(call["id"])["status"] == "persisted"
+
+
+# Appels ignorés ou mis de côté
+
+def test_short_transcript_is_skipped(workdir, aircall, openai_fake, ledger):
+    call = make_calls(aircall, count=1)[0]
+    ingestion.process_calls_sequential([call], FakeTranscriber(text="Allô ?"), executor(openai_fake), ledger=ledger)
+
+    state = ledger.get(call["id"])
+    assert state["status"] == "skipped"
+    assert openai_fake.requests_count == 0
+    assert ledger.pending([call]) == []
+
+
+class SegmentTranscriber(FakeTranscriber):
+    """Deux segments de part et d'autre de la jointure des plages gardées par le VAD ; garde la durée reçue"""
+
+    def transcribe(self, audio, language="fr"):
+        self.calls += 1
+        self.seconds = len(audio) / 16000
+        middle = self.seconds / 2
+        return {"text": self.text, "segments": [{"start": 0.0, "end": middle, "text": "Bonjour"},
+                                                {"start": middle, "end": self.seconds, "text": "Oui ?"}]}
+
+
+def speech_and_gap():
+    t = np.arange(2 * 16000) / 16000
+    speech = (0.1 * np.sin(2 * np.pi * 440 * t)).astype(np.float32)
+    return np.concatenate([speech, np.zeros(20 * 16000, dtype=np.float32), speech])
+
+
+def test_vad_trims_gaps_and_segments_keep_original_times(workdir, ledger, monkeypatch):
+    monkeypatch.setattr(ingestion, "USE_VAD", True)
+    monkeypatch.setattr(ingestion, "load_audio", lambda path: speech_and_gap())
+    call = synthetic_calls(1, 1_700_000_000, 1_700_003_600, seed=1)[0]
+    job = dict(ingestion.new_job(call, ledger), audio_path="mp3/appel.mp3")
+    transcriber = SegmentTranscriber()
+
+    assert ingestion.transcribe_recording(job, transcriber) is job
+    # 24 s d'enregistrement, ~4,5 s envoyées à Whisper (deux passages de 2 s et leurs marges)
+    assert transcriber.seconds < 5
+    with open(f"segments/call_{call['id']}_{job['day']}.json", encoding="utf-8") as f:
+        segments = json.load(f)
+    first, second = segments
+    # La fin du premier passage reste avant le blanc, le second commence après
+    assert first["start"] == 0.0 and first["end"] <= 2.5
+    assert 21.5 <= second["start"] <= 22.0 and second["end"] == 24.0
+
+
+def test_silent_recording_skips_whisper(workdir, ledger, monkeypatch):
+    monkeypatch.setattr(ingestion, "USE_VAD", True)
+    monkeypatch.setattr(ingestion, "load_audio", lambda path: np.zeros(30 * 16000, dtype=np.float32))
+    call = synthetic_calls(1, 1_700_000_000, 1_700_003_600, seed=1)[0]
+    transcriber = FakeTranscriber()
+
+    assert ingestion.transcribe_recording(dict(ingestion.new_job(call, ledger), audio_path="mp3/appel.mp3"),
+                                          transcriber) is None
+    assert transcriber.calls == 0
+    assert ledger.get(call["id"])["status"] == "skipped"
+
+
+def test_failed_analysis_is_parked_then_failed(workdir, aircall, openai_fake, ledger):
+    call = make_calls(aircall, count=1)[0]
+    openai_fake.error_rate = 1.0
+    analyzer = executor(openai_fake)
+
+    ingestion.process_calls_sequential([call], FakeTranscriber(), analyzer, ledger=ledger)
+    assert ledger.get(call["id"])["status"] == "parked"
+    assert ledger.parked() == [call["id"]]
+    assert ledger.pending([call]) == [call]
+
+    # Second essai (max_attempts=2) : échec définitif, le curseur peut passer
+    ingestion.process_calls_sequential([call], FakeTranscriber(), analyzer, ledger=ledger)
+    state = ledger.get(call["id"])
+    assert (state["status"], state["attempts"]) == ("failed", 2)
+    assert ledger.parked() == []
+    assert ledger.pending([call]) == []
+
+
+def test_parked_call_resumes_from_transcript(workdir, aircall, openai_fake, ledger):
+    call = make_calls(aircall, count=1)[0]
+    openai_fake.error_rate = 1.0
+    transcriber = FakeTranscriber()
+    ingestion.process_calls_sequential([call], transcriber, executor(openai_fake), ledger=ledger)
+
+    openai_fake.error_rate = 0.0
+    sync = AircallSync({}, base_url=aircall.url + "/v1", cursor_file=str(workdir / "state" / "cursor.json"))
+    retries = fetch_parked(sync, ledger, known_ids=set())
+    assert [retry["id"] for retry in retries] == [call["id"]]
+    assert fetch_parked(sync, ledger, known_ids={call["id"]}) == []
+
+    ingestion.process_calls_sequential(retries, transcriber, executor(openai_fake), ledger=ledger)
+    assert ledger.get(call["id"])["status"] == "persisted"
+    assert transcriber.calls == 1
+
+
+def test_download_error_parks_call(workdir, aircall, ledger):
+    call = make_calls(aircall, count=1)[0]
+    call["recording"] = "http://127.0.0.1:9/introuvable.mp3"
+    job = ingestion.download_recording(ingestion.new_job(call, ledger), RecordingDownloader(retries=0, timeout=2))
+
+    assert job is None
+    assert ledger.parked() == [call["id"]]
+    assert ledger.get(call["id"])["error"].startswith("Téléchargement")
+
+
+def test_call_without_recording_is_skipped(workdir, aircall, ledger):
+    call = make_calls(aircall, count=1)[0]
+    call["recording"] = None
+    assert ingestion.download_recording(ingestion.new_job(call, ledger), RecordingDownloader()) is None
+    state = ledger.get(call["id"])
+    assert (state["status"], state["error"]) == ("skipped", "Pas d'enregistrement")
+    # Statut terminal : l'appel n'est plus proposé aux runs suivants
+    assert ledger.pending([call]) == []
+    assert not os.path.exists("mp3")
+
+
+# Pipeline
+
+def journal(day):
+    with open(f"analyses/analyses_{day}.jsonl", encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def run_both(workdir, monkeypatch, calls, openai_fake, **transcriber_options):
+    """Même lot d'appels en séquentiel puis en pipeline, chacun dans son dossier et avec son registre"""
+    results = {}
+    for mode in ("sequential", "pipelined"):
+        os.makedirs(workdir / mode)
+        monkeypatch.chdir(workdir / mode)
+        ledger = Ledger(str(workdir / mode / "ledger.db"), max_attempts=3)
+        transcriber = UnevenTranscriber(**transcriber_options)
+        if mode == "sequential":
+            ingestion.process_calls_sequential(calls, transcriber, executor(openai_fake), ledger=ledger)
+        else:
+            worker = threading.Thread(target=ingestion.process_calls_pipelined,
+                                      args=(calls, transcriber, executor(openai_fake)),
+                                      kwargs={"ledger": ledger, "download_workers": 3, "transcribe_workers": 3,
+                                              "analyze_workers": 4, "queue_size": 2})
+            worker.start()
+            worker.join(timeout=60)
+            assert not worker.is_alive(), "le pipeline ne s'est pas terminé"
+        day = ingestion.new_job(calls[0])["day"]
+        records = journal(day) if os.path.exists(f"analyses/analyses_{day}.jsonl") else []
+        results[mode] = {
+            "journal": records,
+            "ledger": {call["id"]: (ledger.get(call["id"]) or {}).get("status") for call in calls},
+            "errors": {call["id"]: (ledger.get(call["id"]) or {}).get("error") for call in calls},
+        }
+        ledger.close()
+    return results
+
+
+def test_pipeline_matches_sequential_with_uneven_latencies(workdir, aircall, openai_fake, monkeypatch):
+    openai_fake.latency = 0.01
+    calls = make_calls(aircall, count=12)
+    calls[4]["recording"] = None
+    results = run_both(workdir, monkeypatch, calls, openai_fake, short={calls[7]["id"]})
+
+    sequential, pipelined = results["sequential"], results["pipelined"]
+    assert pipelined["journal"] == sequential["journal"]
+    assert [record["call_id"] for record in pipelined["journal"]] == \
+        [call["id"] for call in calls if call["id"] not in (calls[4]["id"], calls[7]["id"])]
+    assert pipelined["ledger"] == sequential["ledger"]
+    assert sequential["ledger"][calls[7]["id"]] == "skipped"
+
+
+def test_failing_stage_parks_call_and_the_rest_is_written(workdir, aircall, openai_fake, monkeypatch):
+    calls = make_calls(aircall, count=6)
+    broken = calls[2]["id"]
+    results = run_both(workdir, monkeypatch, calls, openai_fake, broken={broken})
+
+    for mode, result in results.items():
+        assert result["ledger"][broken] == "parked", mode
+        assert result["errors"][broken].startswith("transcribe: RuntimeError"), mode
+        assert [record["call_id"] for record in result["journal"]] == [call["id"] for call in calls if call["id"] != broken]
+
+
+def test_failing_writer_parks_call(workdir, aircall, openai_fake, ledger, monkeypatch):
+    calls = make_calls(aircall, count=3)
+    persist = ingestion.persist_analysis
+
+    def flaky_persist(job):
+        if job["call_id"] == calls[1]["id"]:
+            raise OSError("disque plein")
+        persist(job)
+
+    monkeypatch.setattr(ingestion, "persist_analysis", flaky_persist)
+    ingestion.process_calls_pipelined(calls, FakeTranscriber(), executor(openai_fake), ledger=ledger)
+
+    assert ledger.get(calls[1]["id"])["status"] == "parked"
+    assert ledger.get(calls[1]["id"])["error"] == "writer: OSError: disque plein"
+    assert [record["call_id"] for record in journal(ingestion.new_job(calls[0])["day"])] == \
+        [calls[0]["id"], calls[2]["id"]]
@@ -0,0 +1,89 @@
+"""Mesures : exposition Prometheus des compteurs et histogrammes étiquetés, no-op quand XCALL_METRICS est désactivé"""
+
+import pytest
+
+import metrics
+from metrics import Registry
+
+
+def test_prometheus_text_for_labelled_counters_and_histograms():
+    registry = Registry(log_file="-")
+    registry.incr("calls_skipped", reason="silence")
+    registry.incr("calls_skipped", 2, reason='dit "non"')
+    registry.incr("calls_parked")
+    registry.observe("gpt_completion_tokens", 120, model="gpt-4")
+    registry.observe("gpt_completion_tokens", 200, model="gpt-4")
+    registry.observe("gpt_completion_tokens", 2000, model="gpt-4")
+
+    assert registry.prometheus_text().splitlines() == [
+        "# TYPE xcall_calls_parked_total counter",
+        "xcall_calls_parked_total 1",
+        "# TYPE xcall_calls_skipped_total counter",
+        'xcall_calls_skipped_total{reason="dit \\"non\\""} 2',
+        'xcall_calls_skipped_total{reason="silence"} 1',
+        "# TYPE xcall_gpt_completion_tokens histogram",
+        # Bornes inclusives (200 compte dans le=200) et cumulées, +Inf = total
+        'xcall_gpt_completion_tokens_bucket{model="gpt-4",le="50"} 0',
+        'xcall_gpt_completion_tokens_bucket{model="gpt-4",le="100"} 0',
+        'xcall_gpt_completion_tokens_bucket{model="gpt-4",le="200"} 2',
+        'xcall_gpt_completion_tokens_bucket{model="gpt-4",le="400"} 2',
+        'xcall_gpt_completion_tokens_bucket{model="gpt-4",le="800"} 2',
+        'xcall_gpt_completion_tokens_bucket{model="gpt-4",le="1600"} 2',
+        'xcall_gpt_completion_tokens_bucket{model="gpt-4",le="+Inf"} 3',
+        'xcall_gpt_completion_tokens_sum{model="gpt-4"} 2320.0',
+        'xcall_gpt_completion_tokens_count{model="gpt-4"} 3',
+    ]
+
+
+def test_one_type_line_per_family_across_label_sets():
+    registry = Registry(log_file="-")
+    for stage in ("download", "transcribe"):
+        registry.observe("stage_seconds", 0.2, stage=stage)
+    text = registry.prometheus_text()
+    assert text.count("# TYPE xcall_stage_seconds histogram") == 1
+    assert 'xcall_stage_seconds_count{stage="transcribe"} 1' in text
+
+
+def test_timer_counts_errors_and_still_observes():
+    registry = Registry(log_file="-")
+    with pytest.raises(RuntimeError):
+        with registry.timer("download_seconds", stage="download"):
+            raise RuntimeError("coupure")
+    report = registry.report()
+    assert report["counters"] == {"download_seconds_errors{stage=download}": 1}
+    assert report["histograms"]["download_seconds{stage=download}"]["count"] == 1
+
+
+@pytest.fixture
+def registry(tmp_path, monkeypatch):
+    registry = Registry(log_file=str(tmp_path / "metrics.jsonl"))
+    monkeypatch.setattr(metrics, "REGISTRY", registry)
+    yield registry
+    if registry._log is not None:
+        registry._log.close()
+
+
+def test_disabled_metrics_are_no_ops(registry, tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics, "ENABLED", False)
+    metrics.incr("calls_skipped", reason="silence")
+    metrics.observe("download_seconds", 1.0)
+    with metrics.timer("dashboard_build_seconds", kind="full"):
+        pass
+    metrics.event("call_skipped", call_id=1)
+
+    assert registry.counters == {} and registry.histograms == {}
+    assert not (tmp_path / "metrics.jsonl").exists()
+    assert metrics.report() is None and metrics.write_report() is None
+    assert metrics.prometheus_text().startswith("#") and "xcall_" not in metrics.prometheus_text()
+
+
+def test_enabled_module_api_records(registry, tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics, "ENABLED", True)
+    metrics.incr("calls_skipped", reason="silence")
+    with metrics.timer("dashboard_build_seconds", kind="full"):
+        pass
+    metrics.event("call_skipped", call_id=1)
+
+    assert metrics.report()["counters"] == {"calls_skipped{reason=silence}": 1}
+    assert 'xcall_dashboard_build_seconds_count{kind="full"} 1' in metrics.prometheus_text()
+    assert '"event": "call_skipped"' in (tmp_path / "metrics.jsonl").read_text(encoding="utf-8")
@@ -0,0 +1,76 @@
+"""Regroupement MinHash/LSH : phrases proches fusionnées, négations séparées, libellés stables, rehachage"""
+
+import sqlite3
+
+import pytest
+
+from phrase_clusters import BANDS, HASH_VERSION, PhraseClusters, tokens
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "phrase_clusters.db")
+
+
+@pytest.fixture
+def clusters(path):
+    clusters = PhraseClusters(path)
+    yield clusters
+    clusters.close()
+
+
+def test_near_duplicates_are_counted_together(clusters):
+    counts = {"Clarifier les termes techniques": 3, "Clarifier le jargon technique": 2,
+              "Poser plus de questions ouvertes": 4}
+    assert clusters.canonical_counts("improvements", counts) == {
+        "Clarifier les termes techniques": 5, "Poser plus de questions ouvertes": 4}
+    # Pluriel, accents et casse ne séparent pas deux phrases
+    assert clusters.label("improvements", "CLARIFIER LE TERME TECHNIQUE") == "Clarifier les termes techniques"
+
+
+def test_negation_is_never_merged(clusters):
+    assert tokens("Prix non compétitif") == ["competitif", "non", "pri"]
+    assert clusters.label("arguments", "Prix compétitif") == "Prix compétitif"
+    assert clusters.label("arguments", "Prix non compétitif") == "Prix non compétitif"
+    assert clusters.label("arguments", "Prix pas compétitif") == "Prix pas compétitif"
+    assert clusters.label("arguments", "Prix très compétitif") == "Prix compétitif"
+
+
+def test_namespaces_are_separate(clusters):
+    clusters.label("blockers", "Délai trop long")
+    assert clusters.label("improvements", "Délai trop longs") == "Délai trop longs"
+
+
+def test_labels_are_stable_across_runs(path):
+    phrases = ["Clarifier les termes techniques", "Expertise sectorielle", "Clarifier le jargon technique",
+               "Expertise du secteur"]
+    first = PhraseClusters(path)
+    labels = first.labels("arguments", phrases)
+    first.close()
+
+    # Nouveau processus, phrases dans l'autre ordre : chaque phrase garde son groupe et son libellé
+    second = PhraseClusters(path)
+    assert second.labels("arguments", list(reversed(phrases))) == labels
+    assert second.label("arguments", "Clarifier un jargon technique") == labels["Clarifier les termes techniques"]
+    second.close()
+
+
+def test_index_from_an_older_hash_version_is_rehashed(path):
+    old = PhraseClusters(path)
+    old.label("improvements", "Clarifier les termes techniques")
+    old.close()
+    # Index écrit par une version précédente : bandes périmées
+    conn = sqlite3.connect(path)
+    conn.execute("UPDATE buckets SET key = key + 1")
+    conn.execute("PRAGMA user_version = 1")
+    conn.commit()
+    conn.close()
+
+    clusters = PhraseClusters(path)
+    conn = sqlite3.connect(path)
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == HASH_VERSION
+    assert conn.execute("SELECT COUNT(*) FROM buckets").fetchone()[0] == BANDS
+    conn.close()
+    # Les bandes recalculées retrouvent le groupe existant
+    assert clusters.label("improvements", "Clarifier le jargon technique") == "Clarifier les termes techniques"
+    clusters.close()
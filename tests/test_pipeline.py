@@ -0,0 +1,43 @@
+"""Pipeline : writer dans l'ordre de soumission, éléments abandonnés et exceptions signalés"""
+
+import random
+import time
+
+from pipeline import Stage, Pipeline, run_pipeline
+
+
+def test_writer_receives_items_in_submission_order():
+    rng = random.Random(0)
+    delays = {i: rng.uniform(0, 0.02) for i in range(40)}
+
+    def slow(item):
+        time.sleep(delays[item])
+        return item
+
+    written = []
+    run_pipeline(range(40), [Stage("a", slow, 4), Stage("b", slow, 3)], written.append, queue_size=2)
+    assert written == list(range(40))
+
+
+def test_dropped_and_failed_items_are_reported():
+    def stage(item):
+        if item == 3:
+            raise ValueError("étape")
+        return None if item == 5 else item
+
+    def writer(item):
+        if item == 7:
+            raise OSError("écriture")
+        written.append(item)
+
+    written, dropped, failed = [], [], []
+    pipeline = Pipeline([Stage("check", stage, 2)], writer, on_drop=dropped.append,
+                        on_error=lambda item, name, error: failed.append((item, name, type(error).__name__))).start()
+    for item in range(10):
+        pipeline.submit(item)
+    pipeline.close()
+
+    assert written == [0, 1, 2, 4, 6, 8, 9]
+    assert sorted(dropped) == [3, 5, 7]
+    assert sorted(failed) == [(3, "check", "ValueError"), (7, "writer", "OSError")]
+    assert [name for name, _, _ in pipeline.errors] == ["check", "writer"]
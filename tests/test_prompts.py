@@ -0,0 +1,70 @@
+"""Compression des transcriptions, choix du palier de modèle et version du prompt"""
+
+from prompts import SYSTEM_PROMPT, choose_tier, compress_transcript, count_tokens, plan_analysis, prompt_version
+
+TIERS = [{"max_tokens": 800, "model": "petit", "budget": 6000}, {"model": "grand", "budget": 300}]
+
+
+def call_transcript(count=80, objection_at=40):
+    sentences = [f"Phrase numéro {i} sur le poste de développeur." for i in range(count)]
+    sentences[objection_at] = "Franchement votre tarif est trop cher pour nous."
+    return " ".join(sentences)
+
+
+def test_transcript_under_budget_is_unchanged():
+    transcript = call_transcript(5, objection_at=2)
+    assert compress_transcript(transcript, count_tokens(transcript)) is transcript
+
+
+def test_fillers_are_removed_before_anything_else():
+    transcript = "Euh bonjour, du coup je vous appelle en fait pour le poste. Hum, voilà, on en parle ?"
+    cleaned = "bonjour, je vous appelle pour le poste. on en parle ?"
+    result = compress_transcript(transcript, count_tokens(cleaned))
+    assert result == cleaned
+    assert "[...]" not in result
+
+
+def test_head_tail_and_objections_are_kept_with_markers():
+    transcript = call_transcript()
+    budget = 120
+    result = compress_transcript(transcript, budget)
+
+    assert count_tokens(result) <= budget
+    assert result.startswith("Phrase numéro 0 ")
+    assert result.endswith("Phrase numéro 79 sur le poste de développeur.")
+    assert "Phrase numéro 39 sur le poste de développeur. Franchement votre tarif est trop cher pour nous. " \
+           "Phrase numéro 41" in result
+    assert "[...]" in result
+    assert "Phrase numéro 60 " not in result
+
+
+def test_unpunctuated_transcript_is_split_into_windows():
+    words = [f"mot{i}" for i in range(3000)]
+    words[1500] = "budget"
+    result = compress_transcript(" ".join(words), 400)
+
+    assert count_tokens(result) <= 400
+    assert result.startswith("mot0 mot1")
+    assert result.endswith("mot2999")
+    assert "budget" in result
+    assert result.count("[...]") >= 2
+
+
+def test_choose_tier_by_transcript_length():
+    assert choose_tier(100, TIERS)["model"] == "petit"
+    assert choose_tier(801, TIERS)["model"] == "grand"
+    only_bounded = [{"max_tokens": 10, "model": "a"}, {"max_tokens": 20, "model": "b"}]
+    assert choose_tier(50, only_bounded)["model"] == "b"
+
+
+def test_plan_uses_tier_budget_and_versions_it():
+    transcript = call_transcript(400)
+    plan = plan_analysis(transcript, TIERS)
+
+    assert plan["model"] == "grand"
+    assert plan["compressed"] and plan["transcript_tokens"] <= 300 < plan["original_tokens"]
+    assert plan["messages"][0] == {"role": "system", "content": SYSTEM_PROMPT}
+    assert plan["prompt_version"] == prompt_version(300)
+    # Un autre budget change le texte envoyé, donc la version (et la clé du cache d'analyses)
+    other = plan_analysis(transcript, [TIERS[0], dict(TIERS[1], budget=500)])
+    assert other["prompt_version"] != plan["prompt_version"]
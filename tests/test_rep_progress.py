@@ -0,0 +1,97 @@
+"""Série de progression : ajouts + synchronisation sans double compte, EWMA, fenêtres 7/30 jours"""
+
+import pytest
+
+from aggregates import DailyAggregates
+from analysis_log import append_analysis
+from analysis_table import from_day_number, to_day_number
+from rep_progress import ProgressStore
+
+END = "2025-09-30"
+
+
+def day(offset):
+    """Jour `offset` jours avant END"""
+    return from_day_number(to_day_number(END) - offset)
+
+
+def analysis(rep, score, date, call_id):
+    return {"assignee_name": rep, "mood_global": str(score), "date": f"{date} 10:00", "call_id": call_id}
+
+
+@pytest.fixture
+def store(workdir):
+    store = ProgressStore(str(workdir / "state" / "progress.db"), half_life=7)
+    yield store
+    store.close()
+
+
+def test_added_then_synced_day_is_counted_once(workdir, store):
+    records = [analysis("Alice", 8, END, 1), analysis("Alice", 6, END, 2), analysis("Bruno", 4, END, 3)]
+    for record in records:
+        append_analysis(record, END)
+        store.add(record, END)
+    aggregates = DailyAggregates()
+    aggregates.refresh()
+
+    assert store.sync(aggregates) == [END]
+    assert store.sync(aggregates) == []
+    alice = store.trends(END)["reps"]["Alice"]
+    assert (alice["calls7Days"], alice["scored7Days"], alice["score7Days"]) == (2, 2, 7.0)
+    assert alice["ewma"] == 7.0
+    assert store.trends(END)["team"]["calls7Days"] == 3
+
+    # Un ajout de plus, puis la synchronisation du jour modifié : toujours pas de double compte
+    extra = analysis("Alice", 10, END, 4)
+    append_analysis(extra, END)
+    store.add(extra, END)
+    aggregates.refresh()
+    store.sync(aggregates)
+    alice = store.trends(END)["reps"]["Alice"]
+    assert (alice["calls7Days"], alice["score7Days"], alice["ewma"]) == (3, 8.0, 8.0)
+
+
+def test_sync_fills_in_analyses_missed_by_add(workdir, store):
+    append_analysis(analysis("Alice", 9, END, 1), END)
+    store.add(analysis("Alice", 3, END, 99), END)  # jamais écrite dans le journal
+    aggregates = DailyAggregates()
+    aggregates.refresh()
+    store.sync(aggregates)
+
+    alice = store.trends(END)["reps"]["Alice"]
+    assert (alice["calls7Days"], alice["score7Days"], alice["ewma"]) == (1, 9.0, 9.0)
+
+
+def test_ewma_weights_by_age_whatever_the_insertion_order(workdir):
+    forward = ProgressStore(str(workdir / "forward.db"), half_life=7)
+    backfill = ProgressStore(str(workdir / "backfill.db"), half_life=7)
+    records = [analysis("Alice", 4, day(7), 1), analysis("Alice", 10, END, 2)]
+    for record in records:
+        forward.add(record)
+    for record in reversed(records):
+        backfill.add(record)
+
+    # Demi-vie 7 jours : la note d'il y a une semaine pèse moitié moins
+    expected = round((0.5 * 4 + 10) / 1.5, 1)
+    assert forward.trends(END)["reps"]["Alice"]["ewma"] == expected
+    assert backfill.trends(END)["reps"]["Alice"]["ewma"] == expected
+
+
+def test_windows_and_progression(store):
+    for call_id, (offset, score) in enumerate([(0, 8), (6, 8), (7, 6), (13, 6), (14, 2), (29, 2), (30, 1)]):
+        store.add(analysis("Alice", score, day(offset), call_id))
+    alice = store.trends(END)["reps"]["Alice"]
+
+    assert (alice["calls7Days"], alice["callsPrevious7Days"], alice["calls30Days"]) == (2, 2, 6)
+    assert (alice["score7Days"], alice["scorePrevious7Days"], alice["score30Days"]) == (8.0, 6.0, 5.3)
+    assert (alice["delta"], alice["progression"]) == (2.0, 33)
+
+
+def test_rep_with_only_older_history_keeps_its_ewma(store):
+    store.add(analysis("Alice", 7, day(45), 1))
+    store.add(analysis("Bruno", 5, END, 2))
+    reps = store.trends(END)["reps"]
+
+    assert reps["Alice"]["ewma"] == 7.0
+    assert (reps["Alice"]["calls30Days"], reps["Alice"]["score7Days"], reps["Alice"]["delta"]) == (0, None, None)
+    assert reps["Bruno"]["ewma"] == 5.0
@@ -0,0 +1,94 @@
+"""Index plein texte : requêtes sûres (guillemets, apostrophes, OR, préfixe), variantes, accents, rattrapage par appel"""
+
+import json
+import os
+
+import pytest
+
+from search_index import SearchIndex, build_query, word_variants
+
+
+def analysis(call_id, blockers, day="2025-09-01", rep="Alice"):
+    return {"call_id": call_id, "assignee_name": rep, "client_name": "Client", "date": f"{day} 10:00",
+            "mood_global": "7/10", "blocages_client": blockers}
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = SearchIndex(str(tmp_path / "search.db"))
+    yield index
+    index.close()
+
+
+def found(index, text, **filters):
+    return [result["call_id"] for result in index.search(text, **filters)["results"]]
+
+
+def test_quotes_and_apostrophes_never_break_the_query(index):
+    assert build_query("l'offre") == '"l offre"'
+    assert build_query('pri"x') == '"pri x"'
+    assert build_query('"déjà un prestataire"') == '"déjà un prestataire"'
+    index.add(analysis(1, ["L'offre est trop chère", "Déjà un prestataire"]))
+    for text in ["l'offre", 'il a dit "trop', '"', "'", 'a"b"c', "(prix", "NEAR(", "prix)", "-", "^cher", "*"]:
+        index.search(text)  # aucune erreur de syntaxe FTS5
+    assert found(index, "l'offre") == [1]
+    assert found(index, '"déjà un prestataire"') == [1]
+    assert found(index, '"prestataire déjà"') == []
+
+
+def test_or_and_prefix(index):
+    assert build_query("recrut*") == '"recrut"*'
+    assert build_query("OR prix OR") == build_query("prix")
+    assert " OR " in build_query("prix OR délai") and "AND" not in build_query("prix OR délai")
+    index.add(analysis(1, ["Prix élevé"]))
+    index.add(analysis(2, ["Délai de recrutement"]))
+    assert sorted(found(index, "prix OR délai")) == [1, 2]
+    assert found(index, "prix délai") == []
+    assert found(index, "recrut*") == [2]
+
+
+def test_feminine_and_plural_variants():
+    assert word_variants("chères") == ["chères", "chèr", "chèrs", "chère"]
+    assert set(word_variants("cher")) == {"cher", "chers", "chere", "cheres"}
+    # Mots trop courts : pas de variantes
+    assert word_variants("un") == ["un"]
+
+
+def test_accents_and_case_are_folded(index):
+    index.add(analysis(1, ["Très chère"]))
+    index.add(analysis(2, ["Pas cher du tout"]))
+    assert found(index, "tres cher") == [1]
+    assert found(index, "TRÈS CHERS") == [1]
+    assert sorted(found(index, "chere")) == [1, 2]
+
+
+def write_day(directory, analyses, day="2025-09-01"):
+    path = directory / f"analyses_{day}.json"
+    path.write_text(json.dumps(analyses, ensure_ascii=False), encoding="utf-8")
+    # mtime distinct même sur un système de fichiers à la seconde
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def test_sync_reindexes_calls_whose_analysis_changed(index, tmp_path):
+    analyses_dir, transcripts_dir = tmp_path / "analyses", tmp_path / "transcriptions"
+    analyses_dir.mkdir()
+    transcripts_dir.mkdir()
+    write_day(analyses_dir, [analysis(1, ["Prix élevé"]), analysis(2, ["Pas le moment"])])
+    assert index.sync(str(analyses_dir), str(transcripts_dir)) == 2
+    assert index.sync(str(analyses_dir), str(transcripts_dir)) == 0
+
+    # Même jour, appel 1 corrigé et appel 3 ajouté : l'appel 2 inchangé n'est pas réindexé
+    write_day(analyses_dir, [analysis(1, ["Délai trop long"]), analysis(2, ["Pas le moment"]),
+                             analysis(3, ["Prix élevé"])])
+    assert index.sync(str(analyses_dir), str(transcripts_dir)) == 2
+    assert found(index, "délai") == [1]
+    assert found(index, "prix") == [3]
+    assert index.count() == 3
+
+    # Transcription arrivée après coup : l'appel est réindexé avec
+    (transcripts_dir / "call_2_2025-09-01.txt").write_text("On rappelle en septembre", encoding="utf-8")
+    write_day(analyses_dir, [analysis(1, ["Délai trop long"]), analysis(2, ["Pas le moment"]),
+                             analysis(3, ["Prix élevé"])])
+    assert index.sync(str(analyses_dir), str(transcripts_dir)) == 1
+    assert found(index, "septembre") == [2]
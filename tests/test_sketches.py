@@ -0,0 +1,68 @@
+"""Space-Saving sous la capacité : mêmes comptes et même ordre que collections.Counter, erreur nulle"""
+
+import random
+from collections import Counter
+
+from aggregates import add_analysis, empty_snapshot
+from sketches import SpaceSaving, StreamingAggregator
+
+BLOCKERS = [f"Blocage {i}" for i in range(30)]
+
+
+def analyses(count, seed=0):
+    rng = random.Random(seed)
+    return [{"assignee_name": f"Rep {rng.randint(0, 4)}", "mood_global": str(rng.randint(1, 10)),
+             "blocages_client": rng.sample(BLOCKERS, rng.randint(0, 3)),
+             "arguments_reussis": rng.sample(BLOCKERS[:5], rng.randint(0, 2))} for _ in range(count)]
+
+
+def test_sketch_under_capacity_matches_counter():
+    rng = random.Random(1)
+    phrases = [rng.choice(BLOCKERS) for _ in range(2000)]
+    sketch = SpaceSaving(capacity=len(BLOCKERS))
+    sketch.update_many(phrases)
+    exact = Counter(phrases)
+
+    assert sketch.most_common() == exact.most_common()
+    assert sketch.most_common(10) == exact.most_common(10)
+    assert all(sketch.error(phrase) == 0 for phrase in exact)
+    assert sketch.min_count() == 0 and sketch.total == len(phrases)
+
+
+def test_sketch_over_capacity_bounds_counts():
+    rng = random.Random(2)
+    phrases = [f"Rare {i}" for i in range(500)] + [rng.choice(BLOCKERS[:3]) for _ in range(500)]
+    rng.shuffle(phrases)
+    sketch = SpaceSaving(capacity=20)
+    sketch.update_many(phrases)
+    exact = Counter(phrases)
+
+    assert len(sketch) == 20
+    for phrase, count in sketch.most_common():
+        assert count - sketch.error(phrase) <= exact[phrase] <= count
+    # Les trois phrases fréquentes restent en tête
+    assert {phrase for phrase, _ in sketch.most_common(3)} == set(BLOCKERS[:3])
+
+
+def test_aggregator_stream_and_snapshots_match_counter():
+    records = analyses(300)
+    streamed = StreamingAggregator(clusters=False).consume(records).result()
+
+    # Les mêmes analyses réparties en instantanés quotidiens puis fusionnées
+    merged = StreamingAggregator(clusters=False)
+    for start in range(0, len(records), 50):
+        snapshot = empty_snapshot(f"day {start}")
+        for record in records[start:start + 50]:
+            add_analysis(snapshot, record)
+        merged.add_snapshot(snapshot)
+    merged = merged.result()
+
+    exact = Counter(phrase for record in records for phrase in record["blocages_client"])
+    for data in (streamed, merged):
+        # Égalités comprises : les phrases arrivent dans le même ordre que dans le Counter
+        assert data["blockers"].most_common() == exact.most_common()
+        assert data["blockers"].most_common(10) == exact.most_common(10)
+        assert all(data["blockers"].error(phrase) == 0 for phrase in exact)
+        assert (data["calls"], data["scored"]) == (300, 300)
+    assert streamed["reps"] == merged["reps"]
+    assert streamed["score_sum"] == merged["score_sum"]
@@ -0,0 +1,105 @@
+"""Pool SMTP (reconnexions, STARTTLS) et file de reprise, contre FakeSMTP (sans TLS)"""
+
+import smtplib
+from email.message import EmailMessage
+
+import pytest
+
+from smtp_delivery import DeliveryEngine, DeliveryUncertain, RetryQueue, SMTPPool
+
+
+def message(recipient):
+    msg = EmailMessage()
+    msg["From"] = "callx@example.com"
+    msg["To"] = recipient
+    msg["Subject"] = "Votre récap CallX"
+    msg.set_content("Bonjour")
+    return msg
+
+
+def pool(smtp_fake, **options):
+    # FakeSMTP ne propose pas STARTTLS : on l'accepte explicitement
+    return SMTPPool("127.0.0.1", smtp_fake.port, username="callx", password="secret", size=1,
+                    timeout=5, starttls=False, **options)
+
+
+@pytest.fixture
+def retry_queue(tmp_path):
+    retries = RetryQueue(str(tmp_path / "email_retry.db"), max_attempts=2, base_delay=0)
+    yield retries
+    retries.close()
+
+
+def test_starttls_is_required_by_default(smtp_fake):
+    with pytest.raises(smtplib.SMTPNotSupportedError):
+        SMTPPool("127.0.0.1", smtp_fake.port, timeout=5).connect()
+    assert smtp_fake.logins == 0
+
+
+def test_pool_reuses_connection(smtp_fake):
+    smtp = pool(smtp_fake)
+    for i in range(3):
+        smtp.send(message(f"rep{i}@example.com"))
+    smtp.close()
+    assert [received["to"] for received in smtp_fake.received] == [[f"rep{i}@example.com"] for i in range(3)]
+    assert smtp.connections_opened == 1
+
+
+def test_pool_reconnects_after_server_drop(smtp_fake):
+    smtp_fake.drop_after = 1
+    smtp = pool(smtp_fake)
+    for i in range(3):
+        smtp.send(message(f"rep{i}@example.com"))
+    smtp.close()
+    # Chaque message arrive une seule fois, sur une nouvelle connexion
+    assert len(smtp_fake.received) == 3
+    assert smtp.connections_opened == 3
+    assert smtp_fake.logins == 3
+
+
+def outcomes(**counts):
+    return {"sent": 0, "queued": 0, "uncertain": 0, "abandoned": 0, **counts}
+
+
+def test_failed_message_is_queued_then_replayed(smtp_fake, retry_queue):
+    smtp_fake.reject_rate = 1.0
+    engine = DeliveryEngine(pool(smtp_fake), retry_queue, workers=1, messages_per_minute=None)
+    assert engine.send_all([message("rep1@example.com")]) == outcomes(queued=1)
+    assert len(retry_queue) == 1
+    assert smtp_fake.received == []
+
+    smtp_fake.reject_rate = 0.0
+    assert engine.send_all([]) == outcomes(sent=1)
+    assert len(retry_queue) == 0
+    assert [received["to"] for received in smtp_fake.received] == [["rep1@example.com"]]
+
+
+def test_retry_queue_gives_up_after_max_attempts(smtp_fake, retry_queue):
+    smtp_fake.reject_rate = 1.0
+    engine = DeliveryEngine(pool(smtp_fake), retry_queue, workers=1, messages_per_minute=None)
+    engine.send_all([message("rep1@example.com")])
+    assert len(retry_queue) == 1
+    assert engine.send_all([]) == outcomes(abandoned=1)
+    assert len(retry_queue) == 0
+    assert smtp_fake.received == []
+
+
+def test_disconnect_during_data_is_uncertain_and_not_resent(smtp_fake, retry_queue):
+    # Le serveur coupe la connexion après avoir lu le message : il a pu l'accepter
+    smtp_fake.error_rate = 1.0
+    with pytest.raises(DeliveryUncertain):
+        pool(smtp_fake).send(message("rep1@example.com"))
+    assert smtp_fake.connections == 1  # pas de reconnexion pour renvoyer
+
+    engine = DeliveryEngine(pool(smtp_fake), retry_queue, workers=1, messages_per_minute=None)
+    assert engine.send_all([message("rep2@example.com")]) == outcomes(uncertain=1)
+    assert len(retry_queue) == 0
+
+
+def test_retry_queue_waits_for_backoff(tmp_path):
+    retries = RetryQueue(str(tmp_path / "email_retry.db"), base_delay=300)
+    retries.push(message("rep1@example.com"), "coupure")
+    assert retries.due() == []
+    [(retry_id, queued, attempts)] = retries.due(now=float("inf"))
+    assert (queued["To"], attempts) == ("rep1@example.com", 1)
+    retries.close()
@@ -0,0 +1,138 @@
+"""Service de statistiques : ETag/304, gzip, routes filtrées et reprise du flux SSE par Last-Event-ID"""
+
+import gzip
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import httpx
+import pytest
+import uvicorn
+from fastapi.testclient import TestClient
+
+import rep_progress
+from stats_service import create_app, etag_matches
+
+
+def write_day(day, calls):
+    analyses = [{"call_id": call_id, "assignee_name": rep, "mood_global": f"{score}/10", "date": f"{day} 10:00",
+                 "blocages_client": ["Trop cher"]} for call_id, rep, score in calls]
+    with open(f"analyses/analyses_{day}.json", "w", encoding="utf-8") as f:
+        json.dump(analyses, f)
+
+
+@pytest.fixture
+def analyses(workdir, monkeypatch):
+    # Série de progression propre au dossier de travail du test
+    monkeypatch.setattr(rep_progress, "_DEFAULT", None)
+    (workdir / "analyses").mkdir()
+    write_day("2025-09-01", [(1, "Alice", 8), (2, "Bruno", 5)])
+    write_day("2025-09-02", [(3, "Alice", 6)])
+    yield workdir
+    if rep_progress._DEFAULT is not None:
+        rep_progress._DEFAULT.close()
+
+
+@pytest.fixture
+def client(analyses):
+    with TestClient(create_app(watch=False)) as client:
+        yield client
+
+
+def test_import_opens_nothing(tmp_path):
+    # Ni state/search.db ni dashboard chargé tant que le serveur n'a pas démarré
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    subprocess.run([sys.executable, "-c", "import stats_service"], cwd=tmp_path, check=True,
+                   env={**os.environ, "PYTHONPATH": root})
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_etag_list_is_compared_exactly():
+    assert etag_matches('"2-abc"', '"2-abc"')
+    assert etag_matches('"1-old", W/"2-abc"', '"2-abc"')
+    assert etag_matches("*", '"2-abc"')
+    # Une sous-chaîne ou un préfixe ne suffit pas
+    assert not etag_matches('"12-abc"', '"2-abc"')
+    assert not etag_matches('"2-abcd"', '"2-abc"')
+    assert not etag_matches(None, '"2-abc"')
+
+
+def test_etag_returns_304_until_the_data_changes(client):
+    response = client.get("/stats")
+    assert response.status_code == 200 and response.json()["realCallsCount"] == 3
+    etag = response.headers["etag"]
+    assert client.get("/stats", headers={"If-None-Match": f'"0-old", {etag}'}).status_code == 304
+
+    write_day("2025-09-03", [(4, "Bruno", 9)])
+    assert client.app.state.store.refresh()
+    response = client.get("/stats", headers={"If-None-Match": etag})
+    assert response.status_code == 200 and response.headers["etag"] != etag
+
+
+def test_gzip_only_when_accepted(client):
+    store = client.app.state.store
+    raw = client.get("/stats", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in raw.headers and raw.content == store.current.body
+    # httpx décompresse d'office : on relit le corps brut
+    with client.stream("GET", "/stats", headers={"Accept-Encoding": "gzip"}) as response:
+        body = b"".join(response.iter_raw())
+    assert response.headers["content-encoding"] == "gzip"
+    assert gzip.decompress(body) == store.current.body
+
+
+def test_filtered_routes_are_cached_per_version(client):
+    alice = client.get("/stats", params={"rep": "Alice"})
+    assert alice.json()["realCallsCount"] == 2
+    assert client.get("/stats", params={"start": "2025-09-02"}).json()["realCallsCount"] == 1
+    assert client.get("/stats", params={"rep": "Alice"}, headers={"If-None-Match": alice.headers["etag"]}).status_code == 304
+    assert client.get("/stats", params={"rep": "Personne"}).json()["error"] is True
+
+    write_day("2025-09-03", [(4, "Alice", 9)])
+    client.app.state.store.refresh()
+    assert client.get("/stats", params={"rep": "Alice"}).json()["realCallsCount"] == 3
+
+
+@pytest.fixture
+def server(analyses):
+    app = create_app(watch=False)
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=0, log_level="warning",
+                                           timeout_graceful_shutdown=1))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    port = server.servers[0].sockets[0].getsockname()[1]
+    yield app, f"http://127.0.0.1:{port}"
+    server.should_exit = True
+    thread.join(5)
+
+
+def first_event(url, last_event_id):
+    """(id, type, données) du premier événement SSE reçu"""
+    with httpx.stream("GET", f"{url}/events", headers={"Last-Event-ID": last_event_id}, timeout=10) as response:
+        fields = {}
+        for line in response.iter_lines():
+            if not line:
+                return fields["id"], fields["event"], json.loads(fields["data"])
+            key, _, value = line.partition(": ")
+            fields[key] = value
+
+
+def test_sse_resumes_from_last_event_id(server):
+    app, url = server
+    store = app.state.store
+    write_day("2025-09-03", [(4, "Bruno", 9)])
+    store.refresh()
+
+    # Reprise après la version 1 : seul le delta de la version 2 est rejoué
+    event_id, event, data = first_event(url, f"{store.epoch}.1")
+    assert (event_id, event) == (f"{store.epoch}.2", "delta")
+    assert [call["call_id"] for call in data["calls"]] == [4]
+
+    # Identifiant d'un autre démarrage du service : snapshot complet
+    event_id, event, data = first_event(url, f"{store.epoch - 1}.1")
+    assert (event_id, event) == (f"{store.epoch}.2", "snapshot")
+    assert data["realCallsCount"] == 4
@@ -0,0 +1,68 @@
+"""Choix du moteur de transcription : variables d'environnement, arguments explicites, chargement différé"""
+
+import pytest
+
+import transcription
+from transcription import LazyBackend, backend_settings, get_backend
+
+VARIABLES = ("XCALL_TRANSCRIBER", "XCALL_WHISPER_MODEL", "XCALL_WHISPER_BEAM", "XCALL_WHISPER_THREADS",
+             "XCALL_WHISPER_COMPUTE")
+
+
+class RecordingBackend:
+    """Garde les réglages reçus au lieu de charger un modèle"""
+
+    def __init__(self, **settings):
+        self.settings = settings
+
+
+@pytest.fixture(autouse=True)
+def clean_environ(monkeypatch):
+    for variable in VARIABLES:
+        monkeypatch.delenv(variable, raising=False)
+    monkeypatch.setitem(transcription.BACKENDS, "whisper", RecordingBackend)
+    monkeypatch.setitem(transcription.BACKENDS, "faster-whisper", RecordingBackend)
+
+
+def test_defaults():
+    assert backend_settings() == {"name": "whisper", "model_size": "base", "beam_size": None, "threads": None}
+
+
+def test_environment_is_parsed(monkeypatch):
+    monkeypatch.setenv("XCALL_TRANSCRIBER", "faster-whisper")
+    monkeypatch.setenv("XCALL_WHISPER_MODEL", "small")
+    monkeypatch.setenv("XCALL_WHISPER_BEAM", "3")
+    monkeypatch.setenv("XCALL_WHISPER_THREADS", "4")
+    assert backend_settings() == {"name": "faster-whisper", "model_size": "small", "beam_size": 3, "threads": 4,
+                                  "compute_type": "int8"}
+    monkeypatch.setenv("XCALL_WHISPER_COMPUTE", "int8_float32")
+    assert get_backend().settings == {"model_size": "small", "beam_size": 3, "threads": 4,
+                                      "compute_type": "int8_float32"}
+
+
+def test_explicit_arguments_win_and_compute_type_is_faster_whisper_only(monkeypatch):
+    monkeypatch.setenv("XCALL_WHISPER_MODEL", "small")
+    monkeypatch.setenv("XCALL_WHISPER_BEAM", "")
+    monkeypatch.setenv("XCALL_WHISPER_COMPUTE", "float32")
+    assert get_backend("whisper", model_size="medium", threads=2).settings == {
+        "model_size": "medium", "beam_size": None, "threads": 2}
+
+
+def test_unknown_backend_is_rejected(monkeypatch):
+    monkeypatch.setenv("XCALL_TRANSCRIBER", "whisper-cpp")
+    with pytest.raises(ValueError, match="whisper-cpp"):
+        get_backend()
+
+
+def test_lazy_backend_loads_once_on_first_use():
+    loads = []
+
+    class Backend:
+        def transcribe(self, audio, language="fr"):
+            return {"text": audio, "segments": [], "duration": 0}
+
+    lazy = LazyBackend(lambda: loads.append(1) or Backend())
+    assert not lazy.loaded and loads == []
+    assert lazy.transcribe("a")["text"] == "a"
+    lazy.transcribe("b")
+    assert lazy.loaded and loads == [1]
@@ -0,0 +1,89 @@
+"""Pool de transcription (workers spawn, moteur factice) : ordre des morceaux, erreurs remontées, threads par worker"""
+
+import os
+import time
+
+import numpy as np
+import pytest
+
+from transcription_pool import TranscriptionPool
+
+RATE = 16000
+
+
+class FakeBackend:
+    """Reconnaît le bloc d'un morceau à son amplitude (0,05 × numéro) ; les premiers blocs finissent en dernier"""
+
+    def __init__(self, threads=None, fail_on=None):
+        self.threads = threads
+        self.fail_on = fail_on
+
+    def transcribe(self, audio, language="fr"):
+        block = int(round(float(np.abs(audio).max()) / 0.05))
+        time.sleep((5 - block) * 0.1)
+        if block == self.fail_on:
+            raise ValueError(f"bloc {block} illisible")
+        return {"text": f"bloc {block}", "duration": len(audio) / RATE,
+                "segments": [{"start": 0.0, "end": len(audio) / RATE, "text": f"bloc {block}",
+                              "threads": self.threads, "environ": initial_environ("OMP_NUM_THREADS")}]}
+
+
+def initial_environ(name):
+    """Valeur de `name` dans l'environnement du processus à son lancement (avant tout import)"""
+    with open("/proc/self/environ", "rb") as f:
+        variables = dict(item.split(b"=", 1) for item in f.read().split(b"\0") if b"=" in item)
+    value = variables.get(name.encode())
+    return value.decode() if value is not None else None
+
+
+def fake_backend(name, **settings):
+    return FakeBackend(threads=settings["threads"])
+
+
+def failing_backend(name, **settings):
+    return FakeBackend(fail_on=3)
+
+
+def blocks(count=4):
+    """`count` secondes de son d'amplitudes croissantes, séparées par une seconde de silence"""
+    t = np.arange(RATE) / RATE
+    parts = []
+    for block in range(1, count + 1):
+        parts += [(0.05 * block * np.sin(2 * np.pi * 440 * t)).astype(np.float32), np.zeros(RATE, dtype=np.float32)]
+    return np.concatenate(parts[:-1])
+
+
+@pytest.fixture
+def thread_environ(monkeypatch):
+    # Le pool pose les limites dans l'environnement du parent : remises en état après le test
+    for variable in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        monkeypatch.setenv(variable, "")
+
+
+@pytest.mark.skipif(not os.path.exists("/proc/self/environ"), reason="environnement initial lisible sous Linux seulement")
+def test_chunks_are_reassembled_in_order(thread_environ):
+    pool = TranscriptionPool(workers=3, threads_per_worker=2, split_seconds=2.5, backend_factory=fake_backend,
+                             name="whisper")
+    try:
+        result = pool.transcribe(blocks())
+    finally:
+        pool.close()
+
+    assert result["text"] == "bloc 1 bloc 2 bloc 3 bloc 4"
+    # Décalages : milieu des silences, à une trame près
+    assert [segment["start"] for segment in result["segments"]] == pytest.approx([0.0, 1.5, 3.5, 5.5], abs=0.03)
+    assert result["duration"] == 7.0
+    # Limites de threads présentes dès le lancement du worker, donc avant son import de numpy
+    assert {(segment["threads"], segment["environ"]) for segment in result["segments"]} == {(2, "2")}
+
+
+def test_worker_error_reaches_the_caller(thread_environ):
+    pool = TranscriptionPool(workers=2, threads_per_worker=1, split_seconds=2.5, backend_factory=failing_backend,
+                             name="whisper")
+    try:
+        with pytest.raises(ValueError, match="bloc 3 illisible"):
+            pool.transcribe(blocks())
+        # Le pool reste utilisable après l'erreur
+        assert pool.transcribe(blocks(2))["text"] == "bloc 1 bloc 2"
+    finally:
+        pool.close()
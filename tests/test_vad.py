@@ -0,0 +1,51 @@
+"""Pré-filtre VAD : rejet des enregistrements silencieux, blancs retirés, horodatages ramenés sur l'original"""
+
+import numpy as np
+
+from vad import TimelineMap, prefilter
+
+RATE = 16000
+
+
+def tone(seconds):
+    t = np.arange(int(seconds * RATE)) / RATE
+    return (0.1 * np.sin(2 * np.pi * 440 * t)).astype(np.float32)
+
+
+def silence(seconds):
+    return np.zeros(int(seconds * RATE), dtype=np.float32)
+
+
+def test_long_gap_is_trimmed_and_short_pauses_kept():
+    audio = np.concatenate([tone(2), silence(1), tone(2), silence(10), tone(2)])
+    result = prefilter(audio, sample_rate=RATE)
+
+    assert not result["skip"]
+    # La pause d'une seconde reste, le blanc de dix secondes part (à la marge de 0,25 s près de chaque côté)
+    assert 7.4 <= len(result["audio"]) / RATE <= 7.6
+    assert abs(result["speech_seconds"] - len(result["audio"]) / RATE) < 1e-9
+    assert 0.55 < result["trim_ratio"] < 0.6
+    # Le troisième passage commence vers 15 s dans l'original
+    assert abs(result["timeline"].to_original(5.6) - 15.0) < 0.1
+
+
+def test_silent_or_too_short_recordings_are_skipped():
+    assert prefilter(silence(30), sample_rate=RATE)["skip"]
+    short = prefilter(np.concatenate([silence(5), tone(0.5), silence(5)]), sample_rate=RATE)
+    assert short["skip"] and short["speech_seconds"] < 1.5
+
+
+def test_timeline_keeps_end_times_in_their_span():
+    # Plages conservées : [0 s, 1 s] puis [6 s, 7 s] ; la jointure est à 1 s dans l'audio découpé
+    timeline = TimelineMap([(0, RATE), (6 * RATE, 7 * RATE)], RATE)
+    assert timeline.to_original(0.5) == 0.5
+    assert timeline.to_original(1.0) == 6.0
+    assert timeline.to_original(1.0, end=True) == 1.0
+    assert timeline.to_original(1.5, end=True) == 6.5
+
+    segments = [{"start": 0.2, "end": 1.0, "text": "Bonjour"}, {"start": 1.0, "end": 2.0, "text": "Oui ?"}]
+    assert [(s["start"], s["end"]) for s in timeline.remap_segments(segments)] == [(0.2, 1.0), (6.0, 7.0)]
+
+
+def test_empty_timeline_is_identity():
+    assert TimelineMap([], RATE).to_original(3.2) == 3.2
@@ -0,0 +1,142 @@
+"""Démon d'ingestion : authentification des webhooks, dédoublonnage des appels en cours, curseur du rattrapage"""
+
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+from openai import OpenAI
+
+import ingestion
+from aircall_sync import AircallSync
+from analysis_client import AnalysisExecutor
+from fake_services import synthetic_calls
+from ledger import Ledger
+from xcall_daemon import IngestionDaemon, create_app
+
+TOKEN = "test-token"
+
+
+class FakeTranscriber:
+    def __init__(self):
+        self.calls = 0
+
+    def transcribe(self, audio, language="fr"):
+        self.calls += 1
+        text = "Bonjour, je vous appelle au sujet de votre recrutement."
+        return {"text": text, "segments": [{"start": 0.0, "end": 1.0, "text": text}]}
+
+
+@pytest.fixture(autouse=True)
+def no_side_stores(monkeypatch):
+    monkeypatch.setattr(ingestion, "USE_VAD", False)
+    monkeypatch.setattr(ingestion, "USE_SEARCH_INDEX", False)
+    monkeypatch.setattr(ingestion, "USE_PROGRESS", False)
+
+
+@pytest.fixture
+def ledger(workdir):
+    ledger = Ledger(str(workdir / "state" / "ledger.db"))
+    yield ledger
+    ledger.close()
+
+
+def make_calls(aircall, count=3, age=7200):
+    start = int(time.time()) - age
+    calls = synthetic_calls(count, start, start + 3600, seed=2)
+    for call in calls:
+        call["recording"] = f"{aircall.url}/recordings/{call['id']}.mp3"
+    aircall.add_calls(calls)
+    return calls
+
+
+def make_daemon(workdir, aircall, ledger, openai_fake=None, **options):
+    sync = AircallSync({}, base_url=aircall.url + "/v1", cursor_file=str(workdir / "state" / "cursor.json"))
+    analyzer = None
+    if openai_fake:
+        analyzer = AnalysisExecutor(OpenAI(api_key="test", base_url=openai_fake.url + "/v1"), max_retries=1,
+                                    max_backoff=0.01)
+    return IngestionDaemon(sync, ledger, FakeTranscriber(), analyzer, webhook_token=TOKEN, sweep_seconds=3600,
+                           **options)
+
+
+def webhook(call, token=TOKEN, event="call.ended"):
+    return {"resource": "call", "event": event, "token": token, "data": {"id": call["id"]}}
+
+
+def test_webhook_token_is_required(workdir, aircall, ledger):
+    [call] = make_calls(aircall, 1)
+    daemon = make_daemon(workdir, aircall, ledger)
+    client = TestClient(create_app(daemon))
+    missing = webhook(call)
+    del missing["token"]
+
+    assert client.post("/webhooks/aircall", json=webhook(call, token="mauvais")).status_code == 401
+    assert client.post("/webhooks/aircall", json=missing).status_code == 401
+    assert client.post("/webhooks/aircall", json=webhook(call, token=None)).status_code == 401
+    assert client.post("/webhooks/aircall", content=b"{pas du json").status_code == 400
+    assert daemon.status()["rejected"] == 3
+    assert daemon._webhook_ids.empty()
+
+    # Sans token configuré, même un webhook « signé » est refusé
+    daemon.webhook_token = None
+    assert client.post("/webhooks/aircall", json=webhook(call)).status_code == 401
+    daemon.webhook_token = TOKEN
+    assert client.post("/webhooks/aircall", json=webhook(call, event="call.created")).json() == {"status": "ignored"}
+    assert client.post("/webhooks/aircall", json=webhook(call)).json() == {"status": "accepted"}
+    assert daemon._webhook_ids.get_nowait() == call["id"]
+
+
+def test_call_in_flight_is_submitted_once(workdir, aircall, ledger):
+    [call] = make_calls(aircall, 1)
+    daemon = make_daemon(workdir, aircall, ledger)
+    assert daemon.enqueue(call) == "enqueued"
+    assert daemon.enqueue(call, source="sweep") == "duplicate"
+    assert daemon._intake.qsize() == 1
+
+    # Appel abandonné par une étape : il peut être soumis à nouveau
+    daemon._release({"call_id": call["id"]})
+    assert daemon.enqueue(call) == "enqueued"
+
+    ledger.mark(call["id"], "persisted")
+    daemon._release({"call_id": call["id"]})
+    assert daemon.enqueue(call) == "already processed"
+    assert daemon.status()["duplicates"] == 2
+
+
+def test_duplicate_webhooks_are_analyzed_once(workdir, aircall, openai_fake, ledger):
+    # Appel de l'avant-veille : hors de la fenêtre du premier rattrapage, seuls les webhooks le soumettent
+    [call] = make_calls(aircall, 1, age=2 * 86400)
+    daemon = make_daemon(workdir, aircall, ledger, openai_fake).start()
+    try:
+        client = TestClient(create_app(daemon))
+        for _ in range(3):
+            assert client.post("/webhooks/aircall", json=webhook(call)).status_code == 200
+        deadline = time.time() + 10
+        while time.time() < deadline and (daemon.status()["persisted"] < 1 or daemon.status()["duplicates"] < 2):
+            time.sleep(0.05)
+    finally:
+        daemon.stop()
+    assert (daemon.status()["persisted"], daemon.status()["duplicates"]) == (1, 2)
+    assert openai_fake.requests_count == 1
+    assert ledger.get(call["id"])["status"] == "persisted"
+
+
+def test_sweep_cursor_waits_for_pending_calls_and_is_saved(workdir, aircall, ledger):
+    calls = make_calls(aircall, 4)
+    first, blocked = calls[0], calls[1]
+    ledger.mark(first["id"], "persisted")
+    daemon = make_daemon(workdir, aircall, ledger)
+
+    assert daemon.sweep() == 3
+    # Le curseur s'arrête avant le premier appel encore à traiter
+    cursor = {"started_at": first["started_at"], "call_id": first["id"]}
+    assert daemon.sync.load_cursor() == cursor
+
+    # Nouveau démarrage : le curseur est relu depuis le disque, les appels en cours ne sont pas resoumis
+    for call in calls[1:]:
+        ledger.mark(call["id"], "persisted")
+    restarted = make_daemon(workdir, aircall, ledger)
+    assert restarted.sync.load_cursor() == cursor
+    assert restarted.sweep() == 0
+    assert restarted.sync.load_cursor() == {"started_at": calls[-1]["started_at"], "call_id": calls[-1]["id"]}
+    assert blocked["id"] not in restarted._inflight
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Moteurs de transcription pour CallX
+- "whisper" : openai-whisper (PyTorch), comportement historique
+- "faster-whisper" : CTranslate2 quantifié int8, nettement plus rapide sur CPU
+
+Sélection et réglages par variables d'environnement :
+XCALL_TRANSCRIBER, XCALL_WHISPER_MODEL, XCALL_WHISPER_BEAM, XCALL_WHISPER_THREADS, XCALL_WHISPER_COMPUTE
+"""
+
+import os
+import threading
+
+SAMPLE_RATE = 16000
+
+
+class TranscriptionBackend:
+    """
+    Interface commune : transcribe(audio, language) renvoie
+    {"text": str, "segments": [{"start", "end", "text"}], "duration": secondes}
+
+    `audio` est un chemin de fichier ou un tableau float32 mono à 16 kHz.
+    """
+
+    name = None
+
+    def transcribe(self, audio, language="fr"):
+        raise NotImplementedError
+
+
+class WhisperBackend(TranscriptionBackend):
+    """openai-whisper sur PyTorch (fp32 sur CPU)"""
+
+    name = "whisper"
+
+    def __init__(self, model_size="base", beam_size=None, threads=None):
+        import torch
+        import whisper
+
+        if threads:
+            torch.set_num_threads(threads)
+        self._whisper = whisper
+        self.model = whisper.load_model(model_size)
+        self.beam_size = beam_size
+
+    def transcribe(self, audio, language="fr"):
+        if isinstance(audio, str):
+            audio = self._whisper.load_audio(audio)
+        options = {"language": language, "fp16": False}
+        if self.beam_size:
+            options["beam_size"] = self.beam_size
+        result = self.model.transcribe(audio, **options)
+        return {
+            "text": result["text"].strip(),
+            "segments": [{"start": s["start"], "end": s["end"], "text": s["text"]} for s in result["segments"]],
+            "duration": len(audio) / SAMPLE_RATE,
+        }
+
+
+class FasterWhisperBackend(TranscriptionBackend):
+    """faster-whisper (CTranslate2), poids quantifiés int8 sur CPU"""
+
+    name = "faster-whisper"
+
+    def __init__(self, model_size="base", beam_size=5, threads=None, compute_type="int8"):
+        from faster_whisper import WhisperModel
+
+        self.model = WhisperModel(model_size, device="cpu", compute_type=compute_type, cpu_threads=threads or 0)
+        self.beam_size = beam_size or 5
+
+    def transcribe(self, audio, language="fr"):
+        segments, info = self.model.transcribe(audio, language=language, beam_size=self.beam_size)
+        # Les segments sont générés à la demande : la transcription a lieu ici
+        segments = [{"start": s.start, "end": s.end, "text": s.text} for s in segments]
+        return {
+            "text": "".join(s["text"] for s in segments).strip(),
+            "segments": segments,
+            "duration": info.duration,
+        }
+
+
+BACKENDS = {
+    WhisperBackend.name: WhisperBackend,
+    FasterWhisperBackend.name: FasterWhisperBackend,
+}
+
+
+def _int_env(name):
+    value = os.getenv(name)
+    return int(value) if value else None
+
+
+def backend_settings(name=None, model_size=None, beam_size=None, threads=None, compute_type=None):
+    """Réglages effectifs : arguments explicites, sinon variables d'environnement"""
+    settings = {
+        "name": name or os.getenv('XCALL_TRANSCRIBER', 'whisper'),
+        "model_size": model_size or os.getenv('XCALL_WHISPER_MODEL', 'base'),
+        "beam_size": beam_size or _int_env('XCALL_WHISPER_BEAM'),
+        "threads": threads or _int_env('XCALL_WHISPER_THREADS'),
+    }
+    if settings["name"] == FasterWhisperBackend.name:
+        settings["compute_type"] = compute_type or os.getenv('XCALL_WHISPER_COMPUTE', 'int8')
+    return settings
+
+
+def get_backend(name=None, **overrides):
+    """Charge le moteur de transcription configuré"""
+    settings = backend_settings(name, **overrides)
+    backend_name = settings.pop("name")
+    if backend_name not in BACKENDS:
+        raise ValueError(f"Moteur de transcription inconnu: {backend_name} (choix: {', '.join(BACKENDS)})")
+    print(f"🔄 Chargement {backend_name} ({settings['model_size']})...")
+    return BACKENDS[backend_name](**settings)
+
+
+class LazyBackend(TranscriptionBackend):
+    """
+    Moteur chargé à la première transcription (thread-safe)
+
+    Un run dont les appels sont déjà transcrits (reprise) ou sans enregistrement
+    n'importe pas torch et ne charge aucun modèle.
+    """
+
+    name = "lazy"
+
+    def __init__(self, factory=get_backend):
+        self._factory = factory
+        self._backend = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self):
+        return self._backend is not None
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            with self._lock:
+                if self._backend is None:
+                    self._backend = self._factory()
+        return self._backend
+
+    def transcribe(self, audio, language="fr"):
+        return self.backend.transcribe(audio, language=language)
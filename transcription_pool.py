@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Transcription multi-processus pour CallX
+Chaque worker charge le modèle une seule fois au démarrage puis prend les
+enregistrements dans la file du pool. Les enregistrements longs sont découpés
+aux silences, transcrits en parallèle puis recollés dans l'ordre.
+
+Réglages : XCALL_TRANSCRIBE_PROCESSES (workers) et XCALL_WHISPER_THREADS
+(threads torch/CTranslate2 par worker). Par défaut workers × threads = nombre de cœurs.
+"""
+
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from audio import SAMPLE_RATE, load_audio, split_at_silences
+from transcription import TranscriptionBackend, backend_settings, get_backend
+
+# Lues par OpenMP/MKL/OpenBLAS au premier import de numpy ou torch : trop tard une fois le worker lancé
+THREAD_VARIABLES = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS")
+
+_backend = None
+
+
+def _init_worker(factory, settings, threads):
+    """Initialisation d'un worker : charge le modèle une fois"""
+    global _backend
+    settings = dict(settings, threads=threads)
+    name = settings.pop("name")
+    _backend = factory(name, **settings)
+
+
+def _transcribe_chunk(audio, offset_seconds, language):
+    result = _backend.transcribe(audio, language=language)
+    for segment in result["segments"]:
+        segment["start"] += offset_seconds
+        segment["end"] += offset_seconds
+    return result
+
+
+class TranscriptionPool(TranscriptionBackend):
+    """
+    Pool de processus de transcription, utilisable comme un moteur normal
+
+    transcribe() est bloquant mais peut être appelé depuis plusieurs threads à la
+    fois (étape "transcribe" du pipeline) : les demandes se répartissent sur les workers.
+    Les workers sont lancés par spawn (aucun thread ni verrou hérité du parent, qui
+    ne charge jamais torch). Un worker spawn réimporte le module principal, donc numpy,
+    avant tout initializer : les limites de threads passent par l'environnement hérité,
+    posé dans le parent avant le lancement des workers.
+    """
+
+    name = "pool"
+
+    def __init__(self, workers=None, threads_per_worker=None, split_seconds=600.0, backend_factory=get_backend,
+                 **settings):
+        cores = os.cpu_count() or 1
+        settings = backend_settings(**settings)
+        # XCALL_WHISPER_THREADS (ou threads=...) fixe les threads par worker s'il est défini
+        threads_per_worker = threads_per_worker or settings["threads"]
+        if workers is None:
+            workers = max(1, cores // threads_per_worker) if threads_per_worker else max(1, cores // 4)
+        if threads_per_worker is None:
+            threads_per_worker = max(1, cores // workers)
+        self.workers = workers
+        self.threads_per_worker = threads_per_worker
+        self.split_seconds = split_seconds
+        print(f"🔄 Pool de transcription: {workers} workers × {threads_per_worker} threads ({settings['name']})")
+        # Le BLAS du parent est déjà initialisé : seuls les workers (lancés à la demande, y compris
+        # ceux qui remplacent un worker tombé) prennent ces valeurs
+        for variable in THREAD_VARIABLES:
+            os.environ[variable] = str(threads_per_worker)
+        self._executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                                             initializer=_init_worker,
+                                             initargs=(backend_factory, settings, threads_per_worker))
+
+    def transcribe(self, audio, language="fr"):
+        if isinstance(audio, str):
+            audio = load_audio(audio)
+        chunks = split_at_silences(audio, max_seconds=self.split_seconds) if self.split_seconds else [(0, audio)]
+        futures = [self._executor.submit(_transcribe_chunk, chunk, offset / SAMPLE_RATE, language)
+                   for offset, chunk in chunks]
+        results = [future.result() for future in futures]
+        return {
+            "text": " ".join(result["text"].strip() for result in results if result["text"].strip()),
+            "segments": [segment for result in results for segment in result["segments"]],
+            "duration": len(audio) / SAMPLE_RATE,
+        }
+
+    def close(self):
+        self._executor.shutdown()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Pré-filtre de détection d'activité vocale (VAD) pour CallX
+Passe énergétique peu coûteuse avant Whisper : les enregistrements quasi
+silencieux (messagerie vide, sonneries) sont rejetés, et les longs blancs
+(attente, temps mort) sont retirés de l'audio transcrit. Une table de
+correspondance ramène les horodatages sur la chronologie d'origine.
+"""
+
+import threading
+
+import numpy as np
+
+from audio import SAMPLE_RATE, frame_energies
+
+FRAME_SECONDS = 0.03
+
+
+class TimelineMap:
+    """Correspondance temps de l'audio découpé → temps de l'enregistrement d'origine"""
+
+    def __init__(self, spans, sample_rate=SAMPLE_RATE):
+        # spans : [(début, fin)] en échantillons dans l'original, dans l'ordre
+        self.sample_rate = sample_rate
+        self._trimmed_starts = []
+        self._original_starts = []
+        position = 0
+        for start, end in spans:
+            self._trimmed_starts.append(position / sample_rate)
+            self._original_starts.append(start / sample_rate)
+            position += end - start
+
+    def to_original(self, seconds, end=False):
+        """
+        Temps d'origine d'un instant de l'audio découpé ; une fin (`end`) tombant pile sur
+        une jointure reste à la fin de la plage précédente au lieu de sauter au début de la suivante
+        """
+        if not self._trimmed_starts:
+            return seconds
+        side = "left" if end else "right"
+        index = max(0, int(np.searchsorted(self._trimmed_starts, seconds, side=side)) - 1)
+        return self._original_starts[index] + seconds - self._trimmed_starts[index]
+
+    def remap_segments(self, segments):
+        return [dict(segment, start=self.to_original(segment["start"]), end=self.to_original(segment["end"], end=True))
+                for segment in segments]
+
+
+def speech_spans(audio, threshold_db=-40.0, max_gap=2.0, padding=0.25, sample_rate=SAMPLE_RATE):
+    """
+    Plages de parole [(début, fin)] en échantillons
+
+    Les trames au-dessus du seuil sont regroupées quand les blancs entre elles font
+    moins de `max_gap` secondes (pauses naturelles conservées), puis élargies de `padding`.
+    """
+    energies = frame_energies(audio, FRAME_SECONDS, sample_rate)
+    frame = int(FRAME_SECONDS * sample_rate)
+    active = np.flatnonzero(energies >= threshold_db)
+    if len(active) == 0:
+        return []
+
+    gap_frames = int(max_gap / FRAME_SECONDS)
+    breaks = np.flatnonzero(np.diff(active) > gap_frames)
+    starts = np.concatenate([[active[0]], active[breaks + 1]])
+    ends = np.concatenate([active[breaks], [active[-1]]]) + 1
+
+    pad = int(padding * sample_rate)
+    spans = []
+    for start, end in zip(starts * frame, ends * frame):
+        start, end = max(0, int(start) - pad), min(len(audio), int(end) + pad)
+        if spans and start <= spans[-1][1]:
+            spans[-1] = (spans[-1][0], end)
+        else:
+            spans.append((start, end))
+    return spans
+
+
+def prefilter(audio, min_speech_seconds=1.5, threshold_db=-40.0, max_gap=2.0, sample_rate=SAMPLE_RATE):
+    """
+    Analyse un enregistrement avant transcription
+
+    Renvoie {"skip", "audio" (découpé), "timeline", "duration", "speech_seconds", "trim_ratio"}.
+    """
+    duration = len(audio) / sample_rate
+    spans = speech_spans(audio, threshold_db=threshold_db, max_gap=max_gap, sample_rate=sample_rate)
+    kept = sum(end - start for start, end in spans)
+    speech_seconds = kept / sample_rate
+    result = {
+        "skip": speech_seconds < min_speech_seconds,
+        "duration": duration,
+        "speech_seconds": speech_seconds,
+        "trim_ratio": 1 - kept / len(audio) if len(audio) else 0.0,
+        "timeline": TimelineMap(spans, sample_rate),
+    }
+    result["audio"] = np.concatenate([audio[start:end] for start, end in spans]) if spans else audio[:0]
+    return result
+
+
+class VadStats:
+    """Compteurs du run : enregistrements rejetés et part d'audio retirée"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.recordings = 0
+        self.skipped = 0
+        self.audio_seconds = 0.0
+        self.kept_seconds = 0.0
+
+    def add(self, result):
+        with self._lock:
+            self.recordings += 1
+            self.audio_seconds += result["duration"]
+            if result["skip"]:
+                self.skipped += 1
+            else:
+                self.kept_seconds += len(result["audio"]) / SAMPLE_RATE
+
+    def report(self):
+        if not self.recordings:
+            return None
+        skip_ratio = self.skipped / self.recordings
+        trim_ratio = 1 - self.kept_seconds / self.audio_seconds if self.audio_seconds else 0.0
+        return (f"🔇 VAD: {self.skipped}/{self.recordings} enregistrements ignorés ({skip_ratio:.0%}), "
+                f"{trim_ratio:.0%} de l'audio retiré avant Whisper")
+
+
+RUN_STATS = VadStats()
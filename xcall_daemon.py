@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+"""
+Démon d'ingestion CallX (webhooks Aircall)
+Le modèle de transcription et le client GPT sont chargés une seule fois au
+démarrage ; un Pipeline longue durée reste ouvert et reçoit chaque appel dès
+que Aircall envoie son webhook call.ended. Les webhooks sont authentifiés par le
+token Aircall (AIRCALL_WEBHOOK_TOKEN, obligatoire) et dédoublonnés ; seul leur
+call_id est retenu, l'appel (et l'URL de son enregistrement) étant relu via
+l'API Aircall. Un appel sans
+enregistrement est relu quelques minutes plus tard, et une synchronisation
+périodique par curseur rattrape les webhooks perdus.
+
+    python xcall_daemon.py     (URL du webhook Aircall : http://<hôte>:8010/webhooks/aircall)
+"""
+
+import os
+import hmac
+import queue
+import threading
+import time
+from contextlib import asynccontextmanager
+
+from dotenv import load_dotenv
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
+
+import metrics
+from aircall_sync import AircallSync, basic_auth_headers
+from ingestion import new_job, persist_analysis, pipeline_stages, stage_failed
+from ledger import Ledger
+from pipeline import Pipeline
+
+load_dotenv()
+
+# Écoute locale par défaut (exposer via un proxy, ou XCALL_DAEMON_HOST=0.0.0.0)
+DAEMON_HOST = os.getenv('XCALL_DAEMON_HOST', '127.0.0.1')
+DAEMON_PORT = int(os.getenv('XCALL_DAEMON_PORT', 8010))
+WEBHOOK_TOKEN = os.getenv('AIRCALL_WEBHOOK_TOKEN')
+# Événements qui déclenchent le traitement d'un appel
+WEBHOOK_EVENTS = set(os.getenv('AIRCALL_WEBHOOK_EVENTS', 'call.ended,call.voicemail_left').split(','))
+SWEEP_SECONDS = int(os.getenv('XCALL_SWEEP_SECONDS', 600))
+RECORDING_RETRY_SECONDS = int(os.getenv('XCALL_RECORDING_RETRY_SECONDS', 60))
+RECORDING_MAX_ATTEMPTS = int(os.getenv('XCALL_RECORDING_MAX_ATTEMPTS', 10))
+# Un appel en cours de traitement depuis plus longtemps peut être soumis à nouveau
+INFLIGHT_TTL = int(os.getenv('XCALL_INFLIGHT_TTL', 3600))
+
+
+class IngestionDaemon:
+    """Reçoit les appels (webhooks, rattrapage) et les fait passer dans un pipeline toujours chaud"""
+
+    def __init__(self, sync, ledger, transcriber, analyzer, cache=None, webhook_token=WEBHOOK_TOKEN,
+                 download_workers=4, transcribe_workers=1, analyze_workers=8, queue_size=8,
+                 sweep_seconds=SWEEP_SECONDS, recording_retry_seconds=RECORDING_RETRY_SECONDS):
+        self.sync = sync
+        self.ledger = ledger
+        self.webhook_token = webhook_token
+        self.sweep_seconds = sweep_seconds
+        self.recording_retry_seconds = recording_retry_seconds
+        self.pipeline = Pipeline(
+            pipeline_stages(transcriber, analyzer, cache, download_workers, transcribe_workers, analyze_workers),
+            self._persist, queue_size=queue_size, on_drop=self._release, on_error=stage_failed,
+        )
+        self._intake = queue.Queue()
+        self._webhook_ids = queue.Queue()  # call_id reçus par webhook, relus via l'API
+        self._inflight = {}            # call_id -> soumis à (time.time())
+        self._waiting_recording = {}   # call_id -> (tentatives, prochaine relecture)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self.counts = {"webhooks": 0, "rejected": 0, "duplicates": 0, "enqueued": 0, "persisted": 0, "dropped": 0,
+                       "swept": 0}
+
+    # Cycle de vie
+
+    def start(self):
+        self.pipeline.start()
+        for target, name in ((self._feed, "intake"), (self._webhook_loop, "webhooks"), (self._sweep_loop, "sweep"),
+                             (self._recording_loop, "recordings")):
+            threading.Thread(target=target, name=name, daemon=True).start()
+        return self
+
+    def stop(self):
+        """Arrête les boucles de fond et termine les appels déjà soumis"""
+        self._stop.set()
+        self._intake.put(None)
+        self._webhook_ids.put(None)
+        self.pipeline.close()
+
+    # Entrées
+
+    def verify(self, payload):
+        """Le token du webhook doit être celui de l'intégration Aircall (comparaison à temps constant)"""
+        if not self.webhook_token:
+            # Sans token configuré, aucun webhook n'est accepté
+            return False
+        token = payload.get("token")
+        return isinstance(token, str) and hmac.compare_digest(token, self.webhook_token)
+
+    def handle_webhook(self, payload):
+        """Traite un webhook Aircall ; renvoie (code HTTP, statut)"""
+        self._count("webhooks")
+        if not self.verify(payload):
+            self._count("rejected")
+            return 401, "invalid token"
+        if payload.get("resource") != "call" or payload.get("event") not in WEBHOOK_EVENTS:
+            return 200, "ignored"
+        # Seul l'id est retenu : l'appel et l'URL de son enregistrement viennent de l'API Aircall
+        call_id = (payload.get("data") or {}).get("id")
+        if not str(call_id).isdigit():
+            return 400, "missing call id"
+        self._webhook_ids.put(int(call_id))
+        return 200, "accepted"
+
+    def enqueue(self, call, source="webhook"):
+        """Soumet un appel au pipeline s'il n'est ni déjà traité ni déjà en cours"""
+        call_id = call["id"]
+        if not call.get("recording"):
+            # Enregistrement pas encore disponible : l'appel sera relu via l'API
+            with self._lock:
+                if call_id not in self._waiting_recording:
+                    self._waiting_recording[call_id] = (0, time.time() + self.recording_retry_seconds)
+            return "waiting for recording"
+        now = time.time()
+        with self._lock:
+            submitted = self._inflight.get(call_id)
+            if submitted and now - submitted < INFLIGHT_TTL:
+                self.counts["duplicates"] += 1
+                return "duplicate"
+            self._inflight[call_id] = now
+            self._waiting_recording.pop(call_id, None)
+        if not self.ledger.pending([call]):
+            with self._lock:
+                self._inflight.pop(call_id, None)
+                self.counts["duplicates"] += 1
+            return "already processed"
+        self._count("enqueued")
+        if source == "sweep":
+            self._count("swept")
+        self._intake.put(call)
+        return "enqueued"
+
+    # Boucles de fond
+
+    def _feed(self):
+        # Pipeline.submit() bloque quand la première file est pleine : jamais dans le thread HTTP
+        while True:
+            call = self._intake.get()
+            if call is None:
+                return
+            try:
+                self.pipeline.submit(new_job(call, self.ledger))
+            except Exception as e:
+                print(f"❌ Erreur soumission de l'appel {call.get('id')}: {e}")
+                with self._lock:
+                    self._inflight.pop(call.get("id"), None)
+
+    def _webhook_loop(self):
+        # Relecture via l'API hors du thread HTTP (fetch_call peut attendre sur les 429)
+        while True:
+            call_id = self._webhook_ids.get()
+            if call_id is None:
+                return
+            try:
+                call = self.sync.fetch_call(call_id)
+            except Exception as e:
+                print(f"⚠️ Appel {call_id} du webhook introuvable via l'API: {e}")
+                continue
+            if call.get("id") and call.get("started_at"):
+                self.enqueue(call)
+
+    def _persist(self, job):
+        persist_analysis(job)
+        with self._lock:
+            self._inflight.pop(job["call_id"], None)
+        self._count("persisted")
+
+    def _release(self, job):
+        # Appel abandonné par une étape (skip, mis de côté, erreur) : le prochain rattrapage peut le resoumettre
+        with self._lock:
+            self._inflight.pop(job["call_id"], None)
+        self._count("dropped")
+
+    def sweep(self):
+        """Rattrapage : relit les appels récents via le curseur et soumet ceux qui manquent au registre"""
+        cursor = self.sync.load_cursor()
+        calls = self.sync.fetch_new_calls(cursor)
+        pending = self.ledger.pending(calls)
+        statuses = [self.enqueue(call, source="sweep") for call in pending]
+        # Le curseur n'avance pas au-delà du premier appel encore à traiter (appels triés par date) ;
+        # un appel mis de côté trop souvent passe en 'failed' et ne le retient plus
+        pending_ids = {call["id"] for call in pending}
+        done = []
+        for call in calls:
+            if call["id"] in pending_ids and call.get("recording"):
+                break
+            done.append(call)
+        self.sync.save_cursor(self.sync.advance_cursor(cursor, done))
+        enqueued = statuses.count("enqueued")
+        if enqueued:
+            print(f"🧹 Rattrapage: {enqueued} appel(s) manqué(s) soumis")
+        return enqueued
+
+    def _sweep_loop(self):
+        while not self._stop.is_set():
+            try:
+                self.sweep()
+            except Exception as e:
+                print(f"❌ Erreur rattrapage Aircall: {e}")
+            self._stop.wait(self.sweep_seconds)
+
+    def _recording_loop(self):
+        while not self._stop.wait(min(self.recording_retry_seconds, 30)):
+            now = time.time()
+            with self._lock:
+                due = [(call_id, attempts) for call_id, (attempts, at) in self._waiting_recording.items() if at <= now]
+            for call_id, attempts in due:
+                try:
+                    call = self.sync.fetch_call(call_id)
+                except Exception as e:
+                    print(f"⚠️ Relecture de l'appel {call_id} impossible: {e}")
+                    call = {}
+                if call.get("recording"):
+                    self.enqueue(call)
+                    continue
+                with self._lock:
+                    if attempts + 1 >= RECORDING_MAX_ATTEMPTS:
+                        # Appel sans enregistrement : rien à analyser
+                        self._waiting_recording.pop(call_id, None)
+                    else:
+                        self._waiting_recording[call_id] = (attempts + 1, now + self.recording_retry_seconds * 2 ** attempts)
+
+    def _count(self, key):
+        with self._lock:
+            self.counts[key] += 1
+
+    def status(self):
+        with self._lock:
+            return {**self.counts, "inflight": len(self._inflight), "waiting_recording": len(self._waiting_recording),
+                    "pipeline_errors": len(self.pipeline.errors)}
+
+
+def create_app(daemon):
+    """Application HTTP du démon : webhook Aircall, état et mesures"""
+    @asynccontextmanager
+    async def lifespan(app):
+        try:
+            yield
+        finally:
+            daemon.stop()
+
+    app = FastAPI(title="CallX ingestion", lifespan=lifespan)
+
+    @app.post("/webhooks/aircall")
+    async def aircall_webhook(request: Request):
+        try:
+            payload = await request.json()
+        except ValueError:
+            return JSONResponse({"status": "invalid JSON"}, status_code=400)
+        status_code, status = daemon.handle_webhook(payload)
+        metrics.incr("webhooks", status=status_code)
+        return JSONResponse({"status": status}, status_code=status_code)
+
+    @app.get("/health")
+    def health():
+        return {"status": "ok", **daemon.status(), "ledger": daemon.ledger.counts()}
+
+    @app.get("/metrics")
+    def get_metrics():
+        """Mesures du pipeline au format texte Prometheus (XCALL_METRICS=1)"""
+        return PlainTextResponse(metrics.prometheus_text(), media_type="text/plain; version=0.0.4")
+
+    return app
+
+
+def main():
+    import uvicorn
+    from openai import OpenAI
+
+    from analysis_cache import AnalysisCache
+    from analysis_client import AnalysisExecutor
+    from transcription import get_backend
+    from transcription_pool import TranscriptionPool
+
+    download_workers = int(os.getenv('XCALL_DOWNLOAD_WORKERS', 4))
+    transcribe_workers = int(os.getenv('XCALL_TRANSCRIBE_WORKERS', 1))
+    analyze_workers = int(os.getenv('XCALL_ANALYZE_WORKERS', 8))
+    transcribe_processes = int(os.getenv('XCALL_TRANSCRIBE_PROCESSES', 0))
+
+    if not WEBHOOK_TOKEN:
+        print("❌ AIRCALL_WEBHOOK_TOKEN non défini : le démon refuse de démarrer sans authentification des webhooks")
+        raise SystemExit(1)
+
+    # Chargement unique : le pipeline reste chaud pour tous les appels suivants
+    print("🔄 Chargement du modèle de transcription...")
+    if transcribe_processes:
+        transcriber = TranscriptionPool(workers=transcribe_processes)
+        transcribe_workers = max(transcribe_workers, transcribe_processes)
+    else:
+        transcriber = get_backend()
+    analyzer = AnalysisExecutor(OpenAI(api_key=os.getenv('OPENAI_KEY')))
+    sync = AircallSync(basic_auth_headers(os.getenv('API_ID'), os.getenv('API_TOKEN')))
+
+    daemon = IngestionDaemon(sync, Ledger(), transcriber, analyzer, cache=AnalysisCache(),
+                             download_workers=download_workers, transcribe_workers=transcribe_workers,
+                             analyze_workers=analyze_workers,
+                             queue_size=int(os.getenv('XCALL_QUEUE_SIZE', 8))).start()
+    print(f"✅ Prêt ! Webhook Aircall : http://{DAEMON_HOST}:{DAEMON_PORT}/webhooks/aircall")
+    uvicorn.run(create_app(daemon), host=DAEMON_HOST, port=DAEMON_PORT)
+
+
+if __name__ == "__main__":
+    main()